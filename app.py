@@ -1,54 +1,81 @@
-from flask import Flask, render_template, jsonify, redirect, url_for, request
-import subprocess
-from threading import Thread
-import firebase_admin
-from firebase_admin import credentials, firestore
+from flask import Flask, render_template, jsonify, redirect, url_for, request, Response, stream_with_context
 from flask_cors import CORS
-import uuid
-import base64
-import io
 import json
-from PIL import Image
-import numpy as np
-import face_recognition
 from datetime import datetime, time, timedelta, timezone
 import os
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut
 import math
+import multiprocessing
+from functools import wraps
+from time import perf_counter
+from recognition_pool import PoolBusy, RecognitionPool
+from scan_jobs import JobQueueFull, ScanJobManager
+from user_cache import UserCache
+from geocode_cache import GeocodeCache
+from attendance_writer import AttendanceWriter, WriterBusy
+from open_sessions import OpenSessions
+from attendance_log import QueryError, fetch_page, iter_records, parse_filters
+from attendance_export import ExportUnavailable, check_format, export_stream
+from live_locations import LiveLocations
+from recent_results import RecentResults, StillRunning
+from storage import open_storage
+from stats_rollups import checkin_writes, checkout_writes, read_daily, read_monthly
+from metrics import CONTENT_TYPE, REGISTRY, RequestProfiler, instrument_app, observe_stages, stage
+import atexit
+from threading import BoundedSemaphore, Thread
 
 app = Flask(__name__)
 CORS(app)
 
+# "spawn" workers re-import the main script (python app.py); background
+# loaders, the write-ahead log replay, the office geocode and the warm-up
+# only run in the server
+IN_MAIN_PROCESS = multiprocessing.current_process().name == "MainProcess"
+
 # ---------- Constants for Location ----------
 OFFICE_LAT = 3.205170
 OFFICE_LNG = 101.720107
 WFO_RADIUS = 100.0   # meters
 WFH_RADIUS = 500.0   # meters
+# Named office sites for the live-location geofences; JSON list of
+# {id, name, lat, lng, radius?} in OFFICE_SITES overrides the single office
+OFFICE_SITES = json.loads(os.environ.get("OFFICE_SITES") or "null") or [
+    {"id": "office", "name": "Office", "lat": OFFICE_LAT, "lng": OFFICE_LNG, "radius": WFO_RADIUS},
+]
 
 # ---------- Malaysia Time (UTC+8, no ZoneInfo needed) ----------
 MALAYSIA_TZ = timezone(timedelta(hours=8))
 
 # ---------- Enhanced Geocoder for Place Names ----------
-geolocator = Nominatim(user_agent="attendance_system_v2")
+_geolocator = None
+
+
+def get_geolocator():
+    """Nominatim client, created on first use (geopy is only imported then)."""
+    global _geolocator
+    if _geolocator is None:
+        from geopy.geocoders import Nominatim
+        _geolocator = Nominatim(user_agent="attendance_system_v2")
+    return _geolocator
 
 
-def get_place_name(lat, lng, max_retries=3):
+def reverse_geocode(lat, lng, max_retries=3):
     """
     Returns a human-friendly place name (e.g., 'Setapak Central Mall')
     Uses OpenStreetMap POI tags for best result.
+    Uncached Nominatim call – use get_place_name(); None means it failed.
     """
-    if lat is None or lng is None:
-        return "Location not provided"
+    from geopy.exc import GeocoderTimedOut
 
+    geolocator = get_geolocator()
     for _ in range(max_retries):
         try:
-            location = geolocator.reverse(
-                f"{lat}, {lng}",
-                language='en',
-                zoom=18,
-                addressdetails=True
-            )
+            with stage("geocoder", "nominatim"):
+                location = geolocator.reverse(
+                    f"{lat}, {lng}",
+                    language='en',
+                    zoom=18,
+                    addressdetails=True
+                )
             if not location:
                 return "Unknown location"
 
@@ -70,7 +97,46 @@ def get_place_name(lat, lng, max_retries=3):
             return place_name if place_name else "Location not identified"
         except GeocoderTimedOut:
             continue
-    return "Geocoding failed"
+    return None
+
+
+# Place names are cached per ~11 m cell (memory + SQLite) and every check-in
+# within WFO_RADIUS of the office shares one precomputed office entry.
+# With GEOCODE_ASYNC=1 a cache miss no longer blocks /recognize: the attendance
+# doc (and the remembered check-in) get PENDING_ADDRESS and "address" is filled
+# in afterwards. Off by default – the response then always has the real name.
+GEOCODE_CACHE_FILE = os.environ.get("GEOCODE_CACHE_FILE", "geocode_cache.sqlite3")
+GEOCODE_ASYNC = os.environ.get("GEOCODE_ASYNC", "0") == "1"
+OFFICE_PLACE_NAME = os.environ.get("OFFICE_PLACE_NAME")  # skips geocoding the office at all
+PENDING_ADDRESS = "Resolving address..."
+
+geocode_cache = GeocodeCache(reverse_geocode, GEOCODE_CACHE_FILE)
+geocode_cache.add_anchor(OFFICE_LAT, OFFICE_LNG, WFO_RADIUS, name=OFFICE_PLACE_NAME)
+if IN_MAIN_PROCESS and geocode_cache.peek(OFFICE_LAT, OFFICE_LNG) is None:
+    geocode_cache.lookup_async(OFFICE_LAT, OFFICE_LNG)
+
+
+def get_place_name(lat, lng):
+    """
+    Cached place name for a check-in location (blocks on a cache miss).
+    """
+    if lat is None or lng is None:
+        return "Location not provided"
+    return geocode_cache.lookup(lat, lng)
+
+
+def get_place_name_nowait(lat, lng):
+    """
+    Like get_place_name() but never waits for the geocoder.
+    Returns (place_name, pending); when pending, place_name is PENDING_ADDRESS
+    and the caller should fill in the real name with fill_address_later().
+    """
+    if lat is None or lng is None:
+        return "Location not provided", False
+    place_name = geocode_cache.peek(lat, lng)
+    if place_name is None:
+        return PENDING_ADDRESS, True
+    return place_name, False
 
 
 # ---------- Distance & Location Status Helpers ----------
@@ -118,19 +184,12 @@ def get_location_status(distance_m, mode):
             return "Far from Office"
 
 
-# ---------- Firebase ----------
+# ---------- Storage ----------
+# STORAGE_BACKEND=firestore (default) | sqlite | cached, see storage.py.
+# With sqlite, Firebase is never imported and serviceAccountKey.json is not needed.
+# The client is opened on first use (normally by the warm-up), not at import.
 cred_path = "serviceAccountKey.json"
-if not os.path.exists(cred_path):
-    raise FileNotFoundError(f"Firebase credential file '{cred_path}' not found!")
-
-try:
-    firebase_admin.get_app()
-except ValueError:
-    firebase_admin.initialize_app(credentials.Certificate(cred_path))
-
-db = firestore.client()
-
-scan_results = {}
+db = open_storage(cred_path=cred_path, lazy=True)
 
 # ---------- Configuration ----------
 TOLERANCE = 0.45
@@ -139,6 +198,126 @@ ON_TIME_END = time(12, 30)
 
 ATTENDANCE_COLLECTION = "attendance_test"  # <--- main collection for attendance
 
+# Binary encoding store written by encode_faces.py / migrate_faces.py
+KNOWN_FACES_FILE = "known_faces.bin"
+
+# Face detection: runs on a downscaled copy, boxes are mapped back to full resolution
+DETECT_MAX_SIDE = 640        # longest side (px) of the copy used for detection
+DETECTION_MODEL = "hog"      # "hog" (CPU) or "cnn"
+DETECT_UPSAMPLE = 1
+# Kiosk / self check-in: only encode the largest face unless the client says otherwise
+SINGLE_FACE_DEFAULT = False
+# Decode large JPEG uploads at reduced scale (libjpeg draft mode) close to DETECT_MAX_SIDE
+JPEG_DRAFT_DECODE = os.environ.get("JPEG_DRAFT_DECODE", "1") == "1"
+
+# Recognition runs in a process pool (0 = inline in the request thread).
+# Each worker keeps warm dlib models and its own hot-reloaded copy of the
+# memory-mapped gallery; beyond workers + queue size we answer 503.
+RECOGNITION_WORKERS = int(os.environ.get("RECOGNITION_WORKERS", "2"))
+RECOGNITION_QUEUE_SIZE = int(os.environ.get("RECOGNITION_QUEUE_SIZE", "8"))
+RECOGNITION_TIMEOUT = 30.0   # seconds
+
+recognition_pool = RecognitionPool(
+    RECOGNITION_WORKERS,
+    KNOWN_FACES_FILE,
+    TOLERANCE,
+    detect_options={
+        "max_side": DETECT_MAX_SIDE,
+        "model": DETECTION_MODEL,
+        "upsample": DETECT_UPSAMPLE,
+    },
+    queue_size=RECOGNITION_QUEUE_SIZE,
+    draft_decode=JPEG_DRAFT_DECODE,
+)
+
+# Errors from the recognition workers -> (message, HTTP status), unchanged from before
+RECOGNITION_ERRORS = {
+    "invalid_image": ("Invalid image data", 400),
+    "no_gallery": ("No known faces enrolled", 400),
+    "empty_gallery": ("Known faces database is empty", 400),
+    "no_face": ("No face detected", 400),
+}
+
+# label -> users doc cache for /recognize, warmed in the background at startup
+# and kept in sync by a snapshot listener (Firestore's, or SQLiteStore's local
+# change notifications); TTL-only if that fails
+USER_CACHE_TTL = 600          # seconds, used only without the listener
+USER_CACHE_NEGATIVE_TTL = 60  # seconds an unknown label is remembered
+USER_CACHE_WARM = os.environ.get("USER_CACHE_WARM", "1") == "1"
+
+user_cache = UserCache(db, ttl=USER_CACHE_TTL, negative_ttl=USER_CACHE_NEGATIVE_TTL)
+if USER_CACHE_WARM and IN_MAIN_PROCESS:
+    Thread(target=user_cache.start, name="user-cache-warm", daemon=True).start()
+
+# Check-in writes are logged to a local write-ahead log and committed in
+# batches by a background thread, so /recognize does not wait for Firestore.
+# Set ATTENDANCE_DEFERRED_WRITES=0 to write synchronously as before.
+ATTENDANCE_DEFERRED_WRITES = os.environ.get("ATTENDANCE_DEFERRED_WRITES", "1") == "1"
+ATTENDANCE_WAL_FILE = os.environ.get("ATTENDANCE_WAL_FILE", "attendance_wal.jsonl")
+
+attendance_writer = AttendanceWriter(db, ATTENDANCE_WAL_FILE)
+if ATTENDANCE_DEFERRED_WRITES and IN_MAIN_PROCESS:
+    attendance_writer.start()
+    atexit.register(attendance_writer.flush, 5.0)
+
+# Repeat scans of someone already checked in today within this window return
+# the first check-in (no geocode, no writes, checkIn keeps its time);
+# concurrent duplicates wait for the first one. 0 disables it.
+CHECKIN_DUPLICATE_WINDOW = float(os.environ.get("CHECKIN_DUPLICATE_WINDOW", "300"))  # seconds
+# Responses stored per client Idempotency-Key header, replayed on retries
+IDEMPOTENCY_TTL = float(os.environ.get("IDEMPOTENCY_TTL", "600"))  # seconds
+IDEMPOTENCY_KEY_MAX_LENGTH = 128
+# Optional SQLite file so both survive a restart ("" = memory only)
+RECENT_RESULTS_FILE = os.environ.get("RECENT_RESULTS_FILE", "")
+
+recent_checkins = RecentResults(CHECKIN_DUPLICATE_WINDOW, RECENT_RESULTS_FILE or None, table="recent_checkins")
+idempotent_responses = RecentResults(IDEMPOTENCY_TTL, RECENT_RESULTS_FILE or None, table="idempotent_responses")
+
+# ---------- Metrics ----------
+# Per-stage timings and counters, scraped from /metrics (Prometheus text format).
+# METRICS_PROFILE_RATE > 0 runs that fraction of requests under cProfile and
+# keeps the profiles of those slower than METRICS_PROFILE_SLOW seconds.
+METRICS_PROFILE_RATE = float(os.environ.get("METRICS_PROFILE_RATE", "0"))
+METRICS_PROFILE_SLOW = float(os.environ.get("METRICS_PROFILE_SLOW", "1.0"))
+METRICS_PROFILE_DIR = os.environ.get("METRICS_PROFILE_DIR", "profiles")
+
+instrument_app(app, RequestProfiler(METRICS_PROFILE_RATE, METRICS_PROFILE_SLOW, METRICS_PROFILE_DIR))
+
+FACES_PER_FRAME = REGISTRY.histogram(
+    "attendance_faces_per_frame", "Faces found in a /recognize frame", buckets=(0, 1, 2, 3, 5, 10))
+MATCH_DISTANCE = REGISTRY.histogram(
+    "attendance_match_distance", "Distance to the closest identity, per face", ("recognized",),
+    buckets=(0.1, 0.2, 0.3, 0.35, 0.4, 0.45, 0.5, 0.6, 0.8))
+RECOGNIZE_RESULTS = REGISTRY.counter(
+    "attendance_recognize_results_total", "/recognize outcomes", ("result",))
+LONG_REQUESTS_REFUSED = REGISTRY.counter(
+    "attendance_long_requests_refused_total", "Streams / long-polls refused for lack of a slot", ("route",))
+
+# ---------- Long-lived requests ----------
+# Every open event stream or long-poll holds a server thread (waitress has 4
+# by default), so at most LONG_REQUEST_LIMIT of them run at once and the
+# other threads stay free for /recognize. Past the limit streams are answered
+# 503 + Retry-After and long-polls answer straight away without waiting.
+LONG_REQUEST_LIMIT = int(os.environ.get("LONG_REQUEST_LIMIT", "2"))
+LONG_REQUEST_RETRY_AFTER = 10  # seconds
+
+long_request_slots = BoundedSemaphore(LONG_REQUEST_LIMIT)
+
+
+def event_stream(generate, headers=None):
+    """
+    text/event-stream response for generate() that holds a long-request
+    slot until the server closes it; 503 when no slot is free.
+    """
+    if not long_request_slots.acquire(blocking=False):
+        LONG_REQUESTS_REFUSED.inc(route=request.url_rule.rule)
+        response = jsonify({"success": False, "error": "Too many open streams, please try again"})
+        return response, 503, {"Retry-After": str(LONG_REQUEST_RETRY_AFTER)}
+    response = Response(stream_with_context(generate()), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", **(headers or {})})
+    response.call_on_close(long_request_slots.release)
+    return response
+
 
 # ---------- Frontend Routes ----------
 @app.route("/")
@@ -206,7 +385,7 @@ def get_attendance():
     try:
         docs = (
             db.collection(ATTENDANCE_COLLECTION)
-            .order_by("timestamp", direction=firestore.Query.DESCENDING)
+            .order_by("timestamp", direction="DESCENDING")
             .stream()
         )
         records = []
@@ -227,30 +406,157 @@ def get_attendance():
         return jsonify([])
 
 
-# ---------- Face recognition runner (if you still use live_recognition.py) ----------
-def run_face_recognition(scan_id):
+@app.route("/api/attendance")
+def api_attendance():
+    """
+    Paginated attendance log, newest first.
+      ?from=YYYY-MM-DD&to=YYYY-MM-DD   date range (inclusive)
+      ?userId=..&status=..&timeStatus=..&locationType=..
+      ?fields=name,checkIn,...        only these columns (see attendance_log.LOG_FIELDS)
+      ?limit=50&cursor=..             page size, nextCursor of the previous page
+    Returns { success, records: [...], nextCursor }.
+    """
     try:
-        subprocess.run(["python", "live_recognition.py"])
-        scan_results[scan_id] = {"status": "completed"}
+        filters = parse_filters(request.args)
+        records, next_cursor = fetch_page(db, ATTENDANCE_COLLECTION, filters)
+        return jsonify({"success": True, "records": records, "nextCursor": next_cursor})
+    except QueryError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
-        scan_results[scan_id] = {"status": "failed", "error": str(e)}
+        print("❌ Error fetching attendance page:", e)
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route("/api/attendance/export")
+def api_attendance_export():
+    """
+    Same filters as /api/attendance, every matching record streamed without
+    holding them all in memory (Firestore is read page by page).
+      ?format=ndjson (default)   raw records, one JSON object per line
+      ?format=csv|xlsx|parquet   normalised columns (attendance_export.py);
+                                 xlsx needs openpyxl, parquet needs pyarrow
+    """
+    fmt = request.args.get("format", "ndjson").lower()
+    try:
+        filters = parse_filters(request.args)
+        if fmt != "ndjson":
+            mimetype, extension = check_format(fmt)
+    except QueryError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except ExportUnavailable as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    records = iter_records(db, ATTENDANCE_COLLECTION, filters)
+
+    if fmt != "ndjson":
+        def generate_file():
+            try:
+                yield from export_stream(records, fmt)
+            except Exception as e:
+                # Headers are gone already; all we can do is cut the file short
+                print(f"❌ Error exporting attendance as {fmt}:", e)
+
+        return Response(
+            stream_with_context(generate_file()),
+            mimetype=mimetype,
+            headers={"Content-Disposition": f"attachment; filename=attendance.{extension}"},
+        )
+
+    def generate():
+        try:
+            for record in records:
+                yield json.dumps(record) + "\n"
+        except Exception as e:
+            print("❌ Error exporting attendance:", e)
+            yield json.dumps({"error": str(e)}) + "\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=attendance.ndjson"},
+    )
+
+
+# ---------- Webcam scan jobs (live_recognition.py, in-process) ----------
+SCAN_STATUS_MAX_WAIT = 30    # seconds a /scan-status long-poll may block
+# Scans run on a background thread of the server, and OpenCV's HighGUI
+# (cv2.imshow/waitKey) is not thread-safe – on macOS it aborts the process
+# off the main thread. The preview window is therefore off unless asked for.
+SCAN_SHOW_WINDOW = os.environ.get("SCAN_SHOW_WINDOW", "0") == "1"
+
+
+def create_scan_engine():
+    # cv2 is only imported once somebody actually starts a webcam scan
+    from live_recognition import LiveRecognizer
+    return LiveRecognizer(KNOWN_FACES_FILE, tolerance=TOLERANCE, show_window=SCAN_SHOW_WINDOW)
+
+
+scan_jobs = ScanJobManager(create_scan_engine)
 
 
 @app.route("/scan")
 def scan():
-    scan_id = str(uuid.uuid4())
-    Thread(target=run_face_recognition, args=(scan_id,)).start()
+    try:
+        scan_id = scan_jobs.submit()
+    except JobQueueFull as e:
+        print("⚠️ Scan rejected:", e)
+        return jsonify({"status": "failed", "error": "Too many scans in progress"}), 503, {"Retry-After": "5"}
     return redirect(url_for("attendance", scan_id=scan_id))
 
 
 @app.route("/scan-status/<scan_id>")
 def scan_status(scan_id):
-    return jsonify(scan_results.get(scan_id, {"status": "running"}))
+    """
+    Job record for a scan. With ?wait=N the request long-polls for up to N
+    seconds (max SCAN_STATUS_MAX_WAIT) until the scan has finished – or
+    answers at once when LONG_REQUEST_LIMIT long requests are already open.
+    Unknown or expired ids are a 404 {"status": "not_found"} – callers must
+    stop polling then (it used to answer {"status": "running"} forever).
+    """
+    wait = min(request.args.get("wait", 0, type=float), SCAN_STATUS_MAX_WAIT)
+    if wait > 0 and long_request_slots.acquire(blocking=False):
+        try:
+            job = scan_jobs.wait(scan_id, wait)
+        finally:
+            long_request_slots.release()
+    else:
+        if wait > 0:
+            LONG_REQUESTS_REFUSED.inc(route=request.url_rule.rule)
+        job = scan_jobs.get(scan_id)
+    if job is None:
+        return jsonify({"status": "not_found"}), 404
+    return jsonify(job)
+
+
+@app.route("/scan-events/<scan_id>")
+def scan_events(scan_id):
+    """Server-Sent Events: one event per status change until the scan finishes."""
+    def generate():
+        last_status = None
+        while True:
+            job = scan_jobs.wait_for_change(scan_id, last_status, SCAN_STATUS_MAX_WAIT)
+            if job is None:
+                yield f"data: {json.dumps({'status': 'not_found'})}\n\n"
+                return
+            if job["status"] == last_status:
+                yield ": keep-alive\n\n"
+                continue
+            last_status = job["status"]
+            yield f"data: {json.dumps(job)}\n\n"
+            if last_status in ("completed", "failed"):
+                return
+
+    return event_stream(generate)
+
+
+@app.route("/scan-metrics")
+def scan_metrics():
+    return jsonify(scan_jobs.stats())
 
 
 @app.route("/clear-scan/<scan_id>")
 def clear_scan(scan_id):
-    scan_results.pop(scan_id, None)
+    scan_jobs.discard(scan_id)
     return jsonify({"status": "cleared"})
 
 
@@ -258,7 +564,7 @@ def clear_scan(scan_id):
 
 def find_user_in_users_collection(recognized_label: str):
     """
-    recognized_label is what comes from known_faces.json (e.g. 'Syed Omar').
+    recognized_label is the gallery label from known_faces.bin (e.g. 'Syed Omar').
 
     Your Firestore structure:
       - firstName = 'Syed Omar'
@@ -281,34 +587,12 @@ def find_user_in_users_collection(recognized_label: str):
         return None
 
     try:
-        users_ref = db.collection("users")
-        q = users_ref.where("firstName", "==", label_str).limit(1)
-        docs = list(q.stream())
-        if not docs:
+        # Served from user_cache; only unknown/expired labels hit Firestore
+        result = user_cache.lookup(label_str)
+        if not result:
             print(f"⚠️ No user found in users collection with firstName == '{label_str}'")
             return None
 
-        doc_ref = docs[0]
-        data = doc_ref.to_dict() or {}
-
-        first_name = data.get("firstName", label_str)
-        last_name = (data.get("lastName") or "").strip()
-
-        full_name = f"{first_name} {last_name}".strip()
-
-        home_loc = data.get("homeLocation") or {}
-        home_lat = home_loc.get("lat")
-        home_lng = home_loc.get("lng")
-
-        result = {
-            "userId": doc_ref.id,
-            "firstName": first_name,
-            "lastName": last_name,
-            "fullName": full_name,
-            "home_lat": home_lat,
-            "home_lng": home_lng,
-            "raw": data
-        }
         print(f"✅ Found user in users: {result['userId']} → {result['fullName']}")
         return result
     except Exception as e:
@@ -316,13 +600,209 @@ def find_user_in_users_collection(recognized_label: str):
         return None
 
 
+@app.route("/api/user-cache/stats")
+def user_cache_stats():
+    return jsonify(user_cache.stats())
+
+
+@app.route("/api/user-cache/invalidate", methods=["POST"])
+def user_cache_invalidate():
+    """
+    Called after staff are edited/deleted. Body: { label?, userId? };
+    an empty body clears the whole cache.
+    """
+    data = request.get_json(silent=True) or {}
+    user_cache.invalidate(data.get("label"), data.get("userId"))
+    if not data.get("label") and not data.get("userId"):
+        # Reload everything in the background so staff lists are complete again
+        Thread(target=user_cache.warm, name="user-cache-warm", daemon=True).start()
+    return jsonify({"success": True})
+
+
+def save_attendance(doc_id, data, op="set", collection=ATTENDANCE_COLLECTION):
+    """
+    Writes an attendance doc (set with merge, or update). Goes through
+    attendance_writer when deferred writes are on; falls back to a direct
+    write if its queue is full.
+    """
+    if ATTENDANCE_DEFERRED_WRITES:
+        try:
+            attendance_writer.submit(collection, doc_id, data, op=op)
+            return
+        except WriterBusy as e:
+            print("⚠️ Attendance writer busy, writing directly:", e)
+
+    doc_ref = db.collection(collection).document(doc_id)
+    if op == "update":
+        doc_ref.update(data)
+    else:
+        doc_ref.set(data, merge=True)
+
+
+# {userId}_{date} -> today's attendance doc, maintained on check-in so
+# /checkout does not have to read the user's whole history
+open_sessions = OpenSessions(
+    db,
+    ATTENDANCE_COLLECTION,
+    write=lambda collection, doc_id, data: save_attendance(doc_id, data, collection=collection),
+    tz=MALAYSIA_TZ,
+)
+
+
+def save_rollups(writes):
+    """Daily / monthly stats rollups (stats_rollups.py), queued like attendance writes."""
+    for collection, doc_id, data in writes:
+        save_attendance(doc_id, data, collection=collection)
+
+
+@app.route("/api/stats/daily")
+def stats_daily():
+    """
+    Today's (or ?date=YYYY-MM-DD) present / late / on-time / checked-out
+    counts from the stats_daily rollup; absent counts use the staff list
+    in user_cache while its listener keeps it complete, a users query otherwise.
+    """
+    date_iso = request.args.get("date") or datetime.now(MALAYSIA_TZ).strftime("%Y-%m-%d")
+    try:
+        datetime.strptime(date_iso, "%Y-%m-%d")
+        return jsonify(read_daily(db, date_iso, user_cache.staff_ids()))
+    except ValueError:
+        return jsonify({"success": False, "error": "'date' must be YYYY-MM-DD"}), 400
+    except Exception as e:
+        print("❌ Error reading daily stats:", e)
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route("/api/stats/monthly")
+def stats_monthly():
+    """Per-user present / late totals for ?month=YYYY-MM (default: this month), optionally ?userId=."""
+    month = request.args.get("month") or datetime.now(MALAYSIA_TZ).strftime("%Y-%m")
+    try:
+        datetime.strptime(month, "%Y-%m")
+        users = read_monthly(db, month, request.args.get("userId"))
+        return jsonify({"month": month, "users": users})
+    except ValueError:
+        return jsonify({"success": False, "error": "'month' must be YYYY-MM"}), 400
+    except Exception as e:
+        print("❌ Error reading monthly stats:", e)
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route("/api/attendance-writer/stats")
+def attendance_writer_stats():
+    return jsonify(attendance_writer.stats())
+
+
+def fill_address_later(doc_ids, lat, lng, checkin_keys=()):
+    """
+    Resolves the place name in the background and writes it into the
+    "address" field of the given attendance docs and recent_checkins
+    entries (so repeat scans stop replaying PENDING_ADDRESS).
+    """
+    def on_resolved(place_name):
+        for doc_id in doc_ids:
+            try:
+                save_attendance(doc_id, {"address": place_name}, op="update")
+            except Exception as e:
+                print(f"❌ Error filling in address for '{doc_id}':", e)
+        for key in checkin_keys:
+            entry = recent_checkins.peek(key)
+            if entry is not None and entry.get("address") == PENDING_ADDRESS:
+                recent_checkins.update(key, dict(entry, address=place_name))
+
+    geocode_cache.lookup_async(lat, lng, on_resolved)
+
+
+@app.route("/api/geocode-cache/stats")
+def geocode_cache_stats():
+    return jsonify(geocode_cache.stats())
+
+
+# ---------- Idempotency keys ----------
+
+def idempotent(view):
+    """
+    A retry that sends the same Idempotency-Key header gets the stored
+    response instead of running the view again; a retry that arrives while
+    the first is still running waits for it (503 + Retry-After if that takes
+    too long). 5xx responses are not stored, so those can be retried for real.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        client_key = request.headers.get("Idempotency-Key")
+        if not client_key:
+            return view(*args, **kwargs)
+        if len(client_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return jsonify({"success": False, "error": "Invalid Idempotency-Key"}), 400
+
+        key = f"{request.path}:{client_key}"
+        try:
+            stored = idempotent_responses.begin(key)
+        except StillRunning as e:
+            print("⚠️ Idempotent request still running:", e)
+            response = jsonify({"success": False, "error": "Request still in progress, please try again"})
+            return response, 503, {"Retry-After": str(e.retry_after)}
+        if stored is not None:
+            return jsonify(stored["body"]), stored["status"], {"Idempotent-Replayed": "true"}
+
+        response = None
+        try:
+            response = app.make_response(view(*args, **kwargs))
+        finally:
+            if response is not None and response.status_code < 500 and response.is_json:
+                idempotent_responses.finish(key, {"status": response.status_code, "body": response.get_json()})
+            else:
+                idempotent_responses.abandon(key)
+        return response
+
+    return wrapper
+
+
 # ---------- Recognition + Save Attendance (Malaysia time) ----------
 
+# Form / query-string fields of a binary /recognize upload that are numbers
+RECOGNIZE_FLOAT_FIELDS = ("latitude", "longitude", "home_lat", "home_lng")
+
+
+def read_recognize_request():
+    """
+    /recognize input -> (image, fields). The image comes as
+      - multipart/form-data: an "image" file part (raw JPEG/PNG), other form fields
+      - application/octet-stream or image/*: the raw body, fields in the query string
+      - JSON (original format): "image" as a base64 data URL, fields alongside
+    Binary uploads skip the base64 inflation, the JSON parse of the frame and
+    the base64 decode. Raises ValueError for a non-numeric coordinate.
+    """
+    upload = request.files.get("image")
+    if upload is not None:
+        image, form = upload.read(), request.form
+    elif request.mimetype == "application/octet-stream" or request.mimetype.startswith("image/"):
+        image, form = request.get_data(cache=False), request.args
+    else:
+        data = request.get_json(silent=True) or {}
+        return data.get("image"), data
+
+    fields = {key: value for key, value in form.items() if value != ""}
+    for key in RECOGNIZE_FLOAT_FIELDS:
+        if key in fields:
+            fields[key] = float(fields[key])
+    if "single_face" in fields:
+        fields["single_face"] = fields["single_face"].lower() in ("1", "true", "yes")
+    return image, fields
+
+
+@app.route("/api/recognize-config")
+def recognize_config():
+    """Lets the capture page size its frame to what the detector actually uses."""
+    return jsonify({"maxSide": DETECT_MAX_SIDE, "formats": ["image/jpeg", "image/png"]})
+
+
 @app.route("/recognize", methods=["POST"])
+@idempotent
 def recognize():
     """
     1. Decode image and detect faces.
-    2. Match against known_faces.json.
+    2. Match against the in-memory gallery (loaded from known_faces.bin).
     3. For each recognized face:
        - Look up user in users collection by firstName == recognized_label.
        - Build:
@@ -332,12 +812,19 @@ def recognize():
            userId = Firestore user doc ID
            full display name = firstName + " " + lastName
        - Use Malaysia timezone for timestamp/check-in.
+    A repeat scan of someone checked in within CHECKIN_DUPLICATE_WINDOW
+    returns that check-in ("duplicate": true) without saving again. A face
+    whose check-in another request is still saving is listed with
+    "inProgress": true; if that is every face, the answer is 503 + Retry-After.
     """
+    claimed_checkin = None  # recent_checkins key this request must finish or abandon
     try:
-        data = request.get_json() or {}
-
-        image_b64 = data.get("image")
-        if not image_b64:
+        try:
+            with stage("recognize", "read_request"):
+                image, data = read_recognize_request()
+        except ValueError:
+            return jsonify({"success": False, "error": "Invalid location"}), 400
+        if not image:
             return jsonify({"success": False, "error": "No image provided"}), 400
 
         # Location & work mode
@@ -348,36 +835,29 @@ def recognize():
         home_lat_client = data.get("home_lat")
         home_lng_client = data.get("home_lng")
 
-        # Decode image
+        # Decode, detect, encode and match in the recognition pool
+        single_face = bool(data.get("single_face", SINGLE_FACE_DEFAULT))
         try:
-            # Handle "data:image/png;base64,...."
-            if "," in image_b64:
-                image_b64 = image_b64.split(",", 1)[1]
-            image_bytes = base64.b64decode(image_b64)
-            image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-            rgb_image = np.array(image)
-        except Exception as e:
-            print("❌ Error decoding image:", e)
-            return jsonify({"success": False, "error": "Invalid image data"}), 400
-
-        # Load known faces
-        if not os.path.exists("known_faces.json"):
-            return jsonify({"success": False, "error": "No known faces enrolled"}), 400
-
-        with open("known_faces.json", "r") as f:
-            known_data = json.load(f)
-
-        if not known_data.get("encodings") or not known_data.get("names"):
-            return jsonify({"success": False, "error": "Known faces database is empty"}), 400
-
-        known_encodings = [np.array(enc) for enc in known_data["encodings"]]
-        known_names = known_data["names"]
-
-        # Encode faces in captured image
-        unknown_encodings = face_recognition.face_encodings(rgb_image)
-
-        if not unknown_encodings:
-            return jsonify({"success": False, "error": "No face detected"}), 400
+            with stage("recognize", "recognition"):
+                result = recognition_pool.recognize(image, single_face, timeout=RECOGNITION_TIMEOUT)
+        except (PoolBusy, TimeoutError) as e:
+            RECOGNIZE_RESULTS.inc(result="busy")
+            retry_after = getattr(e, "retry_after", recognition_pool.retry_after())
+            print("⚠️ Recognition pool saturated:", str(e) or "timed out")
+            response = jsonify({"success": False, "error": "Server busy, please try again"})
+            return response, 503, {"Retry-After": str(retry_after)}
+
+        # decode / detect / encode / match, timed where they ran
+        observe_stages("recognize", result.get("timings"))
+        if "matches" in result or result["error"] == "no_face":
+            FACES_PER_FRAME.observe(len(result.get("matches", ())))
+        for match in result.get("matches", ()):
+            MATCH_DISTANCE.observe(match.distance, recognized=str(match.recognized).lower())
+
+        if "error" in result:
+            RECOGNIZE_RESULTS.inc(result=result["error"])
+            message, status_code = RECOGNITION_ERRORS[result["error"]]
+            return jsonify({"success": False, "error": message}), status_code
 
         # Malaysia time now (fixed UTC+8)
         now_my = datetime.now(MALAYSIA_TZ)
@@ -391,25 +871,28 @@ def recognize():
         date_iso = now_my.strftime("%Y-%m-%d")                   # "2025-11-24"
         date_slash = now_my.strftime("%d/%m/%Y")                 # "24/11/2025"
 
-        # Get place name once (for this scan)
-        place_name = get_place_name(latitude, longitude)
+        # Place name is looked up once per scan, by the first face that is
+        # not a repeat check-in
+        place_name, address_pending = None, False
 
         recognized_entries = []
+        saved_doc_ids = []
+        saved_checkin_keys = []
+        retry_after = None  # set when a face's check-in is still being saved by another request
 
-        for unknown_encoding in unknown_encodings:
-            face_distances = face_recognition.face_distance(known_encodings, unknown_encoding)
-            best_match_index = int(np.argmin(face_distances))
-            best_distance = float(face_distances[best_match_index])
+        for match in result["matches"]:
+            best_distance = match.distance
 
-            if best_distance > TOLERANCE:
+            if not match.recognized:
                 # Face not recognized; skip saving attendance
                 continue
 
-            label_name = known_names[best_match_index]
+            label_name = match.name
             print(f"🙂 Recognized face as '{label_name}' with distance {best_distance:.4f}")
 
             # 🔍 Find user in users collection by firstName == label_name
-            user_info = find_user_in_users_collection(label_name)
+            with stage("recognize", "user_lookup"):
+                user_info = find_user_in_users_collection(label_name)
 
             if user_info:
                 user_id = user_info["userId"]
@@ -424,6 +907,32 @@ def recognize():
                 full_name = label_name
                 print(f"⚠️ No matching user doc found for '{label_name}', saving with empty userId")
 
+            # Repeat scan: reuse today's check-in (or wait for the one in flight)
+            checkin_key = f"{user_id or label_name}_{date_iso}" if CHECKIN_DUPLICATE_WINDOW > 0 else None
+            if checkin_key:
+                try:
+                    previous = recent_checkins.begin(checkin_key)
+                except StillRunning as e:
+                    # Saving it here too would be the double write this check
+                    # prevents; the other faces in the frame still go ahead
+                    print("⚠️ Check-in still being saved:", e)
+                    retry_after = e.retry_after
+                    recognized_entries.append({"name": full_name, "userId": user_id, "status": "In Progress",
+                                               "inProgress": True, "distance": best_distance})
+                    continue
+                if previous is not None:
+                    print(f"🔁 '{full_name}' already checked in at {previous['timestamp']}, not saving again")
+                    recognized_entries.append(dict(previous, distance=best_distance, duplicate=True))
+                    continue
+                claimed_checkin = checkin_key
+
+            if place_name is None:
+                with stage("recognize", "geocode"):
+                    if GEOCODE_ASYNC:
+                        place_name, address_pending = get_place_name_nowait(latitude, longitude)
+                    else:
+                        place_name, address_pending = get_place_name(latitude, longitude), False
+
             # Distance for location
             dist_m = None
             dist_m_rounded = None
@@ -469,6 +978,7 @@ def recognize():
                 "checkInTimeStatus": check_in_time_status,       # "On Time" / "Late"
 
                 "checkOut": None,
+                "checkOutAt": None,
                 "checkOutDistance": None,
                 "checkOutLocation": None,
                 "checkOutStatus": None,
@@ -487,25 +997,47 @@ def recognize():
             }
 
             try:
-                db.collection(ATTENDANCE_COLLECTION).document(doc_id).set(attendance_doc, merge=True)
+                with stage("recognize", "write"):
+                    save_attendance(doc_id, attendance_doc)
+                    open_sessions.record(user_id, date_iso, doc_id, now_my)
+                    save_rollups(checkin_writes(user_id, date_iso, check_in_time_status))
+                saved_doc_ids.append(doc_id)
                 print(f"✅ Saved attendance for '{full_name}' with docId '{doc_id}' in '{ATTENDANCE_COLLECTION}'")
             except Exception as e:
                 print("❌ Error saving attendance:", e)
 
-            recognized_entries.append({
+            entry = {
                 "name": full_name,
                 "userId": user_id,
                 "status": "Check In",
                 "address": place_name,
                 "timestamp": now_my.strftime("%Y-%m-%d %H:%M:%S"),
                 "docId": doc_id,
-                "distance": best_distance,
-            })
+            }
+            if claimed_checkin:
+                # A failed save is not remembered, so the next scan tries again
+                if doc_id in saved_doc_ids:
+                    recent_checkins.finish(claimed_checkin, entry)
+                    saved_checkin_keys.append(claimed_checkin)
+                else:
+                    recent_checkins.abandon(claimed_checkin)
+                claimed_checkin = None
+            recognized_entries.append(dict(entry, distance=best_distance))
+
+        if address_pending and saved_doc_ids:
+            fill_address_later(saved_doc_ids, latitude, longitude, saved_checkin_keys)
 
         if not recognized_entries:
+            RECOGNIZE_RESULTS.inc(result="not_recognized")
             return jsonify({"success": False, "error": "Face not recognized"}), 400
-
-        primary = recognized_entries[0]
+        done = [entry for entry in recognized_entries if not entry.get("inProgress")]
+        if not done:
+            RECOGNIZE_RESULTS.inc(result="busy")
+            response = jsonify({"success": False, "recognized": recognized_entries,
+                                "error": "Check-in still in progress, please try again"})
+            return response, 503, {"Retry-After": str(retry_after)}
+        primary = done[0]
+        RECOGNIZE_RESULTS.inc(result="duplicate" if primary.get("duplicate") else "recognized")
 
         return jsonify({
             "success": True,
@@ -513,11 +1045,14 @@ def recognize():
             "name": primary["name"],
             "userId": primary["userId"],
             "status": primary["status"],
-            "address": place_name,
+            "address": primary["address"],
             "timestamp": primary["timestamp"],
+            "duplicate": primary.get("duplicate", False),
         })
 
     except Exception as e:
+        if claimed_checkin:
+            recent_checkins.abandon(claimed_checkin)
         print("❌ Error in /recognize:", e)
         return jsonify({"success": False, "error": str(e)}), 500
 
@@ -525,14 +1060,16 @@ def recognize():
 # ---------- Simple CHECKOUT (no face scan) ----------
 
 @app.route("/checkout", methods=["POST"])
+@idempotent
 def checkout():
     """
     Simple checkout:
       - Frontend sends { userId, latitude, longitude }.
-      - We look for today's attendance_test record(s) for that user.
-      - NO Firestore composite index required (we do NOT use order_by).
-      - We pick the latest document for today (by lastUpdated / timestamp) and update:
-          checkOut, checkOutLocation, lastUpdated, status.
+      - We look up today's attendance_test record for that user in the
+        open_sessions index (written on check-in); records from before the
+        index fall back to a userId + date query (no composite index needed).
+      - We update that document:
+          checkOut, checkOutAt, checkOutLocation, lastUpdated, status.
     """
     try:
         data = request.get_json(silent=True) or {}
@@ -545,54 +1082,23 @@ def checkout():
 
         now_my = datetime.now(MALAYSIA_TZ)
         today_slash = now_my.strftime("%d/%m/%Y")  # "DD/MM/YYYY"
+        today_iso = now_my.strftime("%Y-%m-%d")
 
-        attendance_ref = db.collection(ATTENDANCE_COLLECTION)
-
-        # 🔍 Query only by userId (single field) – no index needed
-        query_ref = attendance_ref.where("userId", "==", user_id)
-        docs = list(query_ref.stream())
-
-        if not docs:
-            return jsonify({
-                "success": False,
-                "error": "No check-in record found to check out from."
-            }), 404
-
-        # Filter to today's docs and pick the latest via lastUpdated / timestamp
-        today_docs = []
-        for snap in docs:
-            doc_data = snap.to_dict() or {}
-            if doc_data.get("date") == today_slash:
-                today_docs.append((snap, doc_data))
-
-        if not today_docs:
+        # 🔍 Today's check-in via the open_sessions index (memory / one get);
+        # older check-ins fall back to a userId + date query
+        with stage("checkout", "session_lookup"):
+            doc_id = open_sessions.find(user_id, today_iso, today_slash)
+        if not doc_id:
             return jsonify({
                 "success": False,
                 "error": "No check-in record found for today."
             }), 404
 
-        def get_doc_datetime(doc_data):
-            # Prefer lastUpdated (Firestore timestamp)
-            lu = doc_data.get("lastUpdated")
-            if lu is not None:
-                return lu
-            # Fallback to timestamp string
-            ts = doc_data.get("timestamp")
-            if isinstance(ts, str):
-                try:
-                    return datetime.fromisoformat(ts)
-                except Exception:
-                    return datetime.min.replace(tzinfo=MALAYSIA_TZ)
-            return datetime.min.replace(tzinfo=MALAYSIA_TZ)
-
-        # Choose latest
-        latest_snap, latest_data = max(today_docs, key=lambda pair: get_doc_datetime(pair[1]))
-        doc_ref = latest_snap.reference
-
         checkout_time_12h = now_my.strftime("%I:%M %p").lower()  # "05:32 pm"
 
         update_data = {
             "checkOut": checkout_time_12h,
+            "checkOutAt": now_my.isoformat(),    # full precision, for exports
             "lastUpdated": now_my,
             "status": "Checked out"
         }
@@ -610,8 +1116,12 @@ def checkout():
                 # ignore invalid lat/lng
                 pass
 
-        doc_ref.update(update_data)
-        print(f"✅ Checkout updated for userId '{user_id}' on doc '{doc_ref.id}'")
+        with stage("checkout", "write"):
+            save_attendance(doc_id, update_data, op="update")
+            open_sessions.close(user_id, today_iso, now_my)
+            save_rollups(checkout_writes(user_id, today_iso))
+        recent_checkins.forget(f"{user_id}_{today_iso}")
+        print(f"✅ Checkout updated for userId '{user_id}' on doc '{doc_id}'")
 
         return jsonify({
             "success": True,
@@ -625,28 +1135,179 @@ def checkout():
 
 
 # ---------- Staff Live Location API ----------
+# Latest positions live in memory (live_locations.py): updates are coalesced
+# per user, pushed to admin maps as deltas over SSE, and written to
+# staff_locations at most once a minute per user.
+LIVE_LOCATIONS_START = os.environ.get("LIVE_LOCATIONS_START", "1") == "1"
+LIVE_EVENTS_MAX_WAIT = 25    # seconds between keep-alives on the event stream
+# Each open stream holds a server thread (and a long-request slot), so streams
+# end after this long and the browser reconnects (EventSource + Last-Event-ID,
+# nothing is missed). Maps refused a slot poll /changes instead.
+LIVE_EVENTS_MAX_AGE = float(os.environ.get("LIVE_EVENTS_MAX_AGE", "300"))  # seconds
+LIVE_EVENTS_RETRY_MS = 1000  # reconnect delay the browser is told to use
+
+live_locations = LiveLocations(
+    db,
+    write=lambda collection, doc_id, data: save_attendance(doc_id, data, collection=collection),
+)
+if LIVE_LOCATIONS_START and IN_MAIN_PROCESS:
+    Thread(target=live_locations.start, name="live-locations-load", daemon=True).start()
+    atexit.register(live_locations.flush)
+
+
 @app.route("/api/staff-live-locations")
 def get_staff_live_locations():
-    """Fetch current live locations of staff from 'staff_locations' collection."""
+    """Current live locations of staff (in-memory copy of 'staff_locations')."""
     try:
-        docs = db.collection("staff_locations").stream()
-        locations = []
-        for doc_ref in docs:
-            data = doc_ref.to_dict()
-            locations.append({
-                "userId": doc_ref.id,
-                "name": data.get("name", "Unknown"),
-                "latitude": data.get("latitude"),
-                "longitude": data.get("longitude"),
-                "lastUpdated": data.get("lastUpdated"),
-                "status": data.get("status", "Offline")
-            })
+        with stage("live_locations", "snapshot"):
+            _, locations = live_locations.snapshot()
         return jsonify(locations)
     except Exception as e:
         print("❌ Error fetching live locations:", e)
         return jsonify([]), 500
 
 
+@app.route("/api/staff-live-locations/events")
+def staff_live_location_events():
+    """
+    Server-Sent Events for the live location map: one "snapshot" event with
+    everyone, then "delta" events with only the staff whose position or
+    status changed. Event ids are sequence numbers, so a reconnecting
+    EventSource (Last-Event-ID) only receives what it missed. The stream
+    closes after LIVE_EVENTS_MAX_AGE seconds and the browser reconnects;
+    503 + Retry-After when LONG_REQUEST_LIMIT streams are already open.
+    """
+    last_id = request.headers.get("Last-Event-ID") or request.args.get("since")
+    try:
+        since = int(last_id) if last_id is not None else None
+    except ValueError:
+        since = None
+
+    def generate():
+        seq = since
+        deadline = perf_counter() + LIVE_EVENTS_MAX_AGE
+        yield f"retry: {LIVE_EVENTS_RETRY_MS}\n\n"
+        while True:
+            remaining = deadline - perf_counter()
+            if remaining <= 0:
+                return
+            wait = min(LIVE_EVENTS_MAX_WAIT, remaining)
+            changes = live_locations.changes_since(seq, wait) if seq is not None else None
+            if changes is None:
+                seq, locations = live_locations.snapshot()
+                yield f"id: {seq}\nevent: snapshot\ndata: {json.dumps(locations)}\n\n"
+                continue
+            seq, changed = changes
+            if not changed:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"id: {seq}\nevent: delta\ndata: {json.dumps(changed)}\n\n"
+
+    return event_stream(generate, {"X-Accel-Buffering": "no"})
+
+
+@app.route("/api/staff-live-locations/changes")
+def staff_live_location_changes():
+    """
+    Short-poll version of the event stream, for maps that were refused a
+    stream: {"seq", "changes"} with the staff changed after ?since=<seq>, or
+    {"seq", "snapshot"} with everyone. Never blocks.
+    """
+    since = request.args.get("since", type=int)
+    changes = live_locations.changes_since(since, 0) if since is not None else None
+    if changes is None:
+        seq, locations = live_locations.snapshot()
+        return jsonify({"seq": seq, "snapshot": locations})
+    seq, changed = changes
+    return jsonify({"seq": seq, "changes": changed})
+
+
+@app.route("/api/live-locations/stats")
+def live_locations_stats():
+    return jsonify(live_locations.stats())
+
+
+# ---------- Geofences ----------
+# Office sites + every user's homeLocation. Built from user_cache while its
+# listener keeps it complete (rebuilt when it changes); otherwise from a full
+# users read, reused for GEOFENCE_USERS_TTL seconds.
+GEOFENCE_USERS_TTL = 60.0
+_geofence_index = (None, 0.0, None)   # (user_cache.version or None, built at, GeofenceIndex)
+
+
+def get_geofence_index():
+    # numpy is only needed here, not at startup
+    from geofence import GeofenceIndex, build_fences
+
+    global _geofence_index
+    version, built_at, index = _geofence_index
+    if index is not None:
+        if user_cache.complete() and version == user_cache.version:
+            return index
+        if not user_cache.complete() and version is None and perf_counter() - built_at < GEOFENCE_USERS_TTL:
+            return index
+    version = user_cache.version
+    users = user_cache.users()
+    if users is None:
+        users, version = user_cache.read_all(), None
+    index = GeofenceIndex(build_fences(OFFICE_SITES, users, WFO_RADIUS, WFH_RADIUS))
+    _geofence_index = (version, perf_counter(), index)
+    return index
+
+
+@app.route("/api/staff-geofence-status")
+def get_staff_geofence_status():
+    """
+    Latest location of every staff member with the nearest geofence (office
+    site or their own home) within 500 m, evaluated for everyone in one pass.
+    """
+    from geofence import HOME
+
+    try:
+        _, locations = live_locations.snapshot()
+        staff, lats, lngs = [], [], []
+        for data in locations:
+            try:
+                lat, lng = float(data.get("latitude")), float(data.get("longitude"))
+            except (TypeError, ValueError):
+                continue
+            staff.append((data["userId"], data))
+            lats.append(lat)
+            lngs.append(lng)
+
+        with stage("geofence_status", "evaluate"):
+            index = get_geofence_index()
+            nearest, distance, inside = index.evaluate(lats, lngs, owners=[user_id for user_id, _ in staff])
+
+        results = []
+        for k, (user_id, data) in enumerate(staff):
+            entry = {
+                "userId": user_id,
+                "name": data.get("name", "Unknown"),
+                "latitude": lats[k],
+                "longitude": lngs[k],
+                "lastUpdated": data.get("lastUpdated"),
+                "status": data.get("status", "Offline"),
+                "geofence": None,
+                "distance": None,
+                "inside": False,
+                "locationStatus": "Far from Office",
+            }
+            if nearest[k] >= 0:
+                fence = index.fences[nearest[k]]
+                entry["geofence"] = {"id": fence["id"], "name": fence["name"], "kind": fence["kind"]}
+                entry["distance"] = round(float(distance[k]), 1)
+                entry["inside"] = bool(inside[k])
+                mode = "wfh" if fence["kind"] == HOME else "wfo"
+                entry["locationStatus"] = get_location_status(float(distance[k]), mode)
+            results.append(entry)
+
+        return jsonify(results)
+    except Exception as e:
+        print("❌ Error evaluating geofences:", e)
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
 # ---------- Optional: For testing location updates ----------
 @app.route("/api/update-location", methods=["POST"])
 def update_location():
@@ -660,14 +1321,14 @@ def update_location():
 
         if not all([user_id, name, lat, lng]):
             return jsonify({"error": "Missing required fields"}), 400
+        try:
+            lat, lng = float(lat), float(lng)
+        except (TypeError, ValueError):
+            return jsonify({"error": "Invalid coordinates"}), 400
 
-        db.collection("staff_locations").document(user_id).set({
-            "name": name,
-            "latitude": lat,
-            "longitude": lng,
-            "lastUpdated": datetime.utcnow().isoformat(),
-            "status": "Active"
-        }, merge=True)
+        # Kept in memory; live_locations pushes and writes it on its own schedule
+        with stage("update_location", "update"):
+            live_locations.update(user_id, name, lat, lng, status="Active")
 
         return jsonify({"success": True})
     except Exception as e:
@@ -675,6 +1336,75 @@ def update_location():
         return jsonify({"error": str(e)}), 500
 
 
+# ---------- Warm-up / readiness ----------
+# Imports stay light; the expensive parts (storage client, dlib models, the
+# face gallery and a dummy encode in every recognition worker) are loaded by
+# a background warm-up right after startup. /ready answers 503 until it and
+# the user cache / live location loaders are done.
+# APP_WARMUP=0 leaves all of it to the first request that needs it.
+APP_WARMUP = os.environ.get("APP_WARMUP", "1") == "1"
+
+warmup_state = {"done": False, "seconds": None, "errors": {}}
+
+
+def warm_up():
+    started = perf_counter()
+    steps = [
+        ("storage", lambda: db.client),
+        ("recognition", recognition_pool.warm_up),
+    ]
+    for name, step in steps:
+        t0 = perf_counter()
+        try:
+            step()
+            print(f"✅ Warm-up: {name} ready in {perf_counter() - t0:.1f}s")
+        except Exception as e:
+            warmup_state["errors"][name] = str(e)
+            print(f"❌ Warm-up: {name} failed:", e)
+    warmup_state["seconds"] = round(perf_counter() - started, 3)
+    warmup_state["done"] = True
+
+
+if APP_WARMUP and IN_MAIN_PROCESS:
+    Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+
+@app.route("/ready")
+def ready():
+    """
+    Readiness probe: 200 once everything started in the background is
+    loaded, 503 (with what is still missing) before that. Pages and the
+    APIs work during warm-up; they just pay for whatever is not loaded yet.
+    """
+    checks = {
+        "warmup": warmup_state["done"] or not APP_WARMUP,
+        "recognition": recognition_pool.ready or not APP_WARMUP,
+        "userCache": user_cache.stats()["warmed"] or not USER_CACHE_WARM,
+        "liveLocations": live_locations.loaded or not LIVE_LOCATIONS_START,
+    }
+    is_ready = all(checks.values())
+    body = {"ready": is_ready, "checks": checks, "warmupSeconds": warmup_state["seconds"],
+            "errors": warmup_state["errors"]}
+    return jsonify(body), 200 if is_ready else 503
+
+
+# ---------- Metrics endpoint ----------
+REGISTRY.register_stats("attendance_user_cache", user_cache.stats)
+REGISTRY.register_stats("attendance_geocode_cache", geocode_cache.stats)
+REGISTRY.register_stats("attendance_writer", attendance_writer.stats)
+REGISTRY.register_stats("attendance_open_sessions", open_sessions.stats)
+REGISTRY.register_stats("attendance_live_locations", live_locations.stats)
+REGISTRY.register_stats("attendance_scan_jobs", scan_jobs.stats)
+REGISTRY.register_stats("attendance_recent_checkins", recent_checkins.stats)
+REGISTRY.register_stats("attendance_idempotency", idempotent_responses.stats)
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    """Histograms, counters and helper stats in the Prometheus text format."""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+
 # ---------- Run ----------
 if __name__ == "__main__":
     # For dev: Flask built-in server; for production: use waitress-serve
@@ -0,0 +1,221 @@
+import csv
+import importlib.util
+import io
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+# ---------- Configuration ----------
+# Attendance docs store local Malaysia time strings ("03:38 pm", "24/11/2025")
+EXPORT_TZ = timezone(timedelta(hours=8))
+CSV_CHUNK_ROWS = 1000        # rows per chunk of the HTTP response
+PARQUET_ROW_GROUP = 50000    # rows buffered per Parquet row group
+FILE_CHUNK_BYTES = 1 << 16   # chunk size when streaming a finished temp file
+
+# Normalised columns, in file order
+EXPORT_COLUMNS = [
+    "id", "userId", "name", "date", "checkInAt", "checkOutAt",
+    "checkInTimeStatus", "checkInStatus", "status", "locationType",
+    "checkInDistanceM", "checkInLat", "checkInLng", "checkOutLat", "checkOutLng",
+    "address",
+]
+DATETIME_COLUMNS = ("checkInAt", "checkOutAt")
+FLOAT_COLUMNS = ("checkInDistanceM", "checkInLat", "checkInLng", "checkOutLat", "checkOutLng")
+
+# format -> (optional package it needs, mimetype, file extension)
+FORMATS = {
+    "csv": (None, "text/csv", "csv"),
+    "xlsx": ("openpyxl", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+    "parquet": ("pyarrow", "application/vnd.apache.parquet", "parquet"),
+}
+
+
+class ExportUnavailable(Exception):
+    """Unknown format, or its optional package is not installed."""
+
+
+def check_format(fmt):
+    """Raises ExportUnavailable unless `fmt` can be written here; returns (mimetype, extension)."""
+    if fmt not in FORMATS:
+        raise ExportUnavailable(f"Unknown format '{fmt}' (use one of: {', '.join(FORMATS)})")
+    package, mimetype, extension = FORMATS[fmt]
+    if package and importlib.util.find_spec(package) is None:
+        raise ExportUnavailable(f"{fmt} export needs the '{package}' package (pip install {package})")
+    return mimetype, extension
+
+
+# ---------- Normalisation ----------
+
+def _float(value):
+    try:
+        return float(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _local_time(date_iso, time_str):
+    """'2025-11-24' + '05:32 pm' -> aware datetime, or None."""
+    if not date_iso or not isinstance(time_str, str) or not time_str.strip():
+        return None
+    try:
+        parsed = datetime.strptime(f"{date_iso} {time_str.strip()}", "%Y-%m-%d %I:%M %p")
+    except ValueError:
+        return None
+    return parsed.replace(tzinfo=EXPORT_TZ)
+
+
+def _iso_time(value):
+    """ISO timestamp string -> datetime, or None."""
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def normalize_record(record):
+    """
+    attendance_log record -> export row: one ISO date, aware datetimes for
+    check-in/out instead of the "24/11/2025" / "03:38 pm" strings, floats
+    for distance and coordinates.
+    """
+    check_in_at = _iso_time(record.get("timestamp"))
+
+    if check_in_at is not None:
+        date_iso = check_in_at.date().isoformat()
+    else:
+        try:
+            date_iso = datetime.strptime(record.get("date") or "", "%d/%m/%Y").date().isoformat()
+        except ValueError:
+            date_iso = None
+        check_in_at = _local_time(date_iso, record.get("checkIn"))
+
+    # Older records only have the minute-precision "checkOut" string; a
+    # checkout in the same minute as the check-in would land before it
+    check_out_at = _iso_time(record.get("checkOutAt"))
+    if check_out_at is None:
+        check_out_at = _local_time(date_iso, record.get("checkOut"))
+        if check_out_at is not None and check_in_at is not None and check_out_at < check_in_at:
+            check_out_at = check_in_at
+
+    check_in_loc = record.get("checkInLocation") or {}
+    check_out_loc = record.get("checkOutLocation") or {}
+    return {
+        "id": record.get("id"),
+        "userId": record.get("userId") or None,
+        "name": record.get("name"),
+        "date": date_iso,
+        "checkInAt": check_in_at,
+        "checkOutAt": check_out_at,
+        "checkInTimeStatus": record.get("checkInTimeStatus"),
+        "checkInStatus": record.get("checkInStatus"),
+        "status": record.get("status"),
+        "locationType": record.get("locationType") or None,
+        "checkInDistanceM": _float(record.get("checkInDistance")),
+        "checkInLat": _float(check_in_loc.get("latitude")),
+        "checkInLng": _float(check_in_loc.get("longitude")),
+        "checkOutLat": _float(check_out_loc.get("latitude")),
+        "checkOutLng": _float(check_out_loc.get("longitude")),
+        "address": record.get("address"),
+    }
+
+
+def _text_row(row):
+    values = []
+    for column in EXPORT_COLUMNS:
+        value = row[column]
+        if value is None:
+            values.append("")
+        elif column in DATETIME_COLUMNS:
+            values.append(value.isoformat())
+        else:
+            values.append(value)
+    return values
+
+
+# ---------- Writers (generators of bytes) ----------
+
+def csv_stream(rows, chunk_rows=CSV_CHUNK_ROWS):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_COLUMNS)
+    for i, row in enumerate(rows, 1):
+        writer.writerow(_text_row(row))
+        if i % chunk_rows == 0:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate(0)
+    yield buf.getvalue().encode("utf-8")
+
+
+def _stream_file(f):
+    f.seek(0)
+    while True:
+        chunk = f.read(FILE_CHUNK_BYTES)
+        if not chunk:
+            return
+        yield chunk
+
+
+def xlsx_stream(rows):
+    """
+    openpyxl's write-only workbook spills rows to disk as they are appended;
+    the finished file is streamed from a temp file.
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("attendance")
+    ws.append(EXPORT_COLUMNS)
+    for row in rows:
+        # Excel has no time zones: datetimes go out as ISO strings
+        ws.append(_text_row(row))
+    with tempfile.TemporaryFile() as f:
+        wb.save(f)
+        yield from _stream_file(f)
+
+
+def parquet_stream(rows, row_group=PARQUET_ROW_GROUP):
+    """Typed columns (timestamps with +08:00, float64), written one row group at a time."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    fields = []
+    for column in EXPORT_COLUMNS:
+        if column in DATETIME_COLUMNS:
+            fields.append(pa.field(column, pa.timestamp("us", tz="+08:00")))
+        elif column in FLOAT_COLUMNS:
+            fields.append(pa.field(column, pa.float64()))
+        else:
+            fields.append(pa.field(column, pa.string()))
+    schema = pa.schema(fields)
+
+    with tempfile.TemporaryFile() as f:
+        writer = pq.ParquetWriter(f, schema, compression="snappy")
+        columns = {column: [] for column in EXPORT_COLUMNS}
+        count = 0
+        for row in rows:
+            for column in EXPORT_COLUMNS:
+                columns[column].append(row[column])
+            count += 1
+            if count == row_group:
+                writer.write_table(pa.table(columns, schema=schema))
+                columns = {column: [] for column in EXPORT_COLUMNS}
+                count = 0
+        if count:
+            writer.write_table(pa.table(columns, schema=schema))
+        writer.close()
+        yield from _stream_file(f)
+
+
+WRITERS = {"csv": csv_stream, "xlsx": xlsx_stream, "parquet": parquet_stream}
+
+
+def export_stream(records, fmt):
+    """
+    attendance_log records (any iterable, e.g. iter_records()) -> generator of
+    file bytes in `fmt`. Records are normalised one at a time, so memory
+    does not grow with the number of rows.
+    """
+    check_format(fmt)
+    return WRITERS[fmt](normalize_record(record) for record in records)
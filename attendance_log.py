@@ -0,0 +1,162 @@
+import base64
+from datetime import date, datetime, timedelta
+
+# ---------- Configuration ----------
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# Page size used internally when streaming a whole export
+EXPORT_PAGE_SIZE = 500
+
+# Columns the attendance log needs; ?fields= may only narrow this down
+LOG_FIELDS = [
+    "name", "userId", "date", "timestamp", "status",
+    "checkIn", "checkInTimeStatus", "checkInStatus", "checkInDistance", "checkInLocation",
+    "checkOut", "checkOutAt", "checkOutLocation", "locationType", "address",
+]
+
+# Query parameter -> Firestore field for equality filters
+EQUALITY_FILTERS = {
+    "userId": "userId",
+    "status": "status",                    # "Check In" / "Checked out"
+    "timeStatus": "checkInTimeStatus",     # "On Time" / "Late"
+    "locationType": "locationType",        # "Office" / "Home"
+}
+
+
+class QueryError(ValueError):
+    """Bad query parameters (answered with 400)."""
+
+
+def _parse_date(value, name):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise QueryError(f"'{name}' must be YYYY-MM-DD")
+
+
+def parse_filters(args):
+    """
+    Request args -> filters dict:
+      from, to        inclusive YYYY-MM-DD (Malaysia date of the check-in)
+      userId, status, timeStatus, locationType   exact matches
+      fields          comma-separated subset of LOG_FIELDS
+      limit, cursor   page size and the nextCursor of the previous page
+    """
+    filters = {"equals": {}}
+    for key in ("from", "to"):
+        if args.get(key):
+            filters[key] = _parse_date(args[key], key)
+    if "from" in filters and "to" in filters and filters["from"] > filters["to"]:
+        raise QueryError("'from' is after 'to'")
+
+    for param, field in EQUALITY_FILTERS.items():
+        if args.get(param):
+            filters["equals"][field] = args[param]
+
+    fields = LOG_FIELDS
+    if args.get("fields"):
+        fields = [f.strip() for f in args["fields"].split(",") if f.strip()]
+        unknown = sorted(set(fields) - set(LOG_FIELDS))
+        if unknown:
+            raise QueryError(f"Unknown fields: {', '.join(unknown)}")
+    filters["fields"] = fields
+
+    try:
+        limit = int(args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise QueryError("'limit' must be a number")
+    filters["limit"] = max(1, min(MAX_PAGE_SIZE, limit))
+    filters["cursor"] = args.get("cursor") or None
+    return filters
+
+
+def encode_cursor(doc_id):
+    return base64.urlsafe_b64encode(doc_id.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    try:
+        return base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+    except Exception:
+        raise QueryError("Invalid cursor")
+
+
+def build_query(db, collection, filters):
+    """
+    Filters are pushed down to Firestore; newest first. The date range is a
+    range on the ISO "timestamp" string (all written with +08:00), so it
+    uses the same field as the ordering.
+
+    Combining userId/status/... with the ordering needs a composite index
+    (field ASC, timestamp DESC); Firestore's error message links to it.
+    """
+    query_ref = db.collection(collection)
+    for field, value in filters["equals"].items():
+        query_ref = query_ref.where(field, "==", value)
+    if "from" in filters:
+        query_ref = query_ref.where("timestamp", ">=", filters["from"].isoformat())
+    if "to" in filters:
+        day_after = filters["to"] + timedelta(days=1)
+        query_ref = query_ref.where("timestamp", "<", day_after.isoformat())
+    query_ref = query_ref.order_by("timestamp", direction="DESCENDING")
+    # The sort key is always fetched: start_after(snapshot) needs it
+    fields = list(filters["fields"])
+    if "timestamp" not in fields:
+        fields.append("timestamp")
+    return query_ref.select(fields)
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {k: _json_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_json_value(v) for v in value]
+    return value
+
+
+def record_from_snapshot(snap, fields):
+    data = snap.to_dict() or {}
+    record = {"id": snap.id}
+    for field in fields:
+        record[field] = _json_value(data.get(field))
+    return record
+
+
+def _fetch(db, collection, filters, limit, after=None):
+    """Up to `limit` snapshots after the `after` snapshot -> (snaps, has_more)."""
+    query_ref = build_query(db, collection, filters)
+    if after is not None:
+        query_ref = query_ref.start_after(after)
+    # One extra doc tells us whether there is a next page
+    snaps = list(query_ref.limit(limit + 1).stream())
+    return snaps[:limit], len(snaps) > limit
+
+
+def fetch_page(db, collection, filters):
+    """One page -> (records, next_cursor); next_cursor is None on the last page."""
+    after = None
+    if filters["cursor"]:
+        # Resuming from the last doc's snapshot keeps ties on timestamp exact
+        # (Firestore orders them by document id); costs one extra read
+        after = db.collection(collection).document(decode_cursor(filters["cursor"])).get()
+        if not after.exists:
+            raise QueryError("Cursor no longer valid")
+
+    snaps, has_more = _fetch(db, collection, filters, filters["limit"], after)
+    records = [record_from_snapshot(snap, filters["fields"]) for snap in snaps]
+    next_cursor = encode_cursor(snaps[-1].id) if has_more and snaps else None
+    return records, next_cursor
+
+
+def iter_records(db, collection, filters, page_size=EXPORT_PAGE_SIZE):
+    """All matching records, newest first, fetched page by page."""
+    after = None
+    while True:
+        snaps, has_more = _fetch(db, collection, filters, page_size, after)
+        for snap in snaps:
+            yield record_from_snapshot(snap, filters["fields"])
+        if not has_more or not snaps:
+            return
+        after = snaps[-1]
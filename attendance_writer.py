@@ -0,0 +1,316 @@
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:     # Windows
+    fcntl = None
+    import msvcrt
+
+# ---------- Configuration ----------
+WAL_FILE = "attendance_wal.jsonl"
+MAX_QUEUE = 1000          # pending writes before submit() raises WriterBusy
+BATCH_SIZE = 100          # writes per commit (Firestore allows up to 500)
+FLUSH_INTERVAL = 0.5      # seconds the first queued write may wait for company
+BACKOFF_BASE = 0.5        # seconds, doubled per retry
+BACKOFF_MAX = 30.0
+# Attempts per batch before it goes to the dead letter file (~4 min of backoff)
+MAX_ATTEMPTS = 10
+# Errors that retrying will not fix (bad data, missing doc for update, ...)
+PERMANENT_ERRORS = ("InvalidArgument", "NotFound", "FailedPrecondition", "PermissionDenied",
+                    "TypeError", "ValueError")
+
+
+class WriterBusy(Exception):
+    """The write queue is full."""
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    raise TypeError(f"Cannot store {type(value).__name__} in the write-ahead log")
+
+
+def _decode(obj):
+    if set(obj) == {"__datetime__"}:
+        return datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+
+def _lock(f, blocking):
+    """Exclusive lock on an open file until it is closed; False if another process holds it."""
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+class AttendanceWriter:
+    """
+    Deferred, batched Firestore writes for attendance docs.
+
+    submit() appends the write to a local write-ahead log (fsync'd) and
+    queues it; once it returns the write survives a crash. A background
+    thread commits queued writes as WriteBatches of up to batch_size, at
+    most flush_interval after the first one was queued, retrying with
+    exponential backoff while the error looks transient, up to max_attempts.
+    A batch rejected for good is split up and the offending writes are
+    moved to <wal>.failed; a batch that still fails after max_attempts goes
+    there whole. Committed writes are acked in the log and the log is
+    truncated whenever nothing is pending.
+
+    Each process logs to its own file, <wal>.<pid>-<id>, locked while the
+    process runs, so app processes sharing a directory never touch each
+    other's entries. On start-up (one process at a time, under <wal>.lock)
+    the unacked writes of every WAL file whose process has stopped are
+    taken over and replayed (set/merge and update are idempotent).
+
+    Writes are committed in submit order, so an update queued after a set
+    of the same doc (e.g. the async address) is applied after it.
+    """
+
+    def __init__(self, db, wal_path=WAL_FILE, max_queue=MAX_QUEUE, batch_size=BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL, fsync=True, max_attempts=MAX_ATTEMPTS):
+        self.db = db
+        self.wal_path = wal_path
+        self.max_attempts = max_attempts
+        # This process's log file, set by start()
+        self.wal_file = None
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self._queue = deque()
+        self._inflight = 0
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._wal = None
+        self._worker = None
+        self._stats = {
+            "submitted": 0,
+            "committed": 0,
+            "batches": 0,
+            "retries": 0,
+            "failed": 0,
+            "replayed": 0,
+            "flushMsTotal": 0.0,
+            "flushMsMax": 0.0,
+        }
+
+    # ---------- Public API ----------
+    def start(self):
+        """Replays the write-ahead log and starts the flush thread."""
+        with self._cond:
+            if self._worker is not None:
+                return
+            if self.wal_path:
+                self.wal_file = f"{self.wal_path}.{os.getpid()}-{uuid.uuid4().hex[:8]}"
+                self._wal = open(self.wal_file, "a", encoding="utf-8")
+                _lock(self._wal, blocking=True)
+            pending = self._replay()
+            self._queue.extend(pending)
+            self._stats["replayed"] = len(pending)
+            self._worker = threading.Thread(target=self._run, name="attendance-writer", daemon=True)
+            self._worker.start()
+        if pending:
+            print(f"⚠️ Replaying {len(pending)} attendance writes left in {self.wal_path}*")
+
+    def submit(self, collection, doc_id, data, op="set", merge=True):
+        """
+        Queues a write: op "set" (with merge) or "update". Raises WriterBusy
+        when max_queue writes are already pending.
+        """
+        if self._worker is None:
+            self.start()
+        with self._cond:
+            if len(self._queue) + self._inflight >= self.max_queue:
+                raise WriterBusy(f"{len(self._queue)} attendance writes pending")
+            self._seq += 1
+            entry = {"seq": self._seq, "collection": collection, "doc": doc_id,
+                     "op": op, "merge": merge, "data": data}
+            self._log(entry, sync=True)
+            self._queue.append(entry)
+            self._stats["submitted"] += 1
+            self._cond.notify_all()
+        return entry["seq"]
+
+    def flush(self, timeout=None):
+        """Waits until everything submitted so far is committed. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._cond.notify_all()
+            while self._queue or self._inflight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            batches = stats["batches"]
+            stats["queueDepth"] = len(self._queue)
+            stats["inflight"] = self._inflight
+            stats["flushMsTotal"] = round(stats["flushMsTotal"], 1)
+            stats["flushMsMax"] = round(stats["flushMsMax"], 1)
+            stats["avgFlushMs"] = round(stats["flushMsTotal"] / batches, 1) if batches else None
+            stats["walFile"] = self.wal_file
+            return stats
+
+    # ---------- Write-ahead log ----------
+    def _log(self, record, sync=False):
+        if self._wal is None:
+            return
+        self._wal.write(json.dumps(record, default=_encode) + "\n")
+        self._wal.flush()
+        if sync and self.fsync:
+            os.fsync(self._wal.fileno())
+
+    def _wal_files(self):
+        """Per-process WAL files next to wal_path, plus the single shared file of older versions."""
+        paths = [path for path in glob.glob(glob.escape(self.wal_path) + ".*")
+                 if not path.endswith((".failed", ".tmp", ".lock")) and path != self.wal_file]
+        if os.path.exists(self.wal_path):
+            paths.append(self.wal_path)
+        return sorted(paths, key=os.path.getmtime)
+
+    @staticmethod
+    def _unacked(f):
+        """Entries of an open WAL file that were never acked, in their original order."""
+        entries, acked = {}, set()
+        for line in f:
+            try:
+                record = json.loads(line, object_hook=_decode)
+            except ValueError:
+                continue   # torn last line after a crash
+            if "ack" in record:
+                acked.update(record["ack"])
+            else:
+                entries[record["seq"]] = record
+        return [entries[seq] for seq in sorted(entries) if seq not in acked]
+
+    def _replay(self):
+        """
+        Takes over the unacked entries of stopped processes: logs them into
+        this process's file (with new seqs), then deletes theirs.
+        """
+        if not self.wal_path:
+            return []
+        pending = []
+        with open(self.wal_path + ".lock", "a") as lock_file:
+            _lock(lock_file, blocking=True)
+            for path in self._wal_files():
+                try:
+                    f = open(path, "r", encoding="utf-8")
+                except FileNotFoundError:
+                    continue
+                with f:
+                    if not _lock(f, blocking=False):
+                        continue    # its process is still running
+                    entries = self._unacked(f)
+                for entry in entries:
+                    self._seq += 1
+                    entry = dict(entry, seq=self._seq)
+                    self._log(entry)
+                    pending.append(entry)
+                if entries and self.fsync:
+                    os.fsync(self._wal.fileno())
+                os.remove(path)
+        return pending
+
+    # ---------- Flush thread ----------
+    def _next_batch(self):
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            # Give later writes a chance to join this batch
+            deadline = time.monotonic() + self.flush_interval
+            while len(self._queue) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            self._inflight = len(batch)
+            return batch
+
+    def _commit(self, entries):
+        batch = self.db.batch()
+        for entry in entries:
+            ref = self.db.collection(entry["collection"]).document(entry["doc"])
+            if entry["op"] == "update":
+                batch.update(ref, entry["data"])
+            else:
+                batch.set(ref, entry["data"], merge=entry["merge"])
+        batch.commit()
+
+    def _commit_with_retry(self, entries):
+        """
+        Commits, backing off on transient errors. Returns "committed",
+        "rejected" (a permanent error) or "exhausted" (max_attempts used up).
+        """
+        delay = BACKOFF_BASE
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                self._commit(entries)
+                return "committed"
+            except Exception as e:
+                if type(e).__name__ in PERMANENT_ERRORS:
+                    print(f"❌ Attendance batch of {len(entries)} rejected:", e)
+                    return "rejected"
+                if attempt == self.max_attempts:
+                    print(f"❌ Attendance batch of {len(entries)} failed {attempt} times, giving up:", e)
+                    return "exhausted"
+                print(f"⚠️ Attendance batch of {len(entries)} failed, retrying in {delay:.1f}s:", e)
+                with self._cond:
+                    self._stats["retries"] += 1
+                time.sleep(delay)
+                delay = min(delay * 2, BACKOFF_MAX)
+
+    def _dead_letter(self, entries):
+        if not entries or not self.wal_path:
+            return
+        with open(self.wal_path + ".failed", "a", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, default=_encode) + "\n")
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            started = time.monotonic()
+
+            result = self._commit_with_retry(batch)
+            if result == "committed":
+                failed = []
+            elif result == "rejected":
+                # One bad write must not hold the others back: retry them one by one
+                failed = [entry for entry in batch if self._commit_with_retry([entry]) != "committed"]
+            else:
+                # Storage has been failing for minutes; don't stall the queue behind this batch
+                failed = batch
+            self._dead_letter(failed)
+
+            flush_ms = (time.monotonic() - started) * 1e3
+            with self._cond:
+                self._log({"ack": [entry["seq"] for entry in batch]})
+                self._stats["committed"] += len(batch) - len(failed)
+                self._stats["failed"] += len(failed)
+                self._stats["batches"] += 1
+                self._stats["flushMsTotal"] += flush_ms
+                self._stats["flushMsMax"] = max(self._stats["flushMsMax"], flush_ms)
+                self._inflight = 0
+                if not self._queue and self._wal is not None:
+                    self._wal.truncate(0)
+                self._cond.notify_all()
@@ -0,0 +1,117 @@
+"""
+One-time backfill of the open_sessions index from existing attendance docs.
+
+For every (userId, date) it writes open_sessions/{userId}_{YYYY-MM-DD}
+pointing at that day's latest attendance doc, so /checkout never has to
+fall back to querying attendance for check-ins made before the index
+existed. Safe to re-run (docs are set with merge).
+
+Usage (from the project root):
+    python backfill_open_sessions.py                 # today only
+    python backfill_open_sessions.py --since 2025-01-01
+    python backfill_open_sessions.py --all --dry-run
+
+Only the attendance docs in the window are read: "today" queries date ==
+dd/mm/YYYY and --since a range on the ISO "timestamp" (docs written without
+a timestamp are only picked up by --all).
+
+Reads and writes through the same STORAGE_BACKEND as the app (storage.py).
+"""
+import argparse
+from datetime import datetime, timedelta, timezone
+
+from open_sessions import OPEN_SESSIONS_COLLECTION, doc_datetime, session_id
+from storage import open_storage
+
+MALAYSIA_TZ = timezone(timedelta(hours=8))
+ATTENDANCE_COLLECTION = "attendance_test"
+BATCH_SIZE = 400   # Firestore allows 500 writes per batch
+
+
+def attendance_query(db, attendance_collection, since=None, day=None):
+    """
+    The attendance docs to index: one day (YYYY-MM-DD, on the "date" field),
+    everything from `since` on (on "timestamp"), or the whole collection.
+    """
+    query_ref = db.collection(attendance_collection)
+    if day:
+        return query_ref.where("date", "==", datetime.strptime(day, "%Y-%m-%d").strftime("%d/%m/%Y"))
+    if since:
+        return query_ref.where("timestamp", ">=", since)
+    return query_ref
+
+
+def collect_sessions(db, attendance_collection, since=None, day=None):
+    """
+    Streams the matching attendance docs once and returns
+    {(userId, date_iso): (attendance doc id, data)} for the latest doc per day.
+    """
+    latest = {}
+    scanned = 0
+    since = since or day
+    for snap in attendance_query(db, attendance_collection, since, day).stream():
+        scanned += 1
+        data = snap.to_dict() or {}
+        user_id = data.get("userId")
+        try:
+            date_iso = datetime.strptime(data.get("date") or "", "%d/%m/%Y").strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+        if not user_id or (since and date_iso < since) or (day and date_iso != day):
+            continue
+
+        key = (user_id, date_iso)
+        current = latest.get(key)
+        if current is None or doc_datetime(data, MALAYSIA_TZ) > doc_datetime(current[1], MALAYSIA_TZ):
+            latest[key] = (snap.id, data)
+    return latest, scanned
+
+
+def write_sessions(db, sessions, collection=OPEN_SESSIONS_COLLECTION, batch_size=BATCH_SIZE):
+    batch, pending, written = db.batch(), 0, 0
+    for (user_id, date_iso), (doc_id, data) in sessions.items():
+        ref = db.collection(collection).document(session_id(user_id, date_iso))
+        batch.set(ref, {
+            "userId": user_id,
+            "date": date_iso,
+            "attendanceDocId": doc_id,
+            "checkIn": data.get("lastUpdated"),
+            "checkOut": data.get("lastUpdated") if data.get("checkOut") else None,
+        }, merge=True)
+        pending += 1
+        if pending >= batch_size:
+            batch.commit()
+            written += pending
+            batch, pending = db.batch(), 0
+    if pending:
+        batch.commit()
+        written += pending
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--since", help="first date to index (YYYY-MM-DD, default: today)")
+    parser.add_argument("--all", action="store_true", help="index every day on record")
+    parser.add_argument("--collection", default=ATTENDANCE_COLLECTION)
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be written")
+    args = parser.parse_args()
+
+    db = open_storage()
+
+    if args.all:
+        sessions, scanned = collect_sessions(db, args.collection)
+    elif args.since:
+        sessions, scanned = collect_sessions(db, args.collection, since=args.since)
+    else:
+        sessions, scanned = collect_sessions(db, args.collection, day=datetime.now(MALAYSIA_TZ).strftime("%Y-%m-%d"))
+    print(f"Scanned {scanned} attendance docs, {len(sessions)} sessions to index")
+
+    if args.dry_run:
+        return
+    written = write_sessions(db, sessions)
+    print(f"✅ Wrote {written} docs to '{OPEN_SESSIONS_COLLECTION}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark: /checkout lookup of today's attendance doc, old full-history
+scan vs. the open_sessions index, against a fake Firestore seeded with
+years of check-ins.
+
+Run from the project root:
+    python -m benchmarks.bench_checkout
+    python -m benchmarks.bench_checkout --staff 100 --years 3 --rpc-ms 20 --doc-us 100
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from backfill_open_sessions import MALAYSIA_TZ, collect_sessions, write_sessions
+from benchmarks.fake_firestore import FakeFirestore
+from open_sessions import OpenSessions, doc_datetime
+
+COLLECTION = "attendance_test"
+
+
+def seed(db, staff, years, today):
+    """One check-in per user per weekday for `years` years, ending today."""
+    day = today - timedelta(days=365 * years)
+    count = 0
+    while day.date() <= today.date():
+        if day.weekday() < 5:
+            date_iso, date_slash = day.strftime("%Y-%m-%d"), day.strftime("%d/%m/%Y")
+            for i in range(staff):
+                checked_in = day.replace(hour=9, minute=i % 60)
+                db._write(COLLECTION, f"Staff{i}_{date_iso}", {
+                    "userId": f"user{i}",
+                    "name": f"Staff {i}",
+                    "date": date_slash,
+                    "checkIn": checked_in.strftime("%I:%M %p").lower(),
+                    "lastUpdated": checked_in,
+                    "timestamp": checked_in.isoformat(),
+                    "status": "Check In",
+                }, merge=False)
+                count += 1
+        day += timedelta(days=1)
+    return count
+
+
+def legacy_lookup(db, user_id, today_slash):
+    """The original /checkout: every doc of the user, filtered in Python."""
+    docs = list(db.collection(COLLECTION).where("userId", "==", user_id).stream())
+    today_docs = [(snap, snap.to_dict() or {}) for snap in docs]
+    today_docs = [(snap, data) for snap, data in today_docs if data.get("date") == today_slash]
+    if not today_docs:
+        return None
+    return max(today_docs, key=lambda pair: doc_datetime(pair[1], MALAYSIA_TZ))[0].id
+
+
+def run(label, db, users, lookup):
+    db.reset_counters()
+    t0 = time.perf_counter()
+    found = [lookup(user_id) for user_id in users]
+    ms = (time.perf_counter() - t0) / len(users) * 1e3
+    print(f"{label:>22} {ms:>9.2f} ms/checkout  {db.reads / len(users):>8.1f} docs read/checkout")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--staff", type=int, default=50)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--checkouts", type=int, default=50)
+    parser.add_argument("--rpc-ms", type=float, default=5.0, help="simulated round trip per RPC")
+    parser.add_argument("--doc-us", type=float, default=20.0, help="simulated cost per document read")
+    args = parser.parse_args()
+
+    db = FakeFirestore()
+    today = datetime.now(MALAYSIA_TZ)
+    while today.weekday() >= 5:
+        today -= timedelta(days=1)
+    count = seed(db, args.staff, args.years, today)
+    date_iso, date_slash = today.strftime("%Y-%m-%d"), today.strftime("%d/%m/%Y")
+    print(f"{args.staff} staff, {args.years} years, {count} attendance docs, "
+          f"rpc={args.rpc_ms}ms doc={args.doc_us}us")
+
+    db.rpc_ms, db.doc_us = args.rpc_ms, args.doc_us
+    users = [f"user{i % args.staff}" for i in range(args.checkouts)]
+
+    expected = run("legacy full scan", db, users, lambda u: legacy_lookup(db, u, date_slash))
+    # Before the backfill: the userId + date fallback query
+    found = run("user+date fallback", db, users,
+                lambda u: OpenSessions(db, COLLECTION, tz=MALAYSIA_TZ, write=lambda *a: None).find(u, date_iso, date_slash))
+    assert found == expected
+
+    db.rpc_ms, db.doc_us = 0.0, 0.0
+    sessions, _ = collect_sessions(db, COLLECTION, since=date_iso)
+    write_sessions(db, sessions)
+    db.rpc_ms, db.doc_us = args.rpc_ms, args.doc_us
+
+    found = run("open_sessions get()", db, users,
+                lambda u: OpenSessions(db, COLLECTION, tz=MALAYSIA_TZ).find(u, date_iso, date_slash))
+    assert found == expected
+    sessions_cache = OpenSessions(db, COLLECTION, tz=MALAYSIA_TZ)
+    for user_id in set(users):
+        sessions_cache.find(user_id, date_iso, date_slash)
+    found = run("in-process cache", db, users, lambda u: sessions_cache.find(u, date_iso, date_slash))
+    assert found == expected
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark: /recognize image intake, per stage. The original JSON body with a
+base64 PNG data URL vs. a base64 JPEG vs. a raw JPEG upload (multipart /
+octet-stream), with and without libjpeg draft-mode decoding.
+
+Each face in faces/ is pasted into a 640x480 camera frame and a 4000x3000
+phone photo. The draft decode is also checked against the full decode:
+same faces found, and encodings within a small distance.
+
+Run from the project root:
+    python -m benchmarks.bench_decode
+    python -m benchmarks.bench_decode --repeat 10 --skip-faces
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+from face_detect import DETECT_MAX_SIDE, detect_and_encode, downscale
+from recognition_pool import decode_image
+
+SIZES = {"camera 640x480": (640, 480), "phone 4000x3000": (4000, 3000)}
+
+
+def load_frames(faces_dir, size):
+    """Every reference face centred on a grey frame of `size`, as RGB arrays."""
+    frames = []
+    for filename in sorted(os.listdir(faces_dir)):
+        if not filename.lower().endswith((".jpg", ".jpeg", ".png")):
+            continue
+        face = Image.open(os.path.join(faces_dir, filename)).convert("RGB")
+        target_h = size[1] // 2
+        face = face.resize((max(1, face.width * target_h // face.height), target_h), Image.BILINEAR)
+        frame = Image.new("RGB", size, (128, 128, 128))
+        frame.paste(face, ((size[0] - face.width) // 2, (size[1] - face.height) // 2))
+        frames.append(frame)
+    return frames
+
+
+def encode(frame, fmt):
+    buf = io.BytesIO()
+    frame.save(buf, format=fmt, **({"quality": 90} if fmt == "JPEG" else {}))
+    return buf.getvalue()
+
+
+def legacy_decode(body):
+    """The original /recognize path, stage by stage."""
+    stages = {}
+    t0 = time.perf_counter()
+    data = json.loads(body)
+    t1 = time.perf_counter()
+    image_b64 = data["image"].split(",", 1)[1]
+    image_bytes = base64.b64decode(image_b64)
+    t2 = time.perf_counter()
+    rgb = np.array(Image.open(io.BytesIO(image_bytes)).convert("RGB"))
+    t3 = time.perf_counter()
+    stages["json"], stages["base64"], stages["decode"] = t1 - t0, t2 - t1, t3 - t2
+    return rgb, stages
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    rgb = fn(*args)
+    return rgb, {"decode": time.perf_counter() - t0}
+
+
+def run(label, payloads, fn, repeat):
+    totals = {}
+    size = 0
+    for _ in range(repeat):
+        for payload in payloads:
+            rgb, stages = fn(payload)
+            t0 = time.perf_counter()
+            downscale(rgb, DETECT_MAX_SIDE)
+            stages["downscale"] = time.perf_counter() - t0
+            for stage, seconds in stages.items():
+                totals[stage] = totals.get(stage, 0.0) + seconds
+    for payload in payloads:
+        size += len(payload)
+    n = repeat * len(payloads)
+    parts = "  ".join(f"{stage}={seconds / n * 1e3:6.2f}" for stage, seconds in totals.items())
+    total = sum(totals.values()) / n * 1e3
+    print(f"  {label:<24} {size / len(payloads) / 1e3:>7.0f} kB  total={total:7.2f} ms  ({parts})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--faces-dir", default="faces")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip-faces", action="store_true", help="skip the detection/encoding check")
+    args = parser.parse_args()
+
+    for size_label, size in SIZES.items():
+        frames = load_frames(args.faces_dir, size)
+        png = [encode(f, "PNG") for f in frames]
+        jpeg = [encode(f, "JPEG") for f in frames]
+        json_png = [json.dumps({"image": "data:image/png;base64," + base64.b64encode(b).decode()}) for b in png]
+        json_jpeg = [json.dumps({"image": "data:image/jpeg;base64," + base64.b64encode(b).decode()}) for b in jpeg]
+        print(f"{size_label}, {len(frames)} frames (per-frame ms)")
+
+        run("JSON base64 PNG (old)", json_png, legacy_decode, args.repeat)
+        run("JSON base64 JPEG", json_jpeg,
+            lambda body: timed(lambda b: decode_image(json.loads(b)["image"]), body), args.repeat)
+        run("raw JPEG", jpeg, lambda b: timed(decode_image, b), args.repeat)
+        run("raw JPEG, draft decode", jpeg, lambda b: timed(decode_image, b, DETECT_MAX_SIDE), args.repeat)
+
+        if args.skip_faces:
+            continue
+        same, worst = 0, 0.0
+        for data in jpeg:
+            _, full = detect_and_encode(decode_image(data))
+            _, draft = detect_and_encode(decode_image(data, DETECT_MAX_SIDE))
+            if len(full) == len(draft):
+                same += 1
+                if full:
+                    worst = max(worst, float(np.linalg.norm(full[0] - draft[0])))
+        print(f"  draft vs full decode: same face count for {same}/{len(jpeg)} frames, "
+              f"max encoding distance {worst:.3f} (compare with TOLERANCE in app.py)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark: full-resolution face_encodings() vs. the downscale-and-crop fast path.
+
+Uses the reference images in faces/ as the fixed image set.
+Run from the project root:
+    python -m benchmarks.bench_detect
+    python -m benchmarks.bench_detect --max-side 480 --upsample 1 --largest-only
+"""
+import argparse
+import os
+import time
+
+import face_recognition
+import numpy as np
+from PIL import Image
+
+from face_detect import DETECT_MAX_SIDE, DETECT_UPSAMPLE, DETECTION_MODEL, detect_and_encode
+
+
+def load_image_set(faces_dir):
+    images = []
+    for root, _, files in os.walk(faces_dir):
+        for filename in sorted(files):
+            if filename.lower().endswith((".jpg", ".jpeg", ".png")):
+                path = os.path.join(root, filename)
+                images.append((path, np.array(Image.open(path).convert("RGB"))))
+    return images
+
+
+def percentiles(samples_ms):
+    p50, p95, p99 = np.percentile(samples_ms, [50, 95, 99])
+    return f"p50={p50:7.1f}  p95={p95:7.1f}  p99={p99:7.1f} ms"
+
+
+def run(label, images, fn, repeat):
+    samples = []
+    faces = 0
+    for _ in range(repeat):
+        for _, rgb in images:
+            t0 = time.perf_counter()
+            encodings = fn(rgb)
+            samples.append((time.perf_counter() - t0) * 1e3)
+            faces += len(encodings)
+    print(f"{label:<8} {percentiles(samples)}  faces/image={faces / (repeat * len(images)):.2f}")
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--faces-dir", default="faces")
+    parser.add_argument("--max-side", type=int, default=DETECT_MAX_SIDE)
+    parser.add_argument("--model", default=DETECTION_MODEL)
+    parser.add_argument("--upsample", type=int, default=DETECT_UPSAMPLE)
+    parser.add_argument("--largest-only", action="store_true")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    images = load_image_set(args.faces_dir)
+    sizes = [f"{rgb.shape[1]}x{rgb.shape[0]}" for _, rgb in images]
+    print(f"{len(images)} images ({', '.join(sorted(set(sizes)))})")
+
+    run("before", images, lambda rgb: face_recognition.face_encodings(rgb), args.repeat)
+    run("after", images,
+        lambda rgb: detect_and_encode(rgb, args.max_side, args.model, args.upsample, args.largest_only)[1],
+        args.repeat)
+
+
+if __name__ == "__main__":
+    main()
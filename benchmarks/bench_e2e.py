@@ -0,0 +1,466 @@
+"""
+Load test: the check-in path end to end. Concurrent clients send /recognize
+check-ins, /checkout and dashboard reads to the real Flask app, either
+through the Flask test client or (--server) over HTTP to a local threaded
+server in this process. The app's dependencies are replaced with:
+
+  - a synthetic gallery: the enrolled faces in known_faces.bin plus
+    --gallery random identities,
+  - a fixed image corpus: every face in faces/ in a 640x480 camera frame (JPEG),
+  - FakeFirestore with a simulated round trip, seeded with the users,
+  - a stub geocoder that sleeps --geocode-ms instead of calling Nominatim.
+
+Reports throughput and p50/p95/p99 latency per endpoint and per stage
+(decode, detect, encode, match, user lookup, geocode, write; summed per
+request) and saves everything as JSON, so runs on different commits can be
+compared with --compare. With --workers > 0 recognition runs in worker
+processes and decode/detect/encode/match only show up as "recognize".
+
+Run from the project root:
+    python -m benchmarks.bench_e2e
+    python -m benchmarks.bench_e2e --clients 8 --requests 400 --gallery 20000
+    python -m benchmarks.bench_e2e --server --compare benchmarks/results/e2e-abc1234.json
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from benchmarks.bench_decode import encode, load_frames
+from benchmarks.bench_matcher import synthetic_gallery
+from benchmarks.fake_firestore import FakeFirestore
+
+STAGES = ("decode", "detect", "encode", "match", "recognize", "user_lookup", "geocode", "write")
+RESULTS_DIR = os.path.join("benchmarks", "results")
+
+
+# ---------- Fixtures ----------
+
+def write_gallery(path, source, extra, samples=3, seed=0):
+    """The enrolled faces plus `extra` synthetic samples (`samples` per identity)."""
+    from face_store import load_encodings, write_store
+
+    names, matrix, _ = load_encodings(source)
+    names, matrix = list(names), np.asarray(matrix, dtype=np.float32)
+    identities = extra // samples
+    if identities:
+        rng = np.random.default_rng(seed)
+        centres = synthetic_gallery(identities, seed=seed)
+        synthetic = np.repeat(centres, samples, axis=0) + rng.normal(0.0, 0.02, size=(identities * samples, 128))
+        names += [f"Synthetic {i:06d}" for i in range(identities) for _ in range(samples)]
+        matrix = np.vstack([matrix, synthetic.astype(np.float32)])
+    write_store(path, names, matrix)
+    return sorted(set(names))
+
+
+def seed_firestore(db, labels, history_days, today):
+    """A users doc per gallery identity and `history_days` of check-ins for the real ones."""
+    for i, label in enumerate(labels):
+        db._write("users", f"user{i:06d}", {"firstName": label, "lastName": "Test", "role": "staff"}, False)
+    real = [(i, label) for i, label in enumerate(labels) if not label.startswith("Synthetic ")]
+    for d in range(1, history_days + 1):
+        day = today - timedelta(days=d)
+        for i, label in real:
+            checked_in = day.replace(hour=9, minute=i % 60)
+            db._write("attendance_test", f"{label}_{day:%Y-%m-%d}", {
+                "userId": f"user{i:06d}",
+                "name": f"{label} Test",
+                "date": day.strftime("%d/%m/%Y"),
+                "checkIn": checked_in.strftime("%I:%M %p").lower(),
+                "timestamp": checked_in.isoformat(),
+                "status": "Checked out",
+            }, False)
+
+
+def stub_geocoder(delay_s):
+    def resolve(lat, lng):
+        time.sleep(delay_s)
+        return f"Stub place {lat:.4f}, {lng:.4f}"
+    return resolve
+
+
+# ---------- Stage timing ----------
+
+class StageRecorder:
+    """
+    Wraps app functions so their time is added to the current request's
+    stage totals (thread-local, set up around the WSGI app). Calls outside
+    a request – background geocoding, batched writes – are kept apart.
+    """
+
+    def __init__(self):
+        self.requests = defaultdict(list)     # path -> [{stage: seconds}, ...]
+        self.background = defaultdict(list)   # stage -> [seconds, ...]
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def wrap(self, stage, fn):
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - t0
+                stages = getattr(self._local, "stages", None)
+                if stages is not None:
+                    stages[stage] = stages.get(stage, 0.0) + seconds
+                else:
+                    with self._lock:
+                        self.background[stage].append(seconds)
+        return timed
+
+    def middleware(self, wsgi_app):
+        def app(environ, start_response):
+            self._local.stages = {}
+            try:
+                return list(wsgi_app(environ, start_response))
+            finally:
+                stages, self._local.stages = self._local.stages, None
+                with self._lock:
+                    self.requests[environ.get("PATH_INFO", "")].append(stages)
+        return app
+
+    def reset(self):
+        with self._lock:
+            self.requests.clear()
+            self.background.clear()
+
+
+def instrument(app_module, recorder):
+    import face_detect
+    import face_gallery
+    import recognition_pool
+
+    recognition_pool.decode_image = recorder.wrap("decode", recognition_pool.decode_image)
+    face_detect.detect_faces = recorder.wrap("detect", face_detect.detect_faces)
+    face_detect.encode_faces = recorder.wrap("encode", face_detect.encode_faces)
+    face_gallery.FaceGallery.match = recorder.wrap("match", face_gallery.FaceGallery.match)
+    pool = app_module.recognition_pool
+    pool.recognize = recorder.wrap("recognize", pool.recognize)
+    cache = app_module.user_cache
+    cache.lookup = recorder.wrap("user_lookup", cache.lookup)
+    app_module.get_place_name = recorder.wrap("geocode", app_module.get_place_name)
+    app_module.get_place_name_nowait = recorder.wrap("geocode", app_module.get_place_name_nowait)
+    app_module.save_attendance = recorder.wrap("write", app_module.save_attendance)
+    app_module.app.wsgi_app = recorder.middleware(app_module.app.wsgi_app)
+
+
+# ---------- Clients ----------
+
+class TestClient:
+    def __init__(self, flask_app):
+        self.client = flask_app.test_client()
+
+    def recognize(self, jpeg, fields):
+        form = dict(fields, image=(io.BytesIO(jpeg), "frame.jpg"))
+        response = self.client.post("/recognize", data=form, content_type="multipart/form-data")
+        return response.status_code, response.get_data()
+
+    def checkout(self, payload):
+        response = self.client.post("/checkout", json=payload)
+        return response.status_code, response.get_data()
+
+    def get(self, path):
+        response = self.client.get(path)
+        return response.status_code, response.get_data()
+
+
+class HTTPClient:
+    """Raw JPEG bodies (fields in the query string), stdlib only."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+
+    def _send(self, path, body=None, content_type=None):
+        req = urllib.request.Request(self.base_url + path, data=body,
+                                     headers={"Content-Type": content_type} if content_type else {})
+        try:
+            with urllib.request.urlopen(req, timeout=60) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def recognize(self, jpeg, fields):
+        return self._send("/recognize?" + urllib.parse.urlencode(fields), jpeg, "image/jpeg")
+
+    def checkout(self, payload):
+        return self._send("/checkout", json.dumps(payload).encode(), "application/json")
+
+    def get(self, path):
+        return self._send(path)
+
+
+def plan(args, corpus, user_ids, office, seed=0):
+    """The request mix, in order: ("recognize", jpeg, fields) / ("checkout", payload) / ("get", path)."""
+    rng = random.Random(seed)
+    requests = []
+    for n in range(args.warmup + args.requests):
+        roll = rng.random()
+        if roll < args.checkouts:
+            requests.append(("checkout", {"userId": rng.choice(user_ids),
+                                          "latitude": office[0], "longitude": office[1]}))
+        elif roll < args.checkouts + args.dashboards:
+            requests.append(("get", rng.choice(["/api/attendance?limit=50", "/api/stats/daily"])))
+        else:
+            lat, lng = office
+            if rng.random() < args.away:
+                # Somewhere in the city: a geocode cache miss most of the time
+                lat, lng = lat + rng.uniform(-0.2, 0.2), lng + rng.uniform(-0.2, 0.2)
+            else:
+                lat, lng = lat + rng.uniform(-0.0003, 0.0003), lng + rng.uniform(-0.0003, 0.0003)
+            requests.append(("recognize", corpus[n % len(corpus)],
+                             {"latitude": lat, "longitude": lng, "work_mode": "wfo"}))
+    return requests
+
+
+def endpoint(request):
+    return {"recognize": "/recognize", "checkout": "/checkout"}.get(request[0]) or request[1].split("?")[0]
+
+
+def error_of(body):
+    try:
+        return json.loads(body).get("error")
+    except (ValueError, AttributeError):
+        return None
+
+
+def drive(make_client, requests, clients):
+    """
+    Sends `requests` from `clients` threads.
+    Returns [(endpoint, status, error, seconds), ...] and the wall time.
+    """
+    results = []
+    lock = threading.Lock()
+    queue = iter(requests)
+
+    def worker():
+        client = make_client()
+        while True:
+            with lock:
+                request = next(queue, None)
+            if request is None:
+                return
+            t0 = time.perf_counter()
+            if request[0] == "recognize":
+                status, body = client.recognize(request[1], request[2])
+            elif request[0] == "checkout":
+                status, body = client.checkout(request[1])
+            else:
+                status, body = client.get(request[1])
+            seconds = time.perf_counter() - t0
+            error = error_of(body) if status >= 400 else None
+            with lock:
+                results.append((endpoint(request), status, error, seconds))
+
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+# ---------- Report ----------
+
+def percentiles(seconds):
+    if not seconds:
+        return None
+    p50, p95, p99 = np.percentile(np.asarray(seconds) * 1e3, [50, 95, 99])
+    return {"count": len(seconds), "mean": round(float(np.mean(seconds)) * 1e3, 3),
+            "p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3)}
+
+
+def summarize(results, wall, recorder):
+    report = {"requests": len(results), "seconds": round(wall, 3),
+              "throughput": round(len(results) / wall, 2) if wall else None, "endpoints": {}}
+    by_endpoint = defaultdict(list)
+    for path, status, error, seconds in results:
+        by_endpoint[path].append((status, error, seconds))
+    for path, rows in sorted(by_endpoint.items()):
+        stage_totals = recorder.requests.get(path, [])
+        report["endpoints"][path] = {
+            "status": dict(Counter(str(status) for status, _, _ in rows)),
+            "errors": dict(Counter(error for _, error, _ in rows if error)),
+            "latency_ms": percentiles([seconds for _, _, seconds in rows]),
+            # Requests that never reached a stage count as 0 for it
+            "stages_ms": {stage: percentiles([totals.get(stage, 0.0) for totals in stage_totals])
+                          for stage in STAGES if any(stage in totals for totals in stage_totals)},
+        }
+    report["background_ms"] = {stage: percentiles(samples) for stage, samples in sorted(recorder.background.items())}
+    return report
+
+
+def print_report(report):
+    print(f"{report['requests']} requests in {report['seconds']:.1f}s -> {report['throughput']} req/s")
+    for path, entry in report["endpoints"].items():
+        latency = entry["latency_ms"]
+        print(f"  {path:<20} p50={latency['p50']:8.2f} p95={latency['p95']:8.2f} p99={latency['p99']:8.2f} ms  "
+              f"status={entry['status']}")
+        for error, count in entry["errors"].items():
+            print(f"    {count} x {error}")
+        for stage, stats in entry["stages_ms"].items():
+            print(f"    {stage:<16} p50={stats['p50']:8.2f} p95={stats['p95']:8.2f} p99={stats['p99']:8.2f} ms")
+    for stage, stats in report["background_ms"].items():
+        print(f"  (background) {stage:<9} p50={stats['p50']:8.2f} p95={stats['p95']:8.2f} ms  x{stats['count']}")
+
+
+def compare(report, old_path):
+    """p50/p95/p99 change against an earlier result file (positive = slower)."""
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    print(f"vs. {old_path} (commit {old.get('commit')}): throughput {old.get('throughput')} -> {report['throughput']} req/s")
+
+    def line(label, new, before):
+        if not new or not before:
+            return
+        parts = []
+        for key in ("p50", "p95", "p99"):
+            change = (new[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+            parts.append(f"{key} {before[key]:8.2f} -> {new[key]:8.2f} ({change:+5.1f}%)")
+        print(f"  {label:<28} " + "  ".join(parts))
+
+    for path, entry in report["endpoints"].items():
+        old_entry = old.get("endpoints", {}).get(path, {})
+        line(path, entry["latency_ms"], old_entry.get("latency_ms"))
+        for stage, stats in entry["stages_ms"].items():
+            line(f"  {stage}", stats, old_entry.get("stages_ms", {}).get(stage))
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=4, help="concurrent clients")
+    parser.add_argument("--requests", type=int, default=200, help="timed requests (after --warmup)")
+    parser.add_argument("--warmup", type=int, default=8)
+    parser.add_argument("--checkouts", type=float, default=0.2, help="fraction of requests that are /checkout")
+    parser.add_argument("--dashboards", type=float, default=0.1, help="fraction that are dashboard reads")
+    parser.add_argument("--away", type=float, default=0.3, help="fraction of check-ins away from the office")
+    parser.add_argument("--gallery", type=int, default=5000, help="synthetic gallery samples on top of the enrolled faces")
+    parser.add_argument("--faces-dir", default="faces")
+    parser.add_argument("--history-days", type=int, default=30, help="days of past check-ins seeded per enrolled user")
+    parser.add_argument("--rpc-ms", type=float, default=20.0, help="simulated Firestore round trip")
+    parser.add_argument("--doc-us", type=float, default=20.0, help="simulated cost per document read")
+    parser.add_argument("--geocode-ms", type=float, default=300.0, help="stub geocoder delay")
+    parser.add_argument("--workers", type=int, default=0, help="recognition processes (0 = inline, per-stage timings)")
+    parser.add_argument("--sync-writes", action="store_true", help="ATTENDANCE_DEFERRED_WRITES=0")
+    parser.add_argument("--sync-geocode", action="store_true", help="GEOCODE_ASYNC=0")
+    parser.add_argument("--duplicate-window", type=float, default=0.0,
+                        help="CHECKIN_DUPLICATE_WINDOW; 0 keeps every repeat check-in a full write")
+    parser.add_argument("--server", action="store_true", help="go over HTTP to a local threaded server")
+    parser.add_argument("--out", help=f"result file (default: {RESULTS_DIR}/e2e-<commit>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare with")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_e2e_")
+    # Configuration app.py reads at import: no Firebase, Nominatim or background loaders
+    os.environ.update({
+        "STORAGE_BACKEND": "sqlite",
+        "STORAGE_SQLITE_FILE": os.path.join(tmp, "unused.sqlite3"),
+        "GEOCODE_CACHE_FILE": "",
+        "OFFICE_PLACE_NAME": "Office",
+        "GEOCODE_ASYNC": "0" if args.sync_geocode else "1",
+        "CHECKIN_DUPLICATE_WINDOW": str(args.duplicate_window),
+        "ATTENDANCE_DEFERRED_WRITES": "0" if args.sync_writes else "1",
+        "ATTENDANCE_WAL_FILE": os.path.join(tmp, "attendance_wal.jsonl"),
+        "RECOGNITION_WORKERS": str(args.workers),
+        "USER_CACHE_WARM": "0",
+        "APP_WARMUP": "0",
+        "LIVE_LOCATIONS_START": "0",
+    })
+    import app as app_module
+    from geocode_cache import GeocodeCache
+    from recognition_pool import RecognitionPool
+
+    gallery_path = os.path.join(tmp, "known_faces.bin")
+    labels = write_gallery(gallery_path, app_module.KNOWN_FACES_FILE, args.gallery)
+    corpus = [encode(frame, "JPEG") for frame in load_frames(args.faces_dir, (640, 480))]
+
+    db = FakeFirestore()
+    today = datetime.now(app_module.MALAYSIA_TZ)
+    seed_firestore(db, labels, args.history_days, today)
+    db.rpc_ms, db.doc_us = args.rpc_ms, args.doc_us
+    for name in ("db", "attendance_writer", "open_sessions", "user_cache", "live_locations"):
+        target = app_module if name == "db" else getattr(app_module, name)
+        target.db = db
+
+    recorder = StageRecorder()
+    geocode_cache = GeocodeCache(recorder.wrap("geocode_resolve", stub_geocoder(args.geocode_ms / 1e3)),
+                                 path=None, min_interval=0)
+    geocode_cache.add_anchor(app_module.OFFICE_LAT, app_module.OFFICE_LNG, app_module.WFO_RADIUS, name="Office")
+    app_module.geocode_cache = geocode_cache
+    old_pool = app_module.recognition_pool
+    app_module.recognition_pool = RecognitionPool(
+        args.workers, gallery_path, app_module.TOLERANCE, detect_options=old_pool.detect_options,
+        queue_size=max(old_pool.queue_size, args.clients), draft_decode=old_pool.draft_decode)
+    instrument(app_module, recorder)
+
+    print(f"{len(labels)} identities ({args.gallery} synthetic samples), {len(corpus)} corpus frames, "
+          f"{args.clients} clients, rpc={args.rpc_ms}ms geocode={args.geocode_ms}ms workers={args.workers}")
+    t0 = time.perf_counter()
+    app_module.recognition_pool.start()
+    app_module.user_cache.warm()
+    print(f"  recognition models + gallery + user cache warm in {time.perf_counter() - t0:.1f}s")
+
+    server = None
+    if args.server:
+        from werkzeug.serving import make_server
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+        server = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_port}"
+        make_client = lambda: HTTPClient(base_url)
+    else:
+        make_client = lambda: TestClient(app_module.app)
+
+    user_ids = [f"user{labels.index(label):06d}" for label in labels if not label.startswith("Synthetic ")]
+    requests = plan(args, corpus, user_ids, (app_module.OFFICE_LAT, app_module.OFFICE_LNG))
+    drive(make_client, requests[:args.warmup], args.clients)
+    recorder.reset()
+    db.reset_counters()
+    results, wall = drive(make_client, requests[args.warmup:], args.clients)
+    if server is not None:
+        server.shutdown()
+    app_module.attendance_writer.flush(10.0)
+
+    report = {"commit": git_commit(), "timestamp": datetime.now().isoformat(timespec="seconds"),
+              "config": vars(args), "python": sys.version.split()[0]}
+    report.update(summarize(results, wall, recorder))
+    report["firestore"] = {"reads": db.reads, "writes": db.writes, "rpcs": db.rpcs}
+    report["attendanceWriter"] = app_module.attendance_writer.stats()
+    report["geocodeCache"] = geocode_cache.stats()
+    print_report(report)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"e2e-{report['commit'] or 'nogit'}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"✅ Results saved to {out}")
+    if args.compare:
+        compare(report, args.compare)
+    app_module.recognition_pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark: streaming attendance export (attendance_log.iter_records ->
+attendance_export.export_stream) for a large synthetic history.
+
+The store below answers the same order_by / select / start_after / limit
+queries iter_records() sends, generating each page on demand, so a million
+rows never sit in memory at once (FakeFirestore keeps every doc in a dict
+and rescans it per page, which does not scale to 1M).
+
+Run from the project root:
+    python -m benchmarks.bench_export
+    python -m benchmarks.bench_export --rows 100000 --formats csv parquet
+"""
+import argparse
+import resource
+import time
+from datetime import datetime, timedelta, timezone
+
+from attendance_export import check_format, export_stream
+from attendance_log import iter_records, parse_filters
+
+MALAYSIA_TZ = timezone(timedelta(hours=8))
+
+
+class _Snapshot:
+    def __init__(self, index, data):
+        self.index = index
+        self.id = f"Staff{index % 200}_{index:08d}"
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class SyntheticAttendance:
+    """Newest-first attendance docs 0..rows-1, built per page. Filters are ignored."""
+
+    def __init__(self, rows, rpc_ms=0.0):
+        self.rows = rows
+        self.rpc_ms = rpc_ms
+        self.pages = 0
+        self._start = 0
+        self._limit = None
+        self._base = datetime(2026, 1, 1, 9, 0, tzinfo=MALAYSIA_TZ)
+
+    # Query interface used by attendance_log
+    def collection(self, _name):
+        return self._query(0, None)
+
+    def _query(self, start, limit):
+        q = SyntheticAttendance.__new__(SyntheticAttendance)
+        q.__dict__.update(self.__dict__)
+        q._root = getattr(self, "_root", self)
+        q._start, q._limit = start, limit
+        return q
+
+    def where(self, *args, **kwargs):
+        return self
+
+    def order_by(self, *args, **kwargs):
+        return self
+
+    def select(self, _fields):
+        return self
+
+    def start_after(self, snap):
+        return self._query(snap.index + 1, self._limit)
+
+    def limit(self, count):
+        return self._query(self._start, count)
+
+    def _doc(self, i):
+        checked_in = self._base - timedelta(minutes=7 * i)
+        return {
+            "name": f"Staff {i % 200}",
+            "userId": f"user{i % 200}",
+            "date": checked_in.strftime("%d/%m/%Y"),
+            "timestamp": checked_in.isoformat(),
+            "status": "Checked out" if i % 3 else "Check In",
+            "checkIn": checked_in.strftime("%I:%M %p").lower(),
+            "checkInTimeStatus": "Late" if i % 7 == 0 else "On Time",
+            "checkInStatus": "At Office",
+            "checkInDistance": str(round((i % 900) / 10, 1)),
+            "checkInLocation": {"latitude": 3.2051 + (i % 10) * 1e-4, "longitude": 101.7201},
+            "checkOut": "05:32 pm" if i % 3 else None,
+            "checkOutLocation": {"latitude": 3.2051, "longitude": 101.7201} if i % 3 else None,
+            "locationType": "Office",
+            "address": "Setapak Central Mall",
+        }
+
+    def stream(self):
+        self._root.pages += 1
+        if self.rpc_ms:
+            time.sleep(self.rpc_ms / 1e3)
+        end = self.rows if self._limit is None else min(self.rows, self._start + self._limit)
+        for i in range(self._start, end):
+            yield _Snapshot(i, self._doc(i))
+
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--formats", nargs="+", default=["csv", "parquet", "xlsx"])
+    parser.add_argument("--rpc-ms", type=float, default=0.0, help="simulated round trip per page")
+    args = parser.parse_args()
+
+    print(f"{args.rows} rows, pages of 500, rpc={args.rpc_ms}ms, start rss={max_rss_mb():.0f} MB")
+    for fmt in args.formats:
+        check_format(fmt)
+        store = SyntheticAttendance(args.rows, args.rpc_ms)
+        filters = parse_filters({})
+
+        t0 = time.perf_counter()
+        size = 0
+        for chunk in export_stream(iter_records(store, "attendance_test", filters), fmt):
+            size += len(chunk)
+        elapsed = time.perf_counter() - t0
+        print(f"{fmt:>8} {elapsed:>7.1f}s  {args.rows / elapsed:>9.0f} rows/s  "
+              f"{size / 1e6:>8.1f} MB out  {store.pages} pages  peak rss so far {max_rss_mb():.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
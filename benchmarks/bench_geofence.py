@@ -0,0 +1,134 @@
+"""
+Benchmark: geofence status for every staff member's live location, scalar
+haversine loop vs. a NumPy (staff x sites) matrix vs. GeofenceIndex.
+
+Staff are spread over the Klang Valley (half of them near an office site,
+a quarter at home), each with their own home fence.
+
+Run from the project root:
+    python -m benchmarks.bench_geofence
+    python -m benchmarks.bench_geofence --staff 10000 --sites 50
+"""
+import argparse
+import math
+import time
+
+import numpy as np
+
+from geofence import NEAR_M, GeofenceIndex, build_fences, haversine_m
+
+CENTER = (3.139, 101.6869)   # Kuala Lumpur
+SPREAD_DEG = 0.25            # ~28 km either way
+
+
+def scalar_haversine(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 6371e3 * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def make_world(staff, sites, seed=0):
+    rng = np.random.default_rng(seed)
+    site_lat = CENTER[0] + rng.uniform(-SPREAD_DEG, SPREAD_DEG, sites)
+    site_lng = CENTER[1] + rng.uniform(-SPREAD_DEG, SPREAD_DEG, sites)
+    office_sites = [{"id": f"site{i}", "name": f"Site {i}", "lat": float(site_lat[i]), "lng": float(site_lng[i])}
+                    for i in range(sites)]
+
+    home_lat = CENTER[0] + rng.uniform(-SPREAD_DEG, SPREAD_DEG, staff)
+    home_lng = CENTER[1] + rng.uniform(-SPREAD_DEG, SPREAD_DEG, staff)
+    users = [{"userId": f"user{i}", "fullName": f"Staff {i}",
+              "home_lat": float(home_lat[i]), "home_lng": float(home_lng[i])} for i in range(staff)]
+
+    # Where everyone is right now: ~0.001 deg (~110 m) jitter around a site or home
+    kind = rng.uniform(size=staff)
+    at_site = rng.integers(0, sites, staff)
+    lats = np.where(kind < 0.5, site_lat[at_site], np.where(kind < 0.75, home_lat,
+                    CENTER[0] + rng.uniform(-SPREAD_DEG, SPREAD_DEG, staff)))
+    lngs = np.where(kind < 0.5, site_lng[at_site], np.where(kind < 0.75, home_lng,
+                    CENTER[1] + rng.uniform(-SPREAD_DEG, SPREAD_DEG, staff)))
+    lats = lats + rng.normal(0, 0.001, staff)
+    lngs = lngs + rng.normal(0, 0.001, staff)
+    return office_sites, users, lats, lngs
+
+
+def scalar_status(fences, lats, lngs, owners):
+    """Per staff: every office site + their own home, one haversine call each."""
+    offices = [f for f in fences if f["kind"] == "office"]
+    homes = {f["owner"]: f for f in fences if f["kind"] == "home"}
+    result = []
+    for lat, lng, owner in zip(lats.tolist(), lngs.tolist(), owners):
+        best, best_d = -1, math.inf
+        candidates = offices + ([homes[owner]] if owner in homes else [])
+        for fence in candidates:
+            d = scalar_haversine(fence["lat"], fence["lng"], lat, lng)
+            if d < best_d:
+                best, best_d = fence["id"], d
+        result.append(best if best_d <= NEAR_M else None)
+    return result
+
+
+def matrix_status(fences, lats, lngs, owners):
+    """(staff x sites) distance matrix + one home distance per staff member."""
+    offices = [f for f in fences if f["kind"] == "office"]
+    homes = {f["owner"]: f for f in fences if f["kind"] == "home"}
+    site_lat = np.array([f["lat"] for f in offices])
+    site_lng = np.array([f["lng"] for f in offices])
+    d = haversine_m(lats[:, None], lngs[:, None], site_lat[None, :], site_lng[None, :])
+    best = np.argmin(d, axis=1)
+    best_d = d[np.arange(len(lats)), best]
+    home_lat = np.array([homes[o]["lat"] for o in owners])
+    home_lng = np.array([homes[o]["lng"] for o in owners])
+    home_d = haversine_m(lats, lngs, home_lat, home_lng)
+    result = []
+    for k, owner in enumerate(owners):
+        if home_d[k] < best_d[k]:
+            result.append(homes[owner]["id"] if home_d[k] <= NEAR_M else None)
+        else:
+            result.append(offices[best[k]]["id"] if best_d[k] <= NEAR_M else None)
+    return result
+
+
+def index_status(index, lats, lngs, owners):
+    nearest, _, _ = index.evaluate(lats, lngs, owners)
+    return [index.fences[i]["id"] if i >= 0 else None for i in nearest.tolist()]
+
+
+def run(label, fn, repeat):
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    ms = (time.perf_counter() - t0) / repeat * 1e3
+    print(f"{label:>28}: {ms:8.2f} ms per evaluation")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--staff", type=int, default=10000)
+    parser.add_argument("--sites", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    office_sites, users, lats, lngs = make_world(args.staff, args.sites)
+    owners = [u["userId"] for u in users]
+    fences = build_fences(office_sites, users, office_radius=100.0, home_radius=500.0)
+    print(f"{args.staff} staff, {args.sites} office sites, {len(fences)} fences")
+
+    t0 = time.perf_counter()
+    index = GeofenceIndex(fences)
+    print(f"{'index build':>28}: {(time.perf_counter() - t0) * 1e3:8.2f} ms")
+
+    expected = run("scalar haversine loop", lambda: scalar_status(fences, lats, lngs, owners), 1)
+    found = run("numpy staff x sites matrix", lambda: matrix_status(fences, lats, lngs, owners), args.repeat)
+    assert found == expected
+    found = run("GeofenceIndex.evaluate", lambda: index_status(index, lats, lngs, owners), args.repeat)
+    assert found == expected
+    matched = sum(1 for f in found if f is not None)
+    print(f"{matched} of {args.staff} staff within {NEAR_M:.0f} m of a fence")
+
+
+if __name__ == "__main__":
+    main()
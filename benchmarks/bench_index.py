@@ -0,0 +1,55 @@
+"""
+Benchmark: recall / latency trade-off of the IVF face index vs. exact search.
+
+Run from the project root:
+    python -m benchmarks.bench_index
+    python -m benchmarks.bench_index --size 50000 --nprobe 1 4 8 16 32
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.bench_matcher import synthetic_gallery
+from face_index import IVFIndex
+from face_matcher import match_batch, squared_norms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=50000)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--noise", type=float, default=0.03, help="probe jitter around an enrolled face")
+    args = parser.parse_args()
+
+    gallery = synthetic_gallery(args.size)
+    sq_norms = squared_norms(gallery)
+    rng = np.random.default_rng(1)
+    picks = rng.integers(0, args.size, size=args.queries)
+    probes = gallery[picks] + rng.normal(0.0, args.noise, size=(args.queries, gallery.shape[1]))
+
+    t0 = time.perf_counter()
+    index = IVFIndex.build(gallery)
+    build_s = time.perf_counter() - t0
+    print(f"N={args.size}  nlist={len(index.centroids)}  build={build_s:.2f}s")
+
+    exact_idx, _, _ = match_batch(probes, gallery, sq_norms)
+    t0 = time.perf_counter()
+    for probe in probes:
+        match_batch(probe, gallery, sq_norms)
+    exact_ms = (time.perf_counter() - t0) / args.queries * 1e3
+    print(f"{'exact':>8} {exact_ms:>9.3f} ms/probe  recall@1=1.000")
+
+    for nprobe in args.nprobe:
+        index.nprobe = nprobe
+        t0 = time.perf_counter()
+        found = np.array([index.match(probe, gallery, sq_norms)[0][0] for probe in probes])
+        ivf_ms = (time.perf_counter() - t0) / args.queries * 1e3
+        recall = float(np.mean(found == exact_idx))
+        print(f"{'nprobe=' + str(nprobe):>8} {ivf_ms:>9.3f} ms/probe  recall@1={recall:.3f}  "
+              f"({exact_ms / ivf_ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark: live location updates, writing every update to staff_locations
+and polling the full list (old behaviour) vs. LiveLocations (coalesced
+publishes, rate-limited writes, SSE deltas).
+
+Every staff member sends a position every --period seconds: most of them
+are standing still (GPS jitter of a few metres), --moving of them drive.
+
+Run from the project root:
+    python -m benchmarks.bench_live_locations
+    python -m benchmarks.bench_live_locations --staff 2000 --period 0.5 --seconds 20
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+
+from benchmarks.fake_firestore import FakeFirestore
+from live_locations import LiveLocations
+
+POLL_INTERVAL = 5.0   # how often the old admin map re-fetched the whole list
+
+
+def positions(staff, moving, period, seed=0):
+    rng = random.Random(seed)
+    base = [(3.139 + rng.uniform(-0.2, 0.2), 101.6869 + rng.uniform(-0.2, 0.2)) for _ in range(staff)]
+    heading = [rng.uniform(0, 2 * math.pi) for _ in range(staff)]
+    drivers = set(rng.sample(range(staff), int(staff * moving)))
+
+    def at(i, step):
+        lat, lng = base[i]
+        if i in drivers:
+            metres = 15.0 * period * step     # ~54 km/h
+            lat += metres * math.cos(heading[i]) / 111320
+            lng += metres * math.sin(heading[i]) / 111320
+        jitter = 3.0 / 111320
+        return lat + rng.uniform(-jitter, jitter), lng + rng.uniform(-jitter, jitter)
+    return at
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--staff", type=int, default=1000)
+    parser.add_argument("--period", type=float, default=1.0, help="seconds between updates per staff member")
+    parser.add_argument("--moving", type=float, default=0.2, help="fraction of staff that are driving")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    at = positions(args.staff, args.moving, args.period)
+    steps = int(args.seconds / args.period)
+    updates = steps * args.staff
+
+    # Old: one set(merge=True) per update; the map polls the whole list
+    legacy = {f"user{i}": {"name": f"Staff {i}", "latitude": 0.0, "longitude": 0.0,
+                           "lastUpdated": "2026-01-01T00:00:00.000000", "status": "Active"}
+              for i in range(args.staff)}
+    full_list = len(json.dumps([dict(v, userId=k) for k, v in legacy.items()]))
+    polls = args.seconds / POLL_INTERVAL
+    print(f"{args.staff} staff, an update every {args.period}s, {args.moving:.0%} moving, "
+          f"{args.seconds:.0f}s -> {updates} updates")
+    print(f"{'old':>6}: {updates:>7} Firestore writes  "
+          f"{full_list * polls / 1e3:>9.0f} kB to each map (poll every {POLL_INTERVAL:.0f}s, changes up to {POLL_INTERVAL:.0f}s late)")
+
+    # New: in-memory, coalesced, rate-limited
+    db = FakeFirestore(0, 0)
+    live = LiveLocations(db)
+    live.start()
+    received = {"bytes": 0, "events": 0}
+    done = threading.Event()
+
+    def subscriber():
+        seq, snapshot = live.snapshot()
+        received["bytes"] += len(json.dumps(snapshot))
+        while not done.is_set():
+            changes = live.changes_since(seq, 0.5)
+            if changes is None:
+                seq, snapshot = live.snapshot()
+                received["bytes"] += len(json.dumps(snapshot))
+                continue
+            seq, changed = changes
+            if changed:
+                received["bytes"] += len(json.dumps(changed))
+                received["events"] += 1
+
+    listener = threading.Thread(target=subscriber, daemon=True)
+    listener.start()
+
+    started = time.perf_counter()
+    update_time = 0.0
+    for step in range(steps):
+        t0 = time.perf_counter()
+        for i in range(args.staff):
+            lat, lng = at(i, step)
+            live.update(f"user{i}", f"Staff {i}", lat, lng)
+        update_time += time.perf_counter() - t0
+        time.sleep(max(0.0, started + (step + 1) * args.period - time.perf_counter()))
+    done.set()
+    listener.join()
+    live.stop()
+
+    stats = live.stats()
+    print(f"{'new':>6}: {db.writes:>7} Firestore writes  "
+          f"{received['bytes'] / 1e3:>9.0f} kB to each map ({received['events']} delta events, pushed within ~1s)")
+    print(f"        update() {update_time / updates * 1e6:.1f} us each; {stats['jitter']} jitter-only, "
+          f"{stats['coalesced']} coalesced, {stats['published']} published")
+
+
+if __name__ == "__main__":
+    main()
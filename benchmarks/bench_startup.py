@@ -0,0 +1,100 @@
+"""
+Benchmark: cold start of app.py. Each run is a fresh interpreter that
+imports app, then times the first template route and the first /recognize,
+either straight away ("cold") or once /ready says the warm-up is done.
+
+Run from the project root:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --runs 5 --workers 0 --backend firestore
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+from benchmarks.bench_decode import encode, load_frames
+
+CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import app
+timings = {"import": time.perf_counter() - t0}
+client = app.app.test_client()
+mode, frame_path, result_path = sys.argv[1:4]
+
+if mode != "import":
+    t0 = time.perf_counter()
+    client.get("/")
+    timings["first_page"] = time.perf_counter() - t0
+
+if mode == "warm":
+    t0 = time.perf_counter()
+    while client.get("/ready").status_code == 503 and time.perf_counter() - t0 < 120:
+        time.sleep(0.05)
+    timings["ready"] = time.perf_counter() - t0
+
+if mode in ("cold", "warm"):
+    with open(frame_path, "rb") as f:
+        frame = f.read()
+    t0 = time.perf_counter()
+    response = client.post("/recognize", data=frame, content_type="image/jpeg")
+    timings["first_recognize"] = time.perf_counter() - t0
+    timings["status"] = response.status_code
+    app.recognition_pool.shutdown()
+
+# A file rather than stdout: background threads print too
+with open(result_path, "w") as f:
+    json.dump(timings, f)
+"""
+
+
+def run_child(mode, frame_path, env):
+    result_path = frame_path + ".json"
+    if os.path.exists(result_path):
+        os.remove(result_path)
+    out = subprocess.run([sys.executable, "-c", CHILD, mode, frame_path, result_path],
+                         env=dict(os.environ, **env), capture_output=True, text=True, timeout=600)
+    if not os.path.exists(result_path):
+        raise RuntimeError(f"child failed:\n{out.stderr[-2000:]}")
+    with open(result_path, "r") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=2, help="RECOGNITION_WORKERS")
+    parser.add_argument("--backend", default="sqlite", help="STORAGE_BACKEND for the child processes")
+    parser.add_argument("--faces-dir", default="faces")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_startup_")
+    frame_path = os.path.join(tmp, "frame.jpg")
+    with open(frame_path, "wb") as f:
+        f.write(encode(load_frames(args.faces_dir, (640, 480))[0], "JPEG"))
+    env = {
+        "STORAGE_BACKEND": args.backend,
+        "STORAGE_SQLITE_FILE": os.path.join(tmp, "attendance.sqlite3"),
+        "GEOCODE_CACHE_FILE": os.path.join(tmp, "geocode_cache.sqlite3"),
+        "OFFICE_PLACE_NAME": "Office",
+        "ATTENDANCE_WAL_FILE": os.path.join(tmp, "attendance_wal.jsonl"),
+        "RECOGNITION_WORKERS": str(args.workers),
+    }
+    print(f"backend={args.backend} workers={args.workers}, median of {args.runs} runs (ms)")
+
+    for mode in ("import", "cold", "warm"):
+        if mode != "import" and args.backend != "sqlite":
+            continue    # requests would go to the real project
+        runs = [run_child(mode, frame_path, env) for _ in range(args.runs)]
+        keys = [k for k in runs[0] if k != "status"]
+        parts = "  ".join(f"{k}={np.median([r[k] for r in runs]) * 1e3:8.1f}" for k in keys)
+        status = {r.get("status") for r in runs} - {None}
+        print(f"  {mode:<6} {parts}" + (f"  status={sorted(status)}" if status else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark: the reads the app makes, against Firestore (FakeFirestore with a
+simulated round trip), the local SQLite backend and the read-through cache
+(Firestore + SQLite copy).
+
+Run from the project root:
+    python -m benchmarks.bench_storage
+    python -m benchmarks.bench_storage --staff 100 --days 365 --rpc-ms 40
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from attendance_log import fetch_page, parse_filters
+from benchmarks.fake_firestore import FakeFirestore
+from storage import CachedStore, SQLiteStore
+
+COLLECTION = "attendance_test"
+
+
+def seed(stores, staff, days):
+    today = datetime(2026, 1, 1, 9, 0)
+    count = 0
+    for store in stores:
+        batch = store.batch()
+        for i in range(staff):
+            batch.set(store.collection("users").document(f"user{i}"),
+                      {"firstName": f"Staff {i}", "lastName": "X", "role": "staff"})
+        batch.commit()
+    for d in range(days):
+        day = today - timedelta(days=d)
+        if day.weekday() >= 5:
+            continue
+        batches = [store.batch() for store in stores]
+        for i in range(staff):
+            checked_in = day.replace(minute=i % 60)
+            doc = {
+                "userId": f"user{i}",
+                "name": f"Staff {i}",
+                "date": day.strftime("%d/%m/%Y"),
+                "timestamp": checked_in.isoformat(),
+                "status": "Check In",
+            }
+            for store, batch in zip(stores, batches):
+                batch.set(store.collection(COLLECTION).document(f"Staff {i}_{day:%Y-%m-%d}"), doc)
+            count += 1
+        for batch in batches:
+            batch.commit()
+    return count, today
+
+
+def run(label, fn, repeat):
+    fn()
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1e3)
+    p50, p95 = np.percentile(samples, [50, 95])
+    return f"{label}: p50={p50:6.2f} p95={p95:6.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--staff", type=int, default=50)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--rpc-ms", type=float, default=30.0, help="simulated Firestore round trip")
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    remote = FakeFirestore()
+    local = SQLiteStore(":memory:")
+    count, today = seed([remote, local], args.staff, args.days)
+    cached = CachedStore(remote, SQLiteStore(":memory:"))
+    remote.rpc_ms = args.rpc_ms
+    print(f"{args.staff} staff, {count} attendance docs, Firestore round trip {args.rpc_ms} ms")
+
+    date_slash = today.strftime("%d/%m/%Y")
+    doc_id = f"Staff 7_{today:%Y-%m-%d}"
+    reads = {
+        "user by firstName": lambda db: list(db.collection("users").where("firstName", "==", "Staff 7").limit(1).stream()),
+        "doc get by id": lambda db: db.collection(COLLECTION).document(doc_id).get(),
+        "userId + date": lambda db: list(db.collection(COLLECTION).where("userId", "==", "user7")
+                                         .where("date", "==", date_slash).stream()),
+        "log page of 50": lambda db: fetch_page(db, COLLECTION, parse_filters({"limit": "50"})),
+        "user's month": lambda db: fetch_page(db, COLLECTION, parse_filters(
+            {"userId": "user7", "from": (today - timedelta(days=30)).strftime("%Y-%m-%d"), "limit": "50"})),
+    }
+    for name, read in reads.items():
+        results = [run(label, lambda db=db: read(db), args.repeat)
+                   for label, db in (("firestore", remote), ("sqlite", local), ("cached", cached))]
+        print(f"{name:>18}  " + "   ".join(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""
+In-memory stand-in for the parts of firebase_admin.firestore.Client the app
+uses, for benchmarks that must not touch the real project.
+
+    db = FakeFirestore(rpc_ms=5, doc_us=50)
+    db.collection("users").document("u1").set({"firstName": "Ali"})
+
+Every RPC (get/stream/commit) sleeps rpc_ms, plus doc_us per document
+returned, so "documents read" shows up in the timings the way it does
+against Firestore. db.reads / db.writes / db.rpcs count what was used.
+"""
+import copy
+import threading
+import time
+
+_OPS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a is not None and a < b,
+    "<=": lambda a, b: a is not None and a <= b,
+    ">": lambda a, b: a is not None and a > b,
+    ">=": lambda a, b: a is not None and a >= b,
+    "in": lambda a, b: a in b,
+    "array_contains": lambda a, b: isinstance(a, list) and b in a,
+}
+
+
+class NotFound(Exception):
+    """Same name as google.api_core.exceptions.NotFound (update of a missing doc)."""
+
+
+def _get_field(data, path):
+    value = data
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def _apply(current, data, merge=False):
+    """
+    Applies a write payload, resolving Increment sentinels and dotted keys.
+    merge=True merges nested maps like set(..., merge=True) does.
+    """
+    for key, value in data.items():
+        target = current
+        parts = key.split(".")
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        name = parts[-1]
+        if type(value).__name__ == "Increment":
+            target[name] = (target.get(name) or 0) + value.value
+        elif type(value).__name__ == "Sentinel" and "delete" in repr(value).lower():
+            target.pop(name, None)
+        elif merge and isinstance(value, dict) and isinstance(target.get(name), dict):
+            _apply(target[name], value, merge=True)
+        else:
+            target[name] = copy.deepcopy(value)
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return _get_field(self._data or {}, field)
+
+
+class FakeDocumentRef:
+    def __init__(self, db, collection, doc_id):
+        self._db = db
+        self._collection = collection
+        self.id = doc_id
+
+    @property
+    def path(self):
+        return f"{self._collection}/{self.id}"
+
+    def get(self):
+        self._db._rpc(1)
+        with self._db._lock:
+            data = self._db._docs(self._collection).get(self.id)
+            return FakeSnapshot(self, copy.deepcopy(data))
+
+    def set(self, data, merge=False):
+        self._db._rpc(0)
+        self._db._write(self._collection, self.id, data, merge)
+
+    def update(self, data):
+        self._db._rpc(0)
+        self._db._update(self._collection, self.id, data)
+
+    def delete(self):
+        self._db._rpc(0)
+        self._db._delete(self._collection, self.id)
+
+
+class FakeQuery:
+    def __init__(self, db, collection, filters=(), orders=(), limit=None, offset=0,
+                 start_after=None, fields=None):
+        self._db = db
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._offset = offset
+        self._start_after = start_after
+        self._fields = fields
+
+    def _copy(self, **changes):
+        state = dict(filters=self._filters, orders=self._orders, limit=self._limit,
+                     offset=self._offset, start_after=self._start_after, fields=self._fields)
+        state.update(changes)
+        return FakeQuery(self._db, self._collection, **state)
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field_path, _OPS[op_string], value),))
+
+    def order_by(self, field_path, direction="ASCENDING"):
+        return self._copy(orders=self._orders + ((field_path, direction == "DESCENDING"),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def offset(self, count):
+        return self._copy(offset=count)
+
+    def start_after(self, snapshot_or_values):
+        return self._copy(start_after=snapshot_or_values)
+
+    def select(self, field_paths):
+        return self._copy(fields=list(field_paths))
+
+    def _results(self):
+        with self._db._lock:
+            rows = [(doc_id, data) for doc_id, data in self._db._docs(self._collection).items()
+                    if all(op(_get_field(data, field), value) for field, op, value in self._filters)]
+            rows = [(doc_id, copy.deepcopy(data)) for doc_id, data in rows]
+
+        # Firestore breaks ties on the document id
+        rows.sort(key=lambda row: row[0])
+        for field, descending in reversed(self._orders):
+            rows.sort(key=lambda row: ((_get_field(row[1], field) is not None), _get_field(row[1], field)),
+                      reverse=descending)
+
+        if self._start_after is not None:
+            if isinstance(self._start_after, FakeSnapshot):
+                cursor_id = self._start_after.id
+                ids = [row[0] for row in rows]
+                rows = rows[ids.index(cursor_id) + 1:] if cursor_id in ids else rows
+            else:
+                cursor = self._start_after
+                if isinstance(cursor, dict):
+                    cursor = [cursor.get(field) for field, _ in self._orders]
+                rows = [row for row in rows if self._after(row, list(cursor))]
+
+        rows = rows[self._offset:]
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        if self._fields is not None:
+            rows = [(doc_id, {f: _get_field(data, f) for f in self._fields if _get_field(data, f) is not None})
+                    for doc_id, data in rows]
+        return rows
+
+    def _after(self, row, cursor):
+        for (field, descending), value in zip(self._orders, cursor):
+            current = _get_field(row[1], field)
+            if current == value:
+                continue
+            return (current < value) if descending else (current > value)
+        return False
+
+    def stream(self):
+        rows = self._results()
+        self._db._rpc(len(rows))
+        for doc_id, data in rows:
+            yield FakeSnapshot(FakeDocumentRef(self._db, self._collection, doc_id), data)
+
+    def get(self):
+        return list(self.stream())
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, db, name):
+        super().__init__(db, name)
+        self.id = name
+
+    def document(self, doc_id=None):
+        if doc_id is None:
+            with self._db._lock:
+                self._db._auto_id += 1
+                doc_id = f"auto{self._db._auto_id:08d}"
+        return FakeDocumentRef(self._db, self._collection, doc_id)
+
+    def on_snapshot(self, callback):
+        raise NotImplementedError("FakeFirestore has no listeners")
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self._db = db
+        self._ops = []
+
+    def set(self, ref, data, merge=False):
+        self._ops.append(("set", ref, data, merge))
+
+    def update(self, ref, data):
+        self._ops.append(("update", ref, data, None))
+
+    def delete(self, ref):
+        self._ops.append(("delete", ref, None, None))
+
+    def commit(self):
+        self._db._rpc(0)
+        # All-or-nothing like a real batch: check updates before applying anything
+        created = set()
+        for op, ref, data, merge in self._ops:
+            if op == "set":
+                created.add(ref.path)
+            elif op == "update" and ref.path not in created and ref.id not in self._db._docs(ref._collection):
+                raise NotFound(ref.path)
+        for op, ref, data, merge in self._ops:
+            if op == "set":
+                self._db._write(ref._collection, ref.id, data, merge)
+            elif op == "update":
+                self._db._update(ref._collection, ref.id, data)
+            else:
+                self._db._delete(ref._collection, ref.id)
+        self._ops = []
+
+
+class FakeFirestore:
+    def __init__(self, rpc_ms=0.0, doc_us=0.0):
+        self.rpc_ms = rpc_ms
+        self.doc_us = doc_us
+        self.reads = 0
+        self.writes = 0
+        self.rpcs = 0
+        self._data = {}
+        self._auto_id = 0
+        self._lock = threading.RLock()
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def reset_counters(self):
+        self.reads = self.writes = self.rpcs = 0
+
+    # ---------- Internals ----------
+    def _docs(self, collection):
+        return self._data.setdefault(collection, {})
+
+    def _rpc(self, docs_read):
+        with self._lock:
+            self.rpcs += 1
+            self.reads += docs_read
+        delay = self.rpc_ms / 1e3 + docs_read * self.doc_us / 1e6
+        if delay > 0:
+            time.sleep(delay)
+
+    def _write(self, collection, doc_id, data, merge):
+        with self._lock:
+            docs = self._docs(collection)
+            current = docs.get(doc_id, {}) if merge else {}
+            _apply(current, data, merge)
+            docs[doc_id] = current
+            self.writes += 1
+
+    def _update(self, collection, doc_id, data):
+        with self._lock:
+            docs = self._docs(collection)
+            if doc_id not in docs:
+                raise NotFound(f"{collection}/{doc_id}")
+            _apply(docs[doc_id], data)
+            self.writes += 1
+
+    def _delete(self, collection, doc_id):
+        with self._lock:
+            self._docs(collection).pop(doc_id, None)
+            self.writes += 1
@@ -1,34 +1,226 @@
 import face_recognition
+import argparse
 import json
 import os
+import time
+from multiprocessing import Pool
+import numpy as np
+from face_index import build_index, index_path_for
+from face_matcher import identity_centroids
+from face_store import STORE_FILE, file_digest, read_store, write_store
 
-# Directory with reference images (name.jpg)
+# Directory with reference images:
+#   faces/<name>.jpg           one sample for <name>
+#   faces/<name>/<any>.jpg     several samples for <name>
+#   faces/thresholds.json      optional {"<name>": 0.40, ...} per-person tolerance
 KNOWN_FACES_DIR = "faces"
-JSON_FILE = "known_faces.json"
+THRESHOLDS_FILE = "thresholds.json"
+# Per-image fingerprints from the last run (path -> size, mtime, sha1)
+MANIFEST_FILE = "faces_manifest.json"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
 
-def encode_known_faces():
-    known_encodings = []
-    known_names = []
 
-    for filename in os.listdir(KNOWN_FACES_DIR):
-        if filename.endswith(".jpg") or filename.endswith(".png"):
-            name = os.path.splitext(filename)[0]  # Extract name from filename
-            image_path = os.path.join(KNOWN_FACES_DIR, filename)
-            
-            image = face_recognition.load_image_file(image_path)
-            encodings = face_recognition.face_encodings(image)
-            
-            if encodings:
-                known_encodings.append(encodings[0].tolist())  # Convert to list for JSON
-                known_names.append(name)
-                print(f"Encoded {name}")
+# ---------- Worker (runs in the pool) ----------
+
+def encode_image(image_path):
+    """
+    Decode + HOG detect + encode one reference image.
+    Returns (image_path, encoding list or None, error message or None).
+    """
+    try:
+        image = face_recognition.load_image_file(image_path)
+        encodings = face_recognition.face_encodings(image)
+        if not encodings:
+            return image_path, None, None
+        return image_path, encodings[0].tolist(), None
+    except Exception as e:
+        return image_path, None, str(e)
+
+
+# ---------- Manifest ----------
+
+def load_manifest(path=MANIFEST_FILE):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Manifest {path} unreadable ({e}), re-encoding everything")
+        return {}
+
+
+def save_manifest(manifest, path=MANIFEST_FILE):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def list_images(faces_dir):
+    """(image_path, identity name) for faces/<name>.jpg and faces/<name>/*.jpg"""
+    images = []
+    for entry in sorted(os.listdir(faces_dir)):
+        entry_path = os.path.join(faces_dir, entry)
+        if os.path.isdir(entry_path):
+            for filename in sorted(os.listdir(entry_path)):
+                if filename.lower().endswith(IMAGE_EXTENSIONS):
+                    images.append((os.path.join(entry_path, filename), entry))
+        elif entry.lower().endswith(IMAGE_EXTENSIONS):
+            images.append((entry_path, os.path.splitext(entry)[0]))  # Extract name from filename
+    return [(path.replace("\\", "/"), name) for path, name in images]
+
+
+def load_thresholds(faces_dir):
+    path = os.path.join(faces_dir, THRESHOLDS_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return {name: float(tol) for name, tol in json.load(f).items()}
+
+
+def scan_faces_dir(faces_dir, manifest):
+    """
+    Compares faces/ with the manifest.
+    Returns (current, to_encode, deleted):
+      - current   = path -> fingerprint for every image on disk
+      - to_encode = paths that are new or whose content changed
+      - deleted   = paths in the manifest that are gone from disk
+    Unchanged size + mtime skips hashing; a touched-but-identical file
+    (same sha1) is not re-encoded either.
+    """
+    current = {}
+    to_encode = []
+    for image_path, name in list_images(faces_dir):
+        st = os.stat(image_path)
+        old = manifest.get(image_path)
+
+        if old and old["name"] == name and old["size"] == st.st_size and old["mtime"] == st.st_mtime_ns:
+            current[image_path] = old
+            continue
+
+        sha1 = file_digest(image_path)
+        entry = {
+            "name": name,
+            "size": st.st_size,
+            "mtime": st.st_mtime_ns,
+            "sha1": sha1,
+        }
+        if old and old["sha1"] == sha1:
+            entry["face"] = old.get("face", True)
+        else:
+            to_encode.append(image_path)
+        current[image_path] = entry
+
+    deleted = [p for p in manifest if p not in current]
+    return current, to_encode, deleted
+
+
+# ---------- Enrollment ----------
+
+def load_existing_rows(store_path):
+    """
+    Returns (source path -> encoding, thresholds) from the current store.
+    The mapping is None if there is no usable store to update.
+    """
+    if not os.path.exists(store_path):
+        return None, {}
+    try:
+        names, matrix, table = read_store(store_path)
+    except Exception as e:
+        print(f"Existing store unreadable ({e}), re-encoding everything")
+        return None, {}
+    sources = table.get("sources")
+    if sources is None or len(sources) != len(names):
+        # e.g. migrated from known_faces.json – we don't know which file each row came from
+        return None, {}
+    rows = {src: np.array(matrix[i]) for i, src in enumerate(sources)}
+    return rows, table.get("thresholds") or {}
+
+
+def encode_known_faces(faces_dir=KNOWN_FACES_DIR, store_path=STORE_FILE,
+                       manifest_path=MANIFEST_FILE, workers=None, full=False):
+    existing, existing_thresholds = (None, {}) if full else load_existing_rows(store_path)
+    manifest = load_manifest(manifest_path) if existing is not None else {}
+    existing = existing or {}
+
+    current, to_encode, deleted = scan_faces_dir(faces_dir, manifest)
+    # Unchanged images whose row is missing from the store get re-encoded too
+    to_encode += [p for p, entry in current.items()
+                  if p not in to_encode and entry.get("face", True) and p not in existing]
+    print(f"{len(current)} images: {len(to_encode)} new/changed, {len(deleted)} deleted, "
+          f"{len(current) - len(to_encode)} unchanged")
+
+    # Encode new/changed images across all cores
+    encoded = {}
+    t0 = time.perf_counter()
+    if to_encode:
+        workers = workers or os.cpu_count() or 1
+        if workers > 1 and len(to_encode) > 1:
+            with Pool(processes=min(workers, len(to_encode))) as pool:
+                results = list(pool.imap_unordered(encode_image, to_encode, chunksize=4))
+        else:
+            results = [encode_image(p) for p in to_encode]
+
+        for image_path, encoding, error in results:
+            name = current[image_path]["name"]
+            if error:
+                print(f"Error encoding {image_path}: {error}")
+                current.pop(image_path)  # retry next run
+            elif encoding is None:
+                print(f"No face found in {image_path}")
+                current[image_path]["face"] = False
             else:
-                print(f"No face found in {filename}")
+                encoded[image_path] = encoding
+                current[image_path]["face"] = True
+                print(f"Encoded {name}")
+
+        elapsed = time.perf_counter() - t0
+        print(f"Encoded {len(to_encode)} images in {elapsed:.2f}s "
+              f"({len(to_encode) / elapsed:.1f} images/sec, {workers} workers)")
+
+    thresholds = load_thresholds(faces_dir)
+    if not to_encode and not deleted and manifest and thresholds == existing_thresholds:
+        print("Nothing changed, store is up to date")
+        save_manifest(current, manifest_path)
+        return
+
+    # Unchanged rows are carried over from the existing store; only new rows were encoded
+    known_names = []
+    known_sources = []
+    known_encodings = []
+    for image_path in sorted(current):
+        encoding = encoded.get(image_path)
+        if encoding is None:
+            encoding = existing.get(image_path)
+        if encoding is None:
+            continue
+        known_names.append(current[image_path]["name"])
+        known_sources.append(image_path)
+        known_encodings.append(encoding)
+
+    matrix = np.array(known_encodings, dtype=np.float32).reshape(len(known_names), 128)
+
+    # Build the search index (over one centroid per person) first, so the app
+    # never picks up new encodings without a matching index
+    _, _, centroids = identity_centroids(known_names, matrix)
+    index = build_index(centroids)
+    index.save(index_path_for(store_path))
+    print(f"Saved {index.kind} index to {index_path_for(store_path)}")
+
+    # Save to the binary store (memory-mapped by the app)
+    write_store(store_path, known_names, matrix,
+                meta={"sources": known_sources, "thresholds": thresholds})
+    save_manifest(current, manifest_path)
+    print(f"Saved {len(known_names)} faces ({len(set(known_names))} people) to {store_path}")
 
-    # Save to JSON
-    with open(JSON_FILE, "w") as f:
-        json.dump({"names": known_names, "encodings": known_encodings}, f)
-    print(f"Saved {len(known_names)} faces to {JSON_FILE}")
 
 if __name__ == "__main__":
-    encode_known_faces()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Encode reference images in faces/ into the face store.")
+    parser.add_argument("--workers", type=int, default=None, help="encoder processes (default: all cores)")
+    parser.add_argument("--full", action="store_true", help="ignore the manifest and re-encode every image")
+    parser.add_argument("--faces-dir", default=KNOWN_FACES_DIR)
+    parser.add_argument("--out", default=STORE_FILE)
+    args = parser.parse_args()
+
+    encode_known_faces(args.faces_dir, args.out, workers=args.workers, full=args.full)
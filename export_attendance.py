@@ -0,0 +1,63 @@
+"""
+Exports attendance history to CSV, XLSX or Parquet, streaming from Firestore
+page by page (memory stays flat however many rows there are).
+
+Usage (from the project root):
+    python export_attendance.py --format csv
+    python export_attendance.py --format parquet --from 2025-01-01 --to 2025-12-31
+    python export_attendance.py --format xlsx --userId VQ4cEU4v3OQH2LcROZEsCHdsJhy1 --out ali.xlsx
+
+XLSX needs openpyxl, Parquet needs pyarrow.
+
+Reads and writes through the same STORAGE_BACKEND as the app (storage.py).
+"""
+import argparse
+import time
+
+from attendance_export import ExportUnavailable, check_format, export_stream
+from attendance_log import QueryError, iter_records, parse_filters
+from storage import open_storage
+
+ATTENDANCE_COLLECTION = "attendance_test"
+
+
+def count_records(records, counter):
+    for record in records:
+        counter[0] += 1
+        yield record
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--format", default="csv", choices=["csv", "xlsx", "parquet"])
+    parser.add_argument("--from", dest="date_from", help="first date (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", help="last date (YYYY-MM-DD)")
+    parser.add_argument("--userId", help="only this user's records")
+    parser.add_argument("--collection", default=ATTENDANCE_COLLECTION)
+    parser.add_argument("--out", help="output file (default: attendance_export.<format>)")
+    args = parser.parse_args()
+
+    try:
+        _, extension = check_format(args.format)
+        filters = parse_filters({"from": args.date_from, "to": args.date_to, "userId": args.userId})
+    except (ExportUnavailable, QueryError) as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
+    out_path = args.out or f"attendance_export.{extension}"
+
+    db = open_storage()
+
+    counter = [0]
+    started = time.perf_counter()
+    records = count_records(iter_records(db, args.collection, filters), counter)
+    with open(out_path, "wb") as f:
+        for chunk in export_stream(records, args.format):
+            f.write(chunk)
+    elapsed = time.perf_counter() - started
+
+    rate = counter[0] / elapsed if elapsed > 0 else 0.0
+    print(f"✅ Exported {counter[0]} records to {out_path} in {elapsed:.1f}s ({rate:.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
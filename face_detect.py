@@ -0,0 +1,95 @@
+import face_recognition
+import numpy as np
+from PIL import Image
+
+# ---------- Configuration ----------
+# Detection runs on a copy whose longest side is at most this many pixels
+DETECT_MAX_SIDE = 640
+# "hog" (CPU) or "cnn" (needs a CUDA build of dlib)
+DETECTION_MODEL = "hog"
+DETECT_UPSAMPLE = 1
+# Extra context around each box when cropping for the encoder (fraction of box size)
+CROP_MARGIN = 0.25
+
+
+def downscale(rgb_image, max_side=DETECT_MAX_SIDE):
+    """
+    Returns (small_image, scale) where scale = small / original.
+    Images already within max_side are returned as-is (scale 1.0).
+    """
+    h, w = rgb_image.shape[:2]
+    longest = max(h, w)
+    if not max_side or longest <= max_side:
+        return rgb_image, 1.0
+
+    scale = max_side / float(longest)
+    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    small = Image.fromarray(rgb_image).resize(size, Image.BILINEAR)
+    return np.asarray(small), scale
+
+
+def scale_boxes(locations, scale, shape):
+    """Maps (top, right, bottom, left) boxes from the small image back to full resolution."""
+    h, w = shape[:2]
+    boxes = []
+    for top, right, bottom, left in locations:
+        boxes.append((
+            max(0, int(top / scale)),
+            min(w, int(round(right / scale))),
+            min(h, int(round(bottom / scale))),
+            max(0, int(left / scale)),
+        ))
+    return boxes
+
+
+def box_area(box):
+    top, right, bottom, left = box
+    return max(0, bottom - top) * max(0, right - left)
+
+
+def detect_faces(rgb_image, max_side=DETECT_MAX_SIDE, model=DETECTION_MODEL,
+                 upsample=DETECT_UPSAMPLE, largest_only=False):
+    """
+    Detects faces on a downscaled copy and returns boxes in full-resolution
+    coordinates, largest first. largest_only keeps just the biggest face
+    (kiosk / self check-in: the person standing in front of the camera).
+    """
+    small, scale = downscale(rgb_image, max_side)
+    locations = face_recognition.face_locations(small, number_of_times_to_upsample=upsample, model=model)
+    boxes = scale_boxes(locations, scale, rgb_image.shape) if scale != 1.0 else list(locations)
+    boxes.sort(key=box_area, reverse=True)
+    if largest_only:
+        boxes = boxes[:1]
+    return boxes
+
+
+def encode_faces(rgb_image, boxes, margin=CROP_MARGIN):
+    """
+    Encodes each face from a crop around its box instead of handing the
+    whole frame to the encoder.
+    """
+    h, w = rgb_image.shape[:2]
+    encodings = []
+    for top, right, bottom, left in boxes:
+        pad_y = int((bottom - top) * margin)
+        pad_x = int((right - left) * margin)
+        y0, y1 = max(0, top - pad_y), min(h, bottom + pad_y)
+        x0, x1 = max(0, left - pad_x), min(w, right + pad_x)
+        # dlib wants a C-contiguous buffer; this copies only the crop
+        crop = np.ascontiguousarray(rgb_image[y0:y1, x0:x1])
+        box_in_crop = (top - y0, right - x0, bottom - y0, left - x0)
+        encodings.extend(face_recognition.face_encodings(crop, known_face_locations=[box_in_crop]))
+    return encodings
+
+
+def detect_and_encode(rgb_image, max_side=DETECT_MAX_SIDE, model=DETECTION_MODEL,
+                      upsample=DETECT_UPSAMPLE, largest_only=False):
+    """
+    Fast path for /recognize: detect on a downscaled copy, map the boxes back
+    to full resolution and encode only the face crops.
+    Returns (boxes, encodings).
+    """
+    boxes = detect_faces(rgb_image, max_side, model, upsample, largest_only)
+    if not boxes:
+        return [], []
+    return boxes, encode_faces(rgb_image, boxes)
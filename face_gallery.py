@@ -0,0 +1,202 @@
+import os
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from face_index import (IVF_NPROBE, MIN_INDEX_SIZE, ExactIndex, build_index,
+                        index_path_for, load_index)
+from face_matcher import as_float_matrix, identity_centroids, match_batch, squared_norms
+from face_store import ENCODING_DIM, STORE_FILE, file_digest, load_encodings, resolve_store
+
+# ---------- Configuration ----------
+KNOWN_FACES_FILE = STORE_FILE
+TOLERANCE = 0.45
+# How often (seconds) we stat() the gallery file to look for changes
+RELOAD_CHECK_INTERVAL = 1.0
+# Centroid distances within this band of an identity's threshold are
+# re-checked against that identity's individual samples
+REFINE_BAND = 0.05
+
+
+FaceMatch = namedtuple("FaceMatch", ["index", "name", "distance", "margin", "recognized"])
+
+
+class GallerySnapshot:
+    """
+    Immutable view of the enrolled faces:
+      - names        = list of labels (e.g. 'Syed Omar'), one per row / sample
+      - matrix       = contiguous (N, 128) float32/float64 array of encodings
+                       (a shared read-only memmap when loaded from known_faces.bin)
+      - sq_norms     = precomputed ||row||² used by the batch matcher
+      - identities   = unique labels; a person can have several samples
+      - centroids    = (K, 128) mean encoding per identity (the matrix itself
+                       when everyone has a single sample)
+      - thresholds   = per-identity tolerance (gallery TOLERANCE unless the
+                       store overrides it)
+      - digest       = sha1 of the file the snapshot was built from
+      - index        = search index over the centroids (exact or IVF)
+    """
+
+    def __init__(self, names, matrix, digest="", tolerance=TOLERANCE, thresholds=None, index=None):
+        self.names = list(names)
+        self.matrix = np.ascontiguousarray(as_float_matrix(matrix)).reshape(len(self.names), ENCODING_DIM)
+        if self.matrix.flags.writeable:
+            self.matrix.setflags(write=False)
+        self.sq_norms = squared_norms(self.matrix)
+        self.digest = digest
+
+        self.identities, self.row_identity, self.centroids = identity_centroids(self.names, self.matrix)
+        self.centroid_sq_norms = (self.sq_norms if self.centroids is self.matrix
+                                  else squared_norms(self.centroids))
+        counts = np.bincount(self.row_identity, minlength=len(self.identities))
+        self.sample_counts = counts
+        self.sample_order = np.argsort(self.row_identity, kind="stable")
+        self.sample_offsets = np.concatenate([[0], np.cumsum(counts)])
+
+        thresholds = thresholds or {}
+        self.thresholds = np.array([float(thresholds.get(name, tolerance)) for name in self.identities])
+        self.index = index or ExactIndex()
+
+    def __len__(self):
+        return len(self.names)
+
+    def samples_of(self, identity):
+        """Row ids of every sample enrolled for one identity."""
+        return self.sample_order[self.sample_offsets[identity]:self.sample_offsets[identity + 1]]
+
+
+class FaceGallery:
+    """
+    Process-wide gallery of known faces.
+
+    The gallery file (binary store, or legacy JSON) is loaded once and kept
+    as one (N, 128) matrix plus one centroid per identity.
+    refresh() re-reads it only when its mtime/size changes, and only swaps the
+    snapshot when the content hash actually differs. Readers never take the lock:
+    they grab the current snapshot reference, which is replaced atomically.
+    """
+
+    def __init__(self, path=KNOWN_FACES_FILE, tolerance=TOLERANCE,
+                 check_interval=RELOAD_CHECK_INTERVAL,
+                 min_index_size=MIN_INDEX_SIZE, nprobe=IVF_NPROBE, refine_band=REFINE_BAND):
+        self.path = path
+        self.tolerance = tolerance
+        self.refine_band = refine_band
+        self.check_interval = check_interval
+        self.min_index_size = min_index_size
+        self.nprobe = nprobe
+        self._snapshot = None
+        self._stat_key = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    # ---------- Loading ----------
+    def _read_stat(self):
+        try:
+            st = os.stat(self.path)
+            # Pointer files all have the same size; the version they name tells them apart
+            target = resolve_store(self.path) if not self.path.endswith(".json") else self.path
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, target)
+
+    def _load(self, stat_key):
+        digest = file_digest(self.path)
+
+        current = self._snapshot
+        if current is not None and current.digest == digest:
+            # Touched but unchanged – keep the existing matrix
+            self._stat_key = stat_key
+            return current
+
+        names, matrix, meta = load_encodings(self.path)
+        snapshot = GallerySnapshot(names, matrix, digest, self.tolerance, meta.get("thresholds"))
+        snapshot.index = self._load_index(snapshot.centroids)
+        self._snapshot = snapshot
+        self._stat_key = stat_key
+        print(f"✅ Loaded {len(snapshot)} known faces ({len(snapshot.identities)} people) from {self.path}")
+        return snapshot
+
+    def _load_index(self, matrix):
+        """
+        The index is built over the identity centroids.
+        Small galleries are searched exactly. Large ones use the index that
+        encode_faces.py persisted next to the gallery file, or build one in
+        memory if it is missing or stale.
+        """
+        if len(matrix) < self.min_index_size:
+            return build_index(matrix, min_size=self.min_index_size)
+
+        index = load_index(index_path_for(self.path), matrix, nprobe=self.nprobe)
+        if index is None:
+            print("⚠️ No up-to-date face index on disk – building one in memory")
+            index = build_index(matrix, min_size=self.min_index_size, nprobe=self.nprobe)
+        return index
+
+    def refresh(self, force=False):
+        """
+        Returns the current snapshot, reloading it first if the file changed.
+        Returns None if the gallery file does not exist.
+        """
+        now = time.monotonic()
+        if not force and self._snapshot is not None and now - self._last_check < self.check_interval:
+            return self._snapshot
+
+        with self._lock:
+            self._last_check = now
+            stat_key = self._read_stat()
+            if stat_key is None:
+                self._snapshot = None
+                self._stat_key = None
+                return None
+            if force or stat_key != self._stat_key:
+                try:
+                    return self._load(stat_key)
+                except Exception as e:
+                    # Half-written file etc. – keep serving the last good snapshot
+                    print(f"❌ Error loading {self.path}: {e}")
+            return self._snapshot
+
+    @property
+    def snapshot(self):
+        return self.refresh()
+
+    # ---------- Matching ----------
+    def match(self, encodings, snapshot=None):
+        """
+        Matches all probe encodings (one per detected face) against the
+        gallery. Each probe is first compared with the identity centroids
+        through the index (exact, or IVF candidates re-ranked with exact
+        distances). Only when the centroid distance is within refine_band of
+        that identity's threshold do we look at its individual samples, so
+        the cost stays ~O(identities) rather than O(samples).
+
+        Returns one FaceMatch per encoding (index = identity index, name is the
+        closest identity; recognized is False when the distance is above that
+        identity's threshold).
+        """
+        snap = snapshot or self.refresh()
+        if snap is None or len(snap) == 0:
+            return []
+
+        probes = np.asarray(encodings, dtype=snap.matrix.dtype).reshape(-1, ENCODING_DIM)
+        best_index, best_distance, margin = snap.index.match(probes, snap.centroids, snap.centroid_sq_norms)
+
+        matches = []
+        for p, (i, d, m) in enumerate(zip(best_index.tolist(), best_distance.tolist(), margin.tolist())):
+            threshold = float(snap.thresholds[i])
+            if snap.sample_counts[i] > 1 and abs(d - threshold) <= self.refine_band:
+                rows = snap.samples_of(i)
+                _, sample_distance, _ = match_batch(probes[p], snap.matrix[rows], snap.sq_norms[rows])
+                d = float(sample_distance[0])
+
+            matches.append(FaceMatch(
+                index=i,
+                name=snap.identities[i],
+                distance=d,
+                margin=m,
+                recognized=d <= threshold,
+            ))
+        return matches
@@ -0,0 +1,187 @@
+import hashlib
+import os
+
+import numpy as np
+
+from face_matcher import match_batch, pairwise_distances, squared_norms
+
+# ---------- Configuration ----------
+# Below this many enrolled faces brute force is already sub-millisecond
+MIN_INDEX_SIZE = 2000
+# Number of k-means partitions (None = about 4 * sqrt(N))
+IVF_NLIST = None
+# Partitions scanned per probe: higher = better recall, slower search
+IVF_NPROBE = 8
+KMEANS_ITERATIONS = 15
+
+
+def matrix_digest(matrix):
+    """
+    Fingerprint of an encoding matrix, used to tell whether a persisted
+    index still belongs to the current gallery.
+    """
+    data = np.ascontiguousarray(matrix, dtype=np.float32)
+    return hashlib.sha1(data.tobytes()).hexdigest()
+
+
+def index_path_for(gallery_path):
+    """known_faces.json -> known_faces.index.npz"""
+    return os.path.splitext(gallery_path)[0] + ".index.npz"
+
+
+class ExactIndex:
+    """Brute-force search over every enrolled face."""
+
+    kind = "exact"
+
+    def __init__(self, digest=""):
+        self.digest = digest
+
+    def match(self, probes, matrix, sq_norms):
+        return match_batch(probes, matrix, sq_norms)
+
+    def save(self, path):
+        _save_npz(path, kind=self.kind, digest=self.digest)
+
+
+class IVFIndex:
+    """
+    Inverted-file index: gallery rows are partitioned with k-means and a probe
+    only scans the rows of its `nprobe` nearest partitions. Candidates are then
+    re-ranked with exact distances, so distances (and the TOLERANCE check) are
+    the same as brute force – only recall depends on nprobe.
+
+    Inverted lists are stored CSR-style:
+      - order   = gallery row ids sorted by partition
+      - offsets = order[offsets[c]:offsets[c + 1]] are the rows of partition c
+    """
+
+    kind = "ivf"
+
+    def __init__(self, centroids, order, offsets, digest="", nprobe=IVF_NPROBE):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float64)
+        self.centroid_sq_norms = squared_norms(self.centroids)
+        self.order = np.asarray(order, dtype=np.intp)
+        self.offsets = np.asarray(offsets, dtype=np.intp)
+        self.digest = digest
+        self.nprobe = nprobe
+
+    @classmethod
+    def build(cls, matrix, nlist=None, iterations=KMEANS_ITERATIONS, seed=0, nprobe=IVF_NPROBE):
+        matrix = np.asarray(matrix, dtype=np.float64)
+        n = len(matrix)
+        if nlist is None:
+            nlist = IVF_NLIST or max(1, int(4 * np.sqrt(n)))
+        nlist = min(nlist, n)
+
+        centroids, labels = kmeans(matrix, nlist, iterations, seed)
+        order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=nlist)
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        return cls(centroids, order, offsets, matrix_digest(matrix), nprobe)
+
+    def candidates(self, probe_lists):
+        """Gallery row ids contained in the given partitions."""
+        return np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in probe_lists])
+
+    def match(self, probes, matrix, sq_norms):
+        probes = np.asarray(probes, dtype=np.float64).reshape(-1, matrix.shape[1])
+        m = len(probes)
+        best_index = np.zeros(m, dtype=np.intp)
+        best_distance = np.full(m, np.inf)
+        margin = np.full(m, np.inf)
+        if m == 0:
+            return best_index, best_distance, margin
+
+        # Coarse step: nearest partitions for every probe at once
+        nprobe = min(self.nprobe, len(self.centroids))
+        coarse = pairwise_distances(probes, self.centroids, self.centroid_sq_norms)
+        nearest_lists = np.argpartition(coarse, nprobe - 1, axis=1)[:, :nprobe]
+
+        # Exact re-rank inside the candidate partitions
+        for i in range(m):
+            rows = self.candidates(nearest_lists[i])
+            if len(rows) == 0:
+                continue
+            idx, dist, marg = match_batch(probes[i:i + 1], matrix[rows], sq_norms[rows])
+            best_index[i] = rows[idx[0]]
+            best_distance[i] = dist[0]
+            margin[i] = marg[0]
+        return best_index, best_distance, margin
+
+    def save(self, path):
+        _save_npz(path, kind=self.kind, digest=self.digest,
+                  centroids=self.centroids, order=self.order, offsets=self.offsets)
+
+
+def _save_npz(path, **arrays):
+    """Write to a temp file and rename, so readers never see a partial index."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+
+def kmeans(matrix, k, iterations=KMEANS_ITERATIONS, seed=0):
+    """
+    Plain Lloyd's k-means in NumPy. Returns (centroids, labels).
+    Empty clusters are re-seeded from the points furthest from their centroid.
+    """
+    rng = np.random.default_rng(seed)
+    centroids = matrix[rng.choice(len(matrix), size=k, replace=False)].copy()
+
+    def assign(centroids):
+        # argmin ||x − c||² == argmin (||c||² − 2x·c); skips the sqrt and ||x||²
+        scores = matrix @ centroids.T
+        scores *= -2.0
+        scores += squared_norms(centroids)[None, :]
+        return np.argmin(scores, axis=1)
+
+    for _ in range(iterations):
+        labels = assign(centroids)
+        counts = np.bincount(labels, minlength=k)
+
+        # Per-cluster sums via sort + reduceat (much faster than np.add.at)
+        nonempty = counts > 0
+        order = np.argsort(labels, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[nonempty]
+        sums = np.add.reduceat(matrix[order], starts, axis=0)
+        centroids[nonempty] = sums / counts[nonempty, None]
+
+        empty = np.flatnonzero(~nonempty)
+        if len(empty):
+            point_dist = np.einsum("ij,ij->i", matrix - centroids[labels], matrix - centroids[labels])
+            furthest = np.argsort(point_dist)[::-1][:len(empty)]
+            centroids[empty] = matrix[furthest]
+
+    labels = assign(centroids)
+    return centroids, labels
+
+
+def build_index(matrix, min_size=MIN_INDEX_SIZE, nlist=None, nprobe=IVF_NPROBE):
+    """Exact search for small galleries, IVF above min_size."""
+    if len(matrix) < min_size:
+        return ExactIndex(matrix_digest(matrix))
+    return IVFIndex.build(matrix, nlist=nlist, nprobe=nprobe)
+
+
+def load_index(path, matrix, nprobe=IVF_NPROBE):
+    """
+    Loads a persisted index. Returns None if the file is missing, unreadable
+    or was built for a different set of encodings.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            if str(data["digest"]) != matrix_digest(matrix):
+                print(f"⚠️ {path} is stale (encodings changed) – ignoring it")
+                return None
+            kind = str(data["kind"])
+            if kind == IVFIndex.kind:
+                return IVFIndex(data["centroids"], data["order"], data["offsets"],
+                                str(data["digest"]), nprobe)
+            return ExactIndex(str(data["digest"]))
+    except Exception as e:
+        print(f"❌ Error loading face index {path}: {e}")
+        return None
@@ -0,0 +1,106 @@
+import numpy as np
+
+
+def as_float_matrix(matrix):
+    """
+    float32 (e.g. the memory-mapped store) and float64 matrices are used
+    as-is so we never copy the whole gallery; anything else becomes float64.
+    """
+    matrix = np.asarray(matrix)
+    if matrix.dtype not in (np.float32, np.float64):
+        matrix = matrix.astype(np.float64)
+    return matrix
+
+
+def squared_norms(matrix):
+    """
+    Returns ||row||² for every row of an (N, 128) encoding matrix.
+    Precompute this once per gallery and pass it to match_batch().
+    """
+    matrix = as_float_matrix(matrix)
+    return np.einsum("ij,ij->i", matrix, matrix)
+
+
+def pairwise_distances(probes, gallery, gallery_sq_norms=None):
+    """
+    Euclidean distances between every probe (M, 128) and every gallery row (N, 128)
+    as one (M, N) matrix, using ||a||² + ||b||² − 2ab.
+    Same values as face_recognition.face_distance() within float tolerance.
+    """
+    gallery = as_float_matrix(gallery)
+    # Probes follow the gallery dtype (float32 store → float32 math)
+    probes = np.atleast_2d(np.asarray(probes, dtype=gallery.dtype))
+    if gallery_sq_norms is None:
+        gallery_sq_norms = squared_norms(gallery)
+
+    probe_sq_norms = squared_norms(probes)
+    sq = probe_sq_norms[:, None] + gallery_sq_norms[None, :] - 2.0 * (probes @ gallery.T)
+    # Rounding can push exact matches slightly below zero
+    np.maximum(sq, 0.0, out=sq)
+    return np.sqrt(sq, out=sq)
+
+
+def match_batch(probes, gallery, gallery_sq_norms=None):
+    """
+    Matches every probe encoding against the whole gallery in one go.
+
+    Returns three arrays of length M:
+      - best_index    = index of the closest gallery row
+      - best_distance = distance to that row
+      - margin        = second-best distance − best distance
+                        (inf when the gallery has a single row)
+    """
+    probes = np.asarray(probes, dtype=np.float64)
+    n = len(gallery)
+    if probes.size == 0 or n == 0:
+        m = 0 if probes.size == 0 else probes.reshape(-1, probes.shape[-1]).shape[0]
+        return (np.zeros(m, dtype=np.intp), np.full(m, np.inf), np.full(m, np.inf))
+
+    probes = probes.reshape(-1, probes.shape[-1])
+    m = probes.shape[0]
+
+    distances = pairwise_distances(probes, gallery, gallery_sq_norms)
+    rows = np.arange(m)
+
+    if n == 1:
+        best_index = np.zeros(m, dtype=np.intp)
+        best_distance = distances[:, 0].copy()
+        margin = np.full(m, np.inf)
+        return best_index, best_distance, margin
+
+    # Two smallest per row without a full sort
+    top2 = np.argpartition(distances, 1, axis=1)[:, :2]
+    d0 = distances[rows, top2[:, 0]]
+    d1 = distances[rows, top2[:, 1]]
+    # Ties go to the lower index, like np.argmin
+    swap = (d1 < d0) | ((d1 == d0) & (top2[:, 1] < top2[:, 0]))
+    best_index = np.where(swap, top2[:, 1], top2[:, 0])
+    best_distance = np.minimum(d0, d1)
+    margin = np.abs(d1 - d0)
+    return best_index, best_distance, margin
+
+
+def identity_centroids(names, matrix):
+    """
+    Groups gallery rows (samples) by label.
+
+    Returns (identities, row_identity, centroids):
+      - identities   = unique labels in first-seen order
+      - row_identity = identity index of every row
+      - centroids    = (K, 128) mean encoding per identity
+    When every label has exactly one sample, centroids is the matrix itself
+    (no copy).
+    """
+    matrix = as_float_matrix(matrix)
+    ids = {}
+    row_identity = np.array([ids.setdefault(name, len(ids)) for name in names], dtype=np.intp)
+    identities = list(ids)
+    if len(identities) == len(row_identity):
+        return identities, row_identity, matrix
+
+    counts = np.bincount(row_identity, minlength=len(identities))
+    order = np.argsort(row_identity, kind="stable")
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    sums = np.add.reduceat(matrix[order].astype(np.float64), starts, axis=0)
+    centroids = (sums / counts[:, None]).astype(matrix.dtype)
+    return identities, row_identity, centroids
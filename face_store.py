@@ -0,0 +1,193 @@
+"""
+Binary face encoding store (replaces known_faces.json).
+
+Layout of known_faces.bin (little endian):
+
+    offset  size  field
+    0       8     magic        b"FACESTOR"
+    8       2     version      uint16 (STORE_VERSION)
+    10      2     dim          uint16 (128)
+    12      4     count        uint32 (rows)
+    16      4     meta_len     uint32 (bytes of the names table)
+    20      8     data_offset  uint64 (start of the float32 block, 64-byte aligned)
+    28      ..    names table  UTF-8 JSON: {"names": [...], "sources": [...],
+                                      "thresholds": {name: tolerance}}
+    ..      ..    zero padding
+    data_offset   count * dim float32 encodings, row-major
+
+The encodings are opened with np.memmap, so every worker process that loads
+the same file shares the same page-cache pages instead of holding its own copy.
+
+write_store() never overwrites a store that may be mapped (Windows refuses to
+replace or delete a memory-mapped file). Each version goes to its own file,
+known_faces.bin.v<sha1 prefix>, and known_faces.bin becomes a small pointer:
+
+    b"FACESPTR\n" + file name of the current version (UTF-8)
+
+Readers follow the pointer; a plain store at the path is still read as is.
+"""
+import glob
+import hashlib
+import json
+import os
+import struct
+import time
+
+import numpy as np
+
+STORE_FILE = "known_faces.bin"
+LEGACY_JSON_FILE = "known_faces.json"
+
+MAGIC = b"FACESTOR"
+POINTER_MAGIC = b"FACESPTR\n"
+STORE_VERSION = 1
+ENCODING_DIM = 128
+DATA_ALIGNMENT = 64
+
+_HEADER = struct.Struct("<8sHHIIQ")
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """sha1 of a file, read in chunks."""
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# ---------- Writing ----------
+
+def _replace(src, dst, attempts=5):
+    """os.replace, retried briefly: on Windows it fails while a reader has dst open."""
+    for attempt in range(attempts):
+        try:
+            os.replace(src, dst)
+            return
+        except PermissionError:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(0.1 * (attempt + 1))
+
+
+def write_store(path, names, encodings, meta=None):
+    """
+    Writes names + encodings as a new version file next to path and points
+    path at it. Version files are written under a temporary name and renamed
+    into place, so readers never see a half-written store, and a file that
+    may be memory-mapped is never replaced. Old versions are deleted when
+    nothing maps them any more (on Windows: at a later write).
+    """
+    names = list(names)
+    matrix = np.ascontiguousarray(encodings, dtype="<f4").reshape(len(names), ENCODING_DIM)
+
+    table = dict(meta or {})
+    table["names"] = names
+    table_bytes = json.dumps(table, ensure_ascii=False).encode("utf-8")
+
+    header_end = _HEADER.size + len(table_bytes)
+    data_offset = -(-header_end // DATA_ALIGNMENT) * DATA_ALIGNMENT
+
+    header = _HEADER.pack(MAGIC, STORE_VERSION, ENCODING_DIM, len(names), len(table_bytes), data_offset)
+    padding = b"\0" * (data_offset - header_end)
+    data = matrix.tobytes()
+    digest = hashlib.sha1(header + table_bytes + padding + data).hexdigest()
+
+    version_path = f"{path}.v{digest[:16]}"
+    if not os.path.exists(version_path):
+        with open(version_path + ".tmp", "wb") as f:
+            f.write(header)
+            f.write(table_bytes)
+            f.write(padding)
+            f.write(data)
+        os.replace(version_path + ".tmp", version_path)
+
+    with open(path + ".tmp", "wb") as f:
+        f.write(POINTER_MAGIC + os.path.basename(version_path).encode("utf-8"))
+    _replace(path + ".tmp", path)
+
+    for old_path in glob.glob(glob.escape(path) + ".v*"):
+        if old_path != version_path and not old_path.endswith(".tmp"):
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass    # still mapped by a worker (Windows) – removed by a later write
+
+
+# ---------- Reading ----------
+
+def resolve_store(path):
+    """The file holding the store: the version a pointer at path names, or path itself."""
+    with open(path, "rb") as f:
+        head = f.read(len(POINTER_MAGIC) + 1024)
+    if not head.startswith(POINTER_MAGIC):
+        return path
+    name = head[len(POINTER_MAGIC):].decode("utf-8").strip()
+    return os.path.join(os.path.dirname(path), name)
+
+
+def read_header(path):
+    """Returns (version, dim, count, table dict, data_offset)."""
+    path = resolve_store(path)
+    with open(path, "rb") as f:
+        raw = f.read(_HEADER.size)
+        if len(raw) < _HEADER.size:
+            raise ValueError(f"{path}: file too short for a face store header")
+        magic, version, dim, count, meta_len, data_offset = _HEADER.unpack(raw)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a face store (bad magic)")
+        if version > STORE_VERSION:
+            raise ValueError(f"{path}: store version {version} is newer than supported ({STORE_VERSION})")
+        table = json.loads(f.read(meta_len).decode("utf-8"))
+    return version, dim, count, table, data_offset
+
+
+def read_store(path):
+    """
+    Returns (names, encodings, table) where encodings is a read-only
+    (N, 128) float32 np.memmap over the file.
+    """
+    path = resolve_store(path)
+    _, dim, count, table, data_offset = read_header(path)
+    names = table.get("names") or []
+    if len(names) != count:
+        raise ValueError(f"{path}: header says {count} rows but names table has {len(names)}")
+
+    if count == 0:
+        return names, np.empty((0, dim), dtype=np.float32), table
+
+    matrix = np.memmap(path, dtype="<f4", mode="r", offset=data_offset, shape=(count, dim))
+    return names, matrix, table
+
+
+def read_legacy_json(path):
+    """Reads the old known_faces.json format: {"names": [...], "encodings": [[...], ...]}"""
+    with open(path, "r") as f:
+        data = json.load(f)
+    names = data.get("names") or []
+    encodings = data.get("encodings") or []
+    if len(names) != len(encodings):
+        raise ValueError(f"{path}: {len(names)} names but {len(encodings)} encodings")
+    matrix = np.array(encodings, dtype=np.float64).reshape(len(names), ENCODING_DIM)
+    return names, matrix
+
+
+def load_encodings(path):
+    """
+    Loader shared by app.py and live_recognition.py.
+    Picks the format from the file extension (.json = legacy, anything else =
+    binary store). Returns (names, (N, 128) matrix, meta) – names has one
+    label per row, so a person with several samples appears several times.
+    """
+    if path.endswith(".json"):
+        names, matrix = read_legacy_json(path)
+        return names, matrix, {}
+    names, matrix, table = read_store(path)
+    return names, matrix, table
+
+
+def migrate_json(json_path=LEGACY_JSON_FILE, store_path=STORE_FILE):
+    """One-shot conversion of known_faces.json into the binary store."""
+    names, matrix = read_legacy_json(json_path)
+    write_store(store_path, names, matrix)
+    return len(names)
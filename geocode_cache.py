@@ -0,0 +1,212 @@
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# ---------- Configuration ----------
+GEOCODE_CACHE_FILE = "geocode_cache.sqlite3"
+# Coordinates are rounded to this many decimals to form a cell (4 ≈ 11 m)
+CELL_DECIMALS = 4
+# Entries kept in memory (LRU); everything is also persisted to SQLite
+MEMORY_CAPACITY = 2048
+# Persisted names older than this are looked up again (seconds)
+MAX_AGE = 30 * 24 * 3600
+# Nominatim's usage policy: at most one request per second
+MIN_REQUEST_INTERVAL = 1.0
+# Returned when the geocoder gave no answer; never cached
+FAILED_PLACE_NAME = "Geocoding failed"
+
+
+def cell_key(lat, lng, decimals=CELL_DECIMALS):
+    """Rounded-coordinate cell, e.g. (3.205170, 101.720107) -> '3.2052,101.7201'."""
+    return f"{round(float(lat), decimals):.{decimals}f},{round(float(lng), decimals):.{decimals}f}"
+
+
+def _distance_m(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 6371e3 * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+class _Pending:
+    """One in-flight geocoder call that concurrent lookups of the same cell wait on."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+
+
+class GeocodeCache:
+    """
+    Reverse-geocoding cache in front of a resolver(lat, lng) -> name or None.
+
+    - Cells are rounded coordinates; anchors (e.g. the office) make every
+      point within their radius share one cell and one name.
+    - Memory LRU first, then SQLite (survives restarts), then the resolver.
+    - Resolver calls are spaced by min_interval and concurrent misses for
+      the same cell share a single call.
+    - lookup_async() resolves in the background and hands the name to a
+      callback, so a request never has to wait for the geocoder.
+    A resolver result of None (timeouts, service errors) is not cached.
+    """
+
+    def __init__(self, resolver, path=GEOCODE_CACHE_FILE, capacity=MEMORY_CAPACITY,
+                 decimals=CELL_DECIMALS, max_age=MAX_AGE, min_interval=MIN_REQUEST_INTERVAL,
+                 failed=FAILED_PLACE_NAME):
+        self.resolver = resolver
+        self.path = path
+        self.capacity = capacity
+        self.decimals = decimals
+        self.max_age = max_age
+        self.min_interval = min_interval
+        self.failed = failed
+        self._memory = OrderedDict()
+        self._anchors = []
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._rate_lock = threading.Lock()
+        self._last_request = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="geocode")
+        self._counters = {"memoryHits": 0, "diskHits": 0, "misses": 0, "coalesced": 0,
+                          "requests": 0, "failures": 0}
+
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS places ("
+                             "cell TEXT PRIMARY KEY, name TEXT NOT NULL, updated REAL NOT NULL)")
+            self._db.commit()
+
+    # ---------- Cells ----------
+    def add_anchor(self, lat, lng, radius_m, name=None):
+        """
+        Points within radius_m of (lat, lng) use the anchor's cell. With a name
+        the entry is precomputed, otherwise it is resolved on first use.
+        """
+        key = cell_key(lat, lng, self.decimals)
+        self._anchors.append((float(lat), float(lng), float(radius_m), key))
+        if name:
+            self._store(key, name)
+        return key
+
+    def key_for(self, lat, lng):
+        lat, lng = float(lat), float(lng)
+        for a_lat, a_lng, radius_m, key in self._anchors:
+            if _distance_m(a_lat, a_lng, lat, lng) <= radius_m:
+                return key
+        return cell_key(lat, lng, self.decimals)
+
+    # ---------- Storage ----------
+    def _remember(self, key, name):
+        self._memory[key] = name
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.capacity:
+            self._memory.popitem(last=False)
+
+    def _store(self, key, name):
+        with self._lock:
+            self._remember(key, name)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO places (cell, name, updated) VALUES (?, ?, ?)",
+                                 (key, name, time.time()))
+                self._db.commit()
+
+    def _cached(self, key):
+        with self._lock:
+            name = self._memory.get(key)
+            if name is not None:
+                self._memory.move_to_end(key)
+                self._counters["memoryHits"] += 1
+                return name
+            if self._db is not None:
+                row = self._db.execute("SELECT name, updated FROM places WHERE cell = ?", (key,)).fetchone()
+                if row and time.time() - row[1] <= self.max_age:
+                    self._remember(key, row[0])
+                    self._counters["diskHits"] += 1
+                    return row[0]
+            return None
+
+    # ---------- Resolving ----------
+    def _throttle(self):
+        """Called with _rate_lock held: waits until min_interval has passed since the last call."""
+        wait = self._last_request + self.min_interval - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self._last_request = time.monotonic()
+
+    def _resolve(self, key, lat, lng):
+        with self._lock:
+            pending = self._inflight.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._inflight[key] = _Pending()
+                self._counters["misses"] += 1
+            else:
+                self._counters["coalesced"] += 1
+        if not owner:
+            pending.event.wait()
+            return pending.value
+
+        name = None
+        try:
+            # Another thread may have finished this cell while we were queued
+            name = self._cached(key)
+            if name is None:
+                with self._rate_lock:
+                    self._throttle()
+                    with self._lock:
+                        self._counters["requests"] += 1
+                    try:
+                        name = self.resolver(lat, lng)
+                    except Exception as e:
+                        print("❌ Reverse geocoding error:", e)
+                if name is None:
+                    with self._lock:
+                        self._counters["failures"] += 1
+                    name = self.failed
+                else:
+                    self._store(key, name)
+        finally:
+            pending.value = name or self.failed
+            with self._lock:
+                self._inflight.pop(key, None)
+            pending.event.set()
+        return pending.value
+
+    # ---------- Public API ----------
+    def peek(self, lat, lng):
+        """Cached name for this point, or None – never calls the geocoder."""
+        return self._cached(self.key_for(lat, lng))
+
+    def lookup(self, lat, lng):
+        """Name for this point, calling the geocoder (rate limited) on a miss."""
+        key = self.key_for(lat, lng)
+        name = self._cached(key)
+        if name is not None:
+            return name
+        return self._resolve(key, float(lat), float(lng))
+
+    def lookup_async(self, lat, lng, callback=None):
+        """Resolves in the background; callback(name) runs on a worker thread."""
+        def run():
+            name = self.lookup(lat, lng)
+            if callback is not None:
+                try:
+                    callback(name)
+                except Exception as e:
+                    print("❌ Geocode callback failed:", e)
+            return name
+        return self._executor.submit(run)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["memoryEntries"] = len(self._memory)
+            stats["inflight"] = len(self._inflight)
+            if self._db is not None:
+                stats["diskEntries"] = self._db.execute("SELECT COUNT(*) FROM places").fetchone()[0]
+            return stats
@@ -0,0 +1,175 @@
+import math
+
+import numpy as np
+
+# ---------- Configuration ----------
+EARTH_RADIUS_M = 6371e3
+# Fences further than this from a point are not looked at (same as the
+# "Near Office" / "Near Home" threshold in get_location_status)
+NEAR_M = 500.0
+METRES_PER_DEG_LAT = 111320.0
+
+OFFICE = "office"
+HOME = "home"
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """
+    Vectorised haversine distance in metres. Arguments are scalars or
+    arrays in degrees and broadcast like any NumPy expression, e.g.
+    haversine_m(lats[:, None], lngs[:, None], site_lats, site_lngs)
+    gives the (points x sites) distance matrix.
+    """
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = np.radians(np.asarray(lng2, dtype=np.float64) - lng1)
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return EARTH_RADIUS_M * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+class GeofenceIndex:
+    """
+    Named circular geofences (office sites, each user's homeLocation) in a
+    uniform lat/lng grid, evaluated for many points in one pass.
+
+    - Grid cells are at least `reach` metres on each side, so every fence
+      within `reach` of a point is in the point's cell or one of its 8
+      neighbours.
+    - Fences are stored CSR-style: order[offsets[c]:offsets[c + 1]] are the
+      fences of cell keys[c] (keys sorted, for searchsorted).
+    - evaluate() expands every point into its (point, candidate fence)
+      pairs with array ops only and computes distances for those pairs,
+      instead of a points x fences matrix.
+    - Office fences apply to everyone; a home fence only to its owner.
+    """
+
+    def __init__(self, fences, reach=NEAR_M):
+        """
+        fences: iterable of dicts with id, name, kind (OFFICE/HOME), lat, lng,
+        radius (metres) and, for home fences, owner (userId).
+        """
+        self.fences = [dict(f) for f in fences]
+        n = len(self.fences)
+        self.lat = np.array([float(f["lat"]) for f in self.fences], dtype=np.float64)
+        self.lng = np.array([float(f["lng"]) for f in self.fences], dtype=np.float64)
+        self.radius = np.array([float(f["radius"]) for f in self.fences], dtype=np.float64)
+
+        # Owners as small ints: -1 = applies to everyone
+        self._owner_codes = {}
+        self.owner = np.full(n, -1, dtype=np.int64)
+        for i, fence in enumerate(self.fences):
+            owner = fence.get("owner")
+            if owner:
+                self.owner[i] = self._owner_codes.setdefault(owner, len(self._owner_codes))
+
+        self.reach = max(float(reach), float(self.radius.max()) if n else 0.0)
+        max_lat = float(np.abs(self.lat).max()) if n else 0.0
+        self.cell_lat = self.reach / METRES_PER_DEG_LAT
+        self.cell_lng = self.reach / (METRES_PER_DEG_LAT * max(math.cos(math.radians(min(max_lat, 85.0))), 0.01))
+
+        fence_keys = self._cell_key(*self._cell(self.lat, self.lng))
+        self.order = np.argsort(fence_keys, kind="stable")
+        self.keys, counts = np.unique(fence_keys[self.order], return_counts=True)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+    def __len__(self):
+        return len(self.fences)
+
+    def _cell(self, lats, lngs):
+        return (np.floor(np.asarray(lats) / self.cell_lat).astype(np.int64),
+                np.floor(np.asarray(lngs) / self.cell_lng).astype(np.int64))
+
+    @staticmethod
+    def _cell_key(ci, cj):
+        return (ci << 32) + (cj + (1 << 31))
+
+    def _pairs(self, lats, lngs):
+        """(point index, fence index) for every fence in the 3x3 cells around each point."""
+        ci, cj = self._cell(lats, lngs)
+        steps = np.array([-1, 0, 1], dtype=np.int64)
+        keys = self._cell_key((ci[:, None] + np.repeat(steps, 3)[None, :]),
+                              (cj[:, None] + np.tile(steps, 3)[None, :])).reshape(-1)
+        pos = np.searchsorted(self.keys, keys)
+        pos_ok = np.minimum(pos, len(self.keys) - 1)
+        found = (pos < len(self.keys)) & (self.keys[pos_ok] == keys)
+        starts = self.offsets[pos_ok]
+        counts = np.where(found, self.offsets[pos_ok + 1] - starts, 0)
+
+        total = int(counts.sum())
+        points = np.repeat(np.repeat(np.arange(len(lats)), 9), counts)
+        within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        return points, self.order[np.repeat(starts, counts) + within]
+
+    def evaluate(self, lats, lngs, owners=None):
+        """
+        For each point, the nearest applicable fence within `reach`.
+        Returns (fence index or -1, distance in metres or NaN, inside bool) arrays.
+        owners: per-point userId (or None) used to match home fences.
+        """
+        lats = np.asarray(lats, dtype=np.float64).reshape(-1)
+        lngs = np.asarray(lngs, dtype=np.float64).reshape(-1)
+        n = len(lats)
+        nearest = np.full(n, -1, dtype=np.int64)
+        distance = np.full(n, np.nan)
+        inside = np.zeros(n, dtype=bool)
+        if n == 0 or not self.fences:
+            return nearest, distance, inside
+
+        codes = np.full(n, -2, dtype=np.int64)   # -2 never matches a fence owner
+        if owners is not None:
+            codes = np.array([self._owner_codes.get(o, -2) for o in owners], dtype=np.int64)
+
+        points, fences = self._pairs(lats, lngs)
+        fence_owner = self.owner[fences]
+        keep = (fence_owner == -1) | (fence_owner == codes[points])
+        points, fences = points[keep], fences[keep]
+        d = haversine_m(lats[points], lngs[points], self.lat[fences], self.lng[fences])
+        keep = d <= self.reach
+        points, fences, d = points[keep], fences[keep], d[keep]
+
+        # Nearest pair per point: sort by (point, distance), take each point's first
+        order = np.lexsort((d, points))
+        points, fences, d = points[order], fences[order], d[order]
+        first = np.ones(len(points), dtype=bool)
+        first[1:] = points[1:] != points[:-1]
+        points, fences, d = points[first], fences[first], d[first]
+
+        nearest[points] = fences
+        distance[points] = d
+        inside[points] = d <= self.radius[fences]
+        return nearest, distance, inside
+
+
+def build_fences(office_sites, users, office_radius, home_radius):
+    """
+    Fences for GeofenceIndex from the configured office sites
+    ({id, name, lat, lng, radius?}) and user records with home_lat/home_lng.
+    """
+    fences = []
+    for site in office_sites:
+        fences.append({
+            "id": site["id"],
+            "name": site.get("name", site["id"]),
+            "kind": OFFICE,
+            "lat": site["lat"],
+            "lng": site["lng"],
+            "radius": site.get("radius", office_radius),
+        })
+    for user in users:
+        if user.get("home_lat") is None or user.get("home_lng") is None:
+            continue
+        try:
+            lat, lng = float(user["home_lat"]), float(user["home_lng"])
+        except (TypeError, ValueError):
+            continue
+        fences.append({
+            "id": f"home:{user['userId']}",
+            "name": f"{user.get('fullName') or user['userId']} (home)",
+            "kind": HOME,
+            "owner": user["userId"],
+            "lat": lat,
+            "lng": lng,
+            "radius": home_radius,
+        })
+    return fences
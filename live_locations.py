@@ -0,0 +1,251 @@
+import math
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# ---------- Configuration ----------
+MIN_PUBLISH_INTERVAL = 2.0    # seconds between two position pushes for one user
+MIN_MOVE_M = 10.0             # smaller moves only refresh lastUpdated (GPS jitter)
+WRITE_INTERVAL = 60.0         # seconds between two staff_locations writes for one user
+OFFLINE_AFTER = 300.0         # seconds without an update before a user goes "Offline"
+TICK_INTERVAL = 1.0           # how often pending changes are published / written
+CHANGELOG_SIZE = 10000        # (seq, userId) entries kept for reconnecting streams
+
+
+def _distance_m(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 6371e3 * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+class LiveLocations:
+    """
+    Latest position of every staff member, kept in memory.
+
+    - update() only records the newest position; nothing is sent or written
+      from the request thread.
+    - A background tick publishes each changed user at most once per
+      `min_publish_interval` (intermediate positions are dropped), moves
+      under `min_move` are not published at all, and status transitions
+      (Active <-> Offline) go out on the next tick.
+    - Every published change gets a sequence number; changes_since(seq)
+      lets an event stream send only what changed.
+    - staff_locations is written at most once per `write_interval` per user
+      (status transitions immediately), through write(collection, doc_id, data).
+    """
+
+    def __init__(self, db, collection="staff_locations", write=None,
+                 min_publish_interval=MIN_PUBLISH_INTERVAL, min_move=MIN_MOVE_M,
+                 write_interval=WRITE_INTERVAL, offline_after=OFFLINE_AFTER,
+                 tick=TICK_INTERVAL, changelog_size=CHANGELOG_SIZE):
+        self.db = db
+        self.collection = collection
+        self.min_publish_interval = min_publish_interval
+        self.min_move = min_move
+        self.write_interval = write_interval
+        self.offline_after = offline_after
+        self.tick = tick
+        # write(collection, doc_id, data) – defaults to a direct set(merge=True)
+        self._write = write or self._direct_write
+
+        self._latest = {}          # userId -> entry (what clients see)
+        self._published = {}       # userId -> entry as last published
+        self._seen_at = {}         # userId -> monotonic time of the last update()
+        self._published_at = {}    # userId -> monotonic time of the last publish
+        self._written_at = {}      # userId -> monotonic time of the last write
+        self._pending = set()      # changed since the last publish
+        self._transitions = set()  # status changed: publish/write without waiting
+        self._unwritten = set()    # published but not yet in Firestore
+        self._seq = 0
+        self._changelog = deque(maxlen=changelog_size)
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stop = threading.Event()
+        self.loaded = False        # staff_locations read (or tried) by start()
+        self._counters = {"updates": 0, "jitter": 0, "published": 0, "coalesced": 0,
+                          "writes": 0, "writeErrors": 0, "wentOffline": 0}
+
+    def _direct_write(self, collection, doc_id, data):
+        self.db.collection(collection).document(doc_id).set(data, merge=True)
+
+    # ---------- Loading / lifecycle ----------
+    def load(self):
+        """Reads staff_locations once, so clients get a snapshot without querying Firestore."""
+        docs = list(self.db.collection(self.collection).stream())
+        now = time.monotonic()
+        with self._cond:
+            for doc in docs:
+                data = doc.to_dict() or {}
+                entry = {
+                    "userId": doc.id,
+                    "name": data.get("name", "Unknown"),
+                    "latitude": data.get("latitude"),
+                    "longitude": data.get("longitude"),
+                    "lastUpdated": data.get("lastUpdated"),
+                    "status": data.get("status", "Offline"),
+                }
+                self._latest.setdefault(doc.id, entry)
+                self._published.setdefault(doc.id, dict(entry))
+                # Unknown age: give "Active" users the full window before they time out
+                self._seen_at.setdefault(doc.id, now)
+                self._written_at.setdefault(doc.id, now)
+        print(f"✅ Live locations loaded for {len(docs)} staff")
+        return len(docs)
+
+    def start(self):
+        """load() (errors only leave the map empty) + the background tick."""
+        try:
+            self.load()
+        except Exception as e:
+            print("⚠️ Could not load staff_locations:", e)
+        self.loaded = True
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="live-locations", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.tick):
+            try:
+                self.step()
+            except Exception as e:
+                print("❌ Live location tick failed:", e)
+
+    # ---------- Updates ----------
+    def update(self, user_id, name, latitude, longitude, status="Active"):
+        """Records a staff member's newest position (cheap; no I/O)."""
+        latitude, longitude = float(latitude), float(longitude)
+        now = time.monotonic()
+        with self._cond:
+            self._counters["updates"] += 1
+            self._seen_at[user_id] = now
+            entry = {
+                "userId": user_id,
+                "name": name,
+                "latitude": latitude,
+                "longitude": longitude,
+                "lastUpdated": datetime.utcnow().isoformat(),
+                "status": status,
+            }
+            self._latest[user_id] = entry
+
+            published = self._published.get(user_id)
+            if published is not None and published.get("status") != status:
+                self._transitions.add(user_id)
+            elif published is not None and published.get("latitude") is not None and \
+                    _distance_m(published["latitude"], published["longitude"], latitude, longitude) < self.min_move:
+                self._counters["jitter"] += 1
+                return
+            if user_id in self._pending:
+                self._counters["coalesced"] += 1
+            self._pending.add(user_id)
+
+    def step(self, now=None):
+        """
+        One tick: marks silent users Offline, publishes due changes and
+        writes due users to Firestore. Returns the number of changes published.
+        """
+        now = time.monotonic() if now is None else now
+        with self._cond:
+            for user_id, entry in self._latest.items():
+                if entry.get("status") != "Offline" and now - self._seen_at.get(user_id, now) > self.offline_after:
+                    self._latest[user_id] = dict(entry, status="Offline")
+                    self._pending.add(user_id)
+                    self._transitions.add(user_id)
+                    self._counters["wentOffline"] += 1
+
+            ready = [user_id for user_id in self._pending
+                     if user_id in self._transitions
+                     or now - self._published_at.get(user_id, -math.inf) >= self.min_publish_interval]
+            for user_id in ready:
+                self._pending.discard(user_id)
+                self._published[user_id] = dict(self._latest[user_id])
+                self._published_at[user_id] = now
+                self._unwritten.add(user_id)
+                self._seq += 1
+                self._changelog.append((self._seq, user_id))
+            self._counters["published"] += len(ready)
+            if ready:
+                self._cond.notify_all()
+
+            due = [user_id for user_id in self._unwritten
+                   if user_id in self._transitions
+                   or now - self._written_at.get(user_id, -math.inf) >= self.write_interval]
+            writes = self._take_writes(due, now)
+            self._transitions.difference_update(ready)
+
+        self._send(writes)
+        return len(ready)
+
+    def _take_writes(self, user_ids, now):
+        writes = []
+        for user_id in user_ids:
+            self._unwritten.discard(user_id)
+            self._written_at[user_id] = now
+            entry = self._published[user_id]
+            writes.append((user_id, {k: v for k, v in entry.items() if k != "userId"}))
+        return writes
+
+    def _send(self, writes):
+        for user_id, data in writes:
+            try:
+                self._write(self.collection, user_id, data)
+                self._counters["writes"] += 1
+            except Exception as e:
+                self._counters["writeErrors"] += 1
+                print(f"❌ Could not write live location for {user_id}:", e)
+
+    def flush(self):
+        """Publishes everything pending and writes every unwritten user now (shutdown)."""
+        with self._cond:
+            self._transitions.update(self._pending)
+        self.step()
+        with self._cond:
+            writes = self._take_writes(list(self._unwritten), time.monotonic())
+        self._send(writes)
+
+    # ---------- Reads ----------
+    def snapshot(self):
+        """(seq, [published entry, ...]) – the state as of sequence number seq."""
+        with self._cond:
+            return self._seq, [dict(e) for e in self._published.values()]
+
+    def changes_since(self, seq, timeout):
+        """
+        Blocks up to `timeout` seconds for changes after `seq`.
+        Returns (new seq, [changed entries]) – an empty list on timeout – or
+        None when `seq` is older than the changelog (send a snapshot instead).
+        """
+        deadline = time.monotonic() + max(0.0, timeout)
+        with self._cond:
+            if seq > self._seq:
+                return None    # stream from before a restart
+            while self._seq <= seq:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return seq, []
+                self._cond.wait(remaining)
+            if not self._changelog or self._changelog[0][0] > seq + 1:
+                return None
+            changed = []
+            for entry_seq, user_id in reversed(self._changelog):
+                if entry_seq <= seq:
+                    break
+                changed.append(user_id)
+            changed = list(dict.fromkeys(reversed(changed)))
+            return self._seq, [dict(self._published[user_id]) for user_id in changed]
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._counters)
+            stats["staff"] = len(self._latest)
+            stats["pending"] = len(self._pending)
+            stats["unwritten"] = len(self._unwritten)
+            stats["seq"] = self._seq
+            return stats
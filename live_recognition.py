@@ -1,137 +1,386 @@
 import cv2
-import face_recognition
 import os
-import numpy as np
 import json
 import sys
+import threading
 import time
+from face_detect import detect_faces, encode_faces
+from face_gallery import FaceGallery
 
 # --- Configuration ---
-FACES_DIR = "faces"
+KNOWN_FACES_FILE = "known_faces.bin"
 PREP_DURATION = 3      # seconds before scanning starts
 SCAN_DURATION = 10     # seconds to scan for a known face
 TOLERANCE = 0.45       # Lower = stricter (0.6 is default; 0.4–0.5 recommended for security)
+CAMERA_INDEX = 0
+WINDOW_NAME = "Face Recognition Attendance"
 
-# --- Load known faces ---
-known_encodings = []
-known_names = []
+# --- Real-time loop ---
+DETECT_MAX_SIDE = 480  # HOG runs on a copy of the frame at most this wide/tall
+DETECT_EVERY_N = 5     # full detection every Nth processed frame, tracking in between
+TRACK_MAX_SIDE = 320   # tracking (template matching) works on a small grayscale copy
+TRACK_MIN_SCORE = 0.5  # below this normalized correlation the track is dropped
+REENCODE_IOU = 0.5     # re-encode a face once its box overlaps the encoded box less than this
 
-if not os.path.exists(FACES_DIR):
-    print(json.dumps({"recognized": False, "error": "Faces directory 'faces' not found"}))
-    sys.exit(1)
+NORMAL_ENDINGS = {
+    "No recognized face found within time limit",
+    "User cancelled during preparation",
+}
 
-valid_extensions = {'.png', '.jpg', '.jpeg'}
-for filename in os.listdir(FACES_DIR):
-    ext = os.path.splitext(filename)[1].lower()
-    if ext in valid_extensions:
-        img_path = os.path.join(FACES_DIR, filename)
+
+# ---------- Capture ----------
+
+class FrameReader:
+    """
+    Reads the camera on its own thread and keeps only the newest frame, so a
+    slow processing loop drops frames instead of working through a backlog.
+    """
+
+    def __init__(self, cap):
+        self._cap = cap
+        self._cond = threading.Condition()
+        self._frame = None
+        self._seq = 0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="frame-reader", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while self._running:
+            ret, frame = self._cap.read()
+            with self._cond:
+                if not ret:
+                    self._running = False
+                else:
+                    self._frame = frame
+                    self._seq += 1
+                self._cond.notify_all()
+
+    def read(self, last_seq, timeout=1.0):
+        """Returns (seq, frame) for a frame newer than last_seq, or (last_seq, None)."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > last_seq or not self._running, timeout)
+            if self._seq > last_seq:
+                return self._seq, self._frame
+            return last_seq, None
+
+    @property
+    def captured(self):
+        return self._seq
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+
+# ---------- Tracking ----------
+
+def iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes."""
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    inter = max(0, bottom - top) * max(0, right - left)
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    union = area_a + area_b - inter
+    return inter / union if union > 0 else 0.0
+
+
+def small_gray(frame, max_side=TRACK_MAX_SIDE):
+    """Returns (grayscale copy with longest side <= max_side, scale)."""
+    h, w = frame.shape[:2]
+    scale = min(1.0, max_side / float(max(h, w)))
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    if scale < 1.0:
+        gray = cv2.resize(gray, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+    return gray, scale
+
+
+class FaceTrack:
+    """A face followed across frames; it is only re-encoded when new or changed."""
+
+    def __init__(self, track_id, box):
+        self.id = track_id
+        self.box = box
+        self.match = None
+        self.encoded_box = None
+
+    def needs_encoding(self):
+        return self.encoded_box is None or iou(self.box, self.encoded_box) < REENCODE_IOU
+
+    def follow(self, prev_gray, gray, scale):
+        """
+        Moves the box to where its patch from the previous frame matches best
+        in the current frame (template matching around the old position).
+        Returns False if the face was lost.
+        """
+        top, right, bottom, left = (int(v * scale) for v in self.box)
+        h, w = bottom - top, right - left
+        if h < 4 or w < 4:
+            return False
+        template = prev_gray[max(0, top):bottom, max(0, left):right]
+        y0, x0 = max(0, top - h // 2), max(0, left - w // 2)
+        window = gray[y0:bottom + h // 2, x0:right + w // 2]
+        if template.size == 0 or window.shape[0] < template.shape[0] or window.shape[1] < template.shape[1]:
+            return False
+
+        scores = cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED)
+        _, best, _, (dx, dy) = cv2.minMaxLoc(scores)
+        if best < TRACK_MIN_SCORE:
+            return False
+        new_top, new_left = (y0 + dy) / scale, (x0 + dx) / scale
+        height, width = self.box[2] - self.box[0], self.box[1] - self.box[3]
+        self.box = (int(new_top), int(new_left + width), int(new_top + height), int(new_left))
+        return True
+
+
+class StageTimer:
+    """Accumulates wall time per loop stage."""
+
+    def __init__(self):
+        self.totals = {}
+        self.counts = {}
+
+    def add(self, stage, seconds):
+        self.totals[stage] = self.totals.get(stage, 0.0) + seconds
+        self.counts[stage] = self.counts.get(stage, 0) + 1
+
+    def summary(self):
+        return {stage: {"calls": self.counts[stage],
+                        "avgMs": round(self.totals[stage] / self.counts[stage] * 1e3, 2)}
+                for stage in self.totals}
+
+
+class LiveRecognizer:
+    """
+    Long-lived webcam scanning engine.
+
+    The gallery is loaded once (and hot-reloaded like in app.py); the dlib
+    models are loaded once per process by the face_recognition import. Only
+    the camera is opened per scan, so a scan starts immediately instead of
+    paying interpreter startup + re-encoding faces/ every time.
+    Scans are serialized: there is one camera.
+    """
+
+    def __init__(self, known_faces_file=KNOWN_FACES_FILE, tolerance=TOLERANCE,
+                 camera_index=CAMERA_INDEX, show_window=True):
+        self.gallery = FaceGallery(known_faces_file, tolerance=tolerance)
+        self.camera_index = camera_index
+        self.show_window = show_window
+        self._camera_lock = threading.Lock()
+
+    def load(self):
+        """Loads the gallery. Returns an error result dict, or None if OK."""
+        if not os.path.exists(self.gallery.path):
+            return {"recognized": False, "error": f"Known faces store '{self.gallery.path}' not found"}
+        snapshot = self.gallery.refresh()
+        if snapshot is None:
+            return {"recognized": False, "error": "Cannot load known faces"}
+        print(f"✅ Loaded {len(snapshot.identities)} known faces: {snapshot.identities}", flush=True)
+        return None
+
+    def _show(self, frame, wait_ms=1):
+        """Shows the frame (if enabled). Returns True if the user pressed 'q'."""
+        if not self.show_window:
+            return False
+        cv2.imshow(WINDOW_NAME, frame)
+        return cv2.waitKey(wait_ms) & 0xFF == ord("q")
+
+    def scan(self, prep_duration=PREP_DURATION, scan_duration=SCAN_DURATION, cancel_event=None):
+        """
+        Runs one preparation + scanning phase on the webcam.
+        Returns {"recognized": True, "name": ..., "user_id": ...} or
+        {"recognized": False, "error": ...}; results of the scanning phase
+        also carry "stats" (processed/captured FPS, dropped frames and
+        per-stage timings).
+        """
+        error = self.load()
+        if error:
+            return error
+
+        with self._camera_lock:
+            cap = cv2.VideoCapture(self.camera_index)
+            if not cap.isOpened():
+                return {"recognized": False, "error": "Cannot access webcam"}
+            try:
+                return self._scan(cap, prep_duration, scan_duration, cancel_event)
+            finally:
+                # --- Cleanup ---
+                cap.release()
+                if self.show_window:
+                    cv2.destroyAllWindows()
+
+    def _scan(self, cap, prep_duration, scan_duration, cancel_event):
+        reader = FrameReader(cap).start()
         try:
-            image = face_recognition.load_image_file(img_path)
-            encodings = face_recognition.face_encodings(image)
-            if encodings:
-                known_encodings.append(encodings[0])
-                known_names.append(os.path.splitext(filename)[0])
+            if not self._prepare(reader, prep_duration, cancel_event):
+                return {"recognized": False, "error": "User cancelled during preparation"}
+            return self._recognize_loop(reader, scan_duration, cancel_event)
+        finally:
+            reader.stop()
+
+    def _prepare(self, reader, prep_duration, cancel_event):
+        """Countdown phase. Returns False if the user cancelled."""
+        # --- Preparation Phase ---
+        seq = 0
+        prep_start = time.time()
+        while time.time() - prep_start < prep_duration:
+            seq, frame = reader.read(seq)
+            if frame is None:
+                break
+            frame = frame.copy()
+            cv2.putText(
+                frame,
+                f"Get Ready... Scanning in {max(0, int(prep_duration - (time.time() - prep_start)))}s",
+                (30, 50),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.8,
+                (0, 0, 255),
+                2
+            )
+            if self._show(frame) or (cancel_event and cancel_event.is_set()):
+                return False
+        return True
+
+    def _recognize_loop(self, reader, scan_duration, cancel_event):
+        """
+        Real-time loop: HOG detection on a downscaled frame every
+        DETECT_EVERY_N frames, template-matching tracking in between, and
+        encoding only for faces that are new or whose box has changed.
+        """
+        print("⏳ Starting face scan...", flush=True)
+
+        # --- Scanning Phase ---
+        snapshot = self.gallery.refresh()
+        timer = StageTimer()
+        tracks = []
+        next_track_id = 0
+        prev_gray = None
+        processed = 0
+        seq = first_seq = reader.captured
+        result = {"recognized": False, "error": "No recognized face found within time limit"}
+        start_time = time.time()
+
+        while True:
+            # Enforce scan timeout
+            if time.time() - start_time > scan_duration:
+                break
+            if cancel_event and cancel_event.is_set():
+                break
+
+            t0 = time.perf_counter()
+            seq, frame = reader.read(seq)
+            if frame is None:
+                break
+            frame = frame.copy()
+            gray, scale = small_gray(frame)
+            t1 = time.perf_counter()
+            timer.add("capture", t1 - t0)
+
+            if processed % DETECT_EVERY_N == 0 or not tracks:
+                # Full detection; keep the identity of tracks that overlap a detection
+                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                boxes = detect_faces(rgb_frame, max_side=DETECT_MAX_SIDE)
+                updated = []
+                for box in boxes:
+                    best = max(tracks, key=lambda t: iou(t.box, box), default=None)
+                    if best is not None and iou(best.box, box) > 0.3:
+                        tracks.remove(best)
+                        best.box = box
+                        updated.append(best)
+                    else:
+                        updated.append(FaceTrack(next_track_id, box))
+                        next_track_id += 1
+                tracks = updated
+                timer.add("detect", time.perf_counter() - t1)
             else:
-                print(f"⚠️ No face found in {filename}", file=sys.stderr)
-        except Exception as e:
-            print(f"⚠️ Error loading {filename}: {e}", file=sys.stderr)
-
-print(f"✅ Loaded {len(known_names)} known faces: {known_names}", flush=True)
-
-# --- Initialize camera ---
-cap = cv2.VideoCapture(0)
-if not cap.isOpened():
-    print(json.dumps({"recognized": False, "error": "Cannot access webcam"}))
-    sys.exit(1)
-
-# --- Preparation Phase ---
-prep_start = time.time()
-while time.time() - prep_start < PREP_DURATION:
-    ret, frame = cap.read()
-    if not ret:
-        break
-    cv2.putText(
-        frame,
-        f"Get Ready... Scanning in {max(0, int(PREP_DURATION - (time.time() - prep_start)))}s",
-        (30, 50),
-        cv2.FONT_HERSHEY_SIMPLEX,
-        0.8,
-        (0, 0, 255),
-        2
-    )
-    cv2.imshow("Face Recognition Attendance", frame)
-    if cv2.waitKey(1) & 0xFF == ord("q"):
-        cap.release()
-        cv2.destroyAllWindows()
-        print(json.dumps({"recognized": False, "error": "User cancelled during preparation"}))
-        sys.exit(0)
-
-print("⏳ Starting face scan...", flush=True)
-
-# --- Scanning Phase ---
-detected = False
-result = {"recognized": False}
-start_time = time.time()
-
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        break
-
-    # Enforce scan timeout
-    if time.time() - start_time > SCAN_DURATION:
-        break
-
-    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    face_locations = face_recognition.face_locations(rgb_frame)
-    face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
-
-    recognized_in_frame = False
-
-    for face_encoding, (top, right, bottom, left) in zip(face_encodings, face_locations):
-        face_distances = face_recognition.face_distance(known_encodings, face_encoding)
-        best_match_index = np.argmin(face_distances)
-        best_distance = face_distances[best_match_index]
-
-        if best_distance <= TOLERANCE:
-            name = known_names[best_match_index]
-            cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
-            cv2.putText(frame, name, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-            result = {
-                "recognized": True,
-                "name": name,
-                "user_id": name
-            }
-            detected = True
-            recognized_in_frame = True
-            print(f"✅ Recognized: {name} (distance: {best_distance:.3f})", flush=True)
-            break
-        else:
-            # Unknown person — draw red box
-            cv2.rectangle(frame, (left, top), (right, bottom), (0, 0, 255), 2)
-            cv2.putText(frame, "Unknown", (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 255), 2)
-            print(f"❌ Unknown face (closest distance: {best_distance:.3f})", flush=True)
-
-    # If no faces detected at all, optionally show message (optional)
-    if not face_locations:
-        cv2.putText(frame, "No face detected", (30, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 165, 0), 2)
-
-    cv2.imshow("Face Recognition Attendance", frame)
-
-    if detected:
-        cv2.waitKey(2000)  # Show success for 2 seconds
-        break
-
-    if cv2.waitKey(1) & 0xFF == ord("q"):
-        break
-
-# --- Cleanup ---
-cap.release()
-cv2.destroyAllWindows()
-
-# --- Final JSON output ---
-if not detected:
-    result = {"recognized": False, "error": "No recognized face found within time limit"}
-
-print(json.dumps(result))
-sys.stdout.flush()
\ No newline at end of file
+                tracks = [t for t in tracks if t.follow(prev_gray, gray, scale)]
+                timer.add("track", time.perf_counter() - t1)
+            prev_gray = gray
+            processed += 1
+
+            # Encode + match only the faces that need it
+            pending = [t for t in tracks if t.needs_encoding()]
+            if pending:
+                t2 = time.perf_counter()
+                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                encodings = encode_faces(rgb_frame, [t.box for t in pending])
+                t3 = time.perf_counter()
+                timer.add("encode", t3 - t2)
+                for track, match in zip(pending, self.gallery.match(encodings, snapshot)):
+                    track.match = match
+                    track.encoded_box = track.box
+                timer.add("match", time.perf_counter() - t3)
+
+            recognized = None
+            for track in tracks:
+                top, right, bottom, left = track.box
+                match = track.match
+                if match is not None and match.recognized:
+                    cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
+                    cv2.putText(frame, match.name, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
+                    recognized = recognized or match
+                else:
+                    # Unknown person — draw red box
+                    cv2.rectangle(frame, (left, top), (right, bottom), (0, 0, 255), 2)
+                    cv2.putText(frame, "Unknown", (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 255), 2)
+
+            # If no faces detected at all, optionally show message (optional)
+            if not tracks:
+                cv2.putText(frame, "No face detected", (30, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 165, 0), 2)
+
+            if recognized is not None:
+                print(f"✅ Recognized: {recognized.name} (distance: {recognized.distance:.3f})", flush=True)
+                self._show(frame, 2000)  # Show success for 2 seconds
+                result = {
+                    "recognized": True,
+                    "name": recognized.name,
+                    "user_id": recognized.name
+                }
+                break
+
+            for track in pending:
+                if track.match is not None:
+                    print(f"❌ Unknown face (closest distance: {track.match.distance:.3f})", flush=True)
+
+            t4 = time.perf_counter()
+            quit_pressed = self._show(frame)
+            timer.add("display", time.perf_counter() - t4)
+            if quit_pressed:
+                break
+
+        elapsed = max(time.time() - start_time, 1e-6)
+        captured = reader.captured - first_seq
+        stats = {
+            "fps": round(processed / elapsed, 1),
+            "captureFps": round(captured / elapsed, 1),
+            "framesProcessed": processed,
+            "framesDropped": max(0, captured - processed),
+            "stages": timer.summary(),
+        }
+        print(f"📊 {stats['fps']} fps processed / {stats['captureFps']} fps captured, "
+              f"{stats['framesDropped']} frames dropped, stages: {stats['stages']}", flush=True)
+        result["stats"] = stats
+        return result
+
+
+def main():
+    recognizer = LiveRecognizer()
+    result = recognizer.scan()
+
+    # --- Final JSON output ---
+    print(json.dumps(result))
+    sys.stdout.flush()
+    # Setup problems (no store, no webcam) exit non-zero; "nobody recognized" does not
+    if not result.get("recognized") and result.get("error") not in NORMAL_ENDINGS:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
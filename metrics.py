@@ -0,0 +1,271 @@
+import cProfile
+import os
+import random
+import re
+import threading
+import time
+from bisect import bisect_left
+
+# ---------- Configuration ----------
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROFILE_DIR = "profiles"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _snake(name):
+    """'avgFlushMs' -> 'avg_flush_ms'"""
+    return re.sub(r"(?<=[a-z0-9])([A-Z])", r"_\1", name).lower()
+
+
+class Counter:
+    """Monotonic counter, optionally split by labels."""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in values]
+
+
+class Histogram:
+    """
+    Prometheus-style histogram: cumulative counts per upper bound, plus sum
+    and count. observe() is a bisect and a few adds under a lock.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}   # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+    Named metrics plus stats() callbacks. The callbacks expose the counters
+    the helper classes already keep (user_cache.stats(), ...) as gauges,
+    read when /metrics is scraped.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._stats = []
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help_text, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, labelnames, **kwargs)
+            return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._get_or_create(Counter, name, help_text, labelnames)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._get_or_create(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def register_stats(self, prefix, stats_fn):
+        """Every numeric / boolean value of stats_fn() becomes gauge <prefix>_<key>."""
+        with self._lock:
+            self._stats.append((prefix, stats_fn))
+
+    def render(self):
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+            stats = list(self._stats)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        for prefix, stats_fn in stats:
+            try:
+                values = stats_fn()
+            except Exception as e:
+                print(f"⚠️ Could not collect {prefix} stats:", e)
+                continue
+            for key, value in values.items():
+                if isinstance(value, bool):
+                    value = int(value)
+                if not isinstance(value, (int, float)):
+                    continue
+                name = f"{prefix}_{_snake(key)}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "attendance_stage_seconds", "Time spent per stage of a request", ("operation", "stage"))
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total", "HTTP requests by route, method and status", ("route", "method", "status"))
+HTTP_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency (until the response starts)", ("route",))
+
+
+# ---------- Stage timing ----------
+
+class _StageTimer:
+    __slots__ = ("operation", "stage", "start")
+
+    def __init__(self, operation, stage):
+        self.operation = operation
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_SECONDS.observe(time.perf_counter() - self.start, operation=self.operation, stage=self.stage)
+        return False
+
+
+def stage(operation, name):
+    """
+    with stage("recognize", "user_lookup"): ...
+    records the block's wall time in attendance_stage_seconds (also when it raises).
+    """
+    return _StageTimer(operation, name)
+
+
+def observe_stages(operation, timings):
+    """Records {stage: seconds} measured elsewhere (e.g. in a recognition worker)."""
+    for name, seconds in (timings or {}).items():
+        STAGE_SECONDS.observe(seconds, operation=operation, stage=name)
+
+
+# ---------- Sampled profiling ----------
+
+class RequestProfiler:
+    """
+    Runs a random `rate` fraction of requests under cProfile and writes the
+    profile of those slower than `slow` seconds to `directory`
+    (<time>_<route>_<ms>ms.prof, open with pstats or snakeviz).
+    cProfile profiles one thread at a time, so only one request is
+    profiled at once; the others just run.
+    """
+
+    def __init__(self, rate=0.0, slow=1.0, directory=PROFILE_DIR):
+        self.rate = rate
+        self.slow = slow
+        self.directory = directory
+        self._busy = threading.Lock()
+        self.dumped = 0
+
+    def start(self):
+        if self.rate <= 0 or random.random() >= self.rate or not self._busy.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is active in this process
+            self._busy.release()
+            return None
+        return profile
+
+    def finish(self, profile, seconds, label):
+        """Stops profile; dumps it if the request took `slow` seconds or more (None = unknown, never)."""
+        if profile is None:
+            return
+        profile.disable()
+        self._busy.release()
+        if seconds is None or seconds < self.slow:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            safe_label = re.sub(r"[^A-Za-z0-9_-]+", "_", label).strip("_") or "request"
+            path = os.path.join(self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}_{safe_label}_{seconds * 1e3:.0f}ms.prof")
+            profile.dump_stats(path)
+            self.dumped += 1
+            print(f"⚠️ Slow request ({seconds * 1e3:.0f} ms), profile written to {path}")
+        except OSError as e:
+            print("❌ Could not write request profile:", e)
+
+
+def instrument_app(app, profiler=None):
+    """HTTP request counters / latency for every route, plus the optional profiler."""
+    from flask import g, request
+
+    @app.before_request
+    def _metrics_start():
+        g.metrics_start = time.perf_counter()
+        g.metrics_profile = profiler.start() if profiler is not None else None
+
+    @app.after_request
+    def _metrics_observe(response):
+        start = g.get("metrics_start")
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            HTTP_SECONDS.observe(time.perf_counter() - start, route=route)
+            HTTP_REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+        return response
+
+    @app.teardown_request
+    def _metrics_profile(_exc):
+        profile = g.pop("metrics_profile", None)
+        if profile is not None:
+            # No start time if an earlier before_request hook raised or answered;
+            # the profiler must still be stopped, there is just nothing to keep
+            start = g.get("metrics_start")
+            seconds = time.perf_counter() - start if start is not None else None
+            route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            profiler.finish(profile, seconds, route)
@@ -0,0 +1,37 @@
+"""
+One-shot migration: known_faces.json -> known_faces.bin (+ search index).
+
+Usage (from the project root):
+    python migrate_faces.py
+    python migrate_faces.py --json old/known_faces.json --out known_faces.bin
+"""
+import argparse
+import os
+
+from face_index import build_index, index_path_for
+from face_matcher import identity_centroids
+from face_store import LEGACY_JSON_FILE, STORE_FILE, migrate_json, read_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--json", default=LEGACY_JSON_FILE, help="legacy JSON file to convert")
+    parser.add_argument("--out", default=STORE_FILE, help="binary store to write")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.json):
+        print(f"❌ {args.json} not found")
+        raise SystemExit(1)
+
+    count = migrate_json(args.json, args.out)
+    names, matrix, _ = read_store(args.out)
+    _, _, centroids = identity_centroids(names, matrix)
+    build_index(centroids).save(index_path_for(args.out))
+
+    json_size = os.path.getsize(args.json)
+    bin_size = os.path.getsize(args.out)
+    print(f"✅ Migrated {count} faces: {args.json} ({json_size} bytes) -> {args.out} ({bin_size} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import threading
+from datetime import datetime
+
+# ---------- Configuration ----------
+OPEN_SESSIONS_COLLECTION = "open_sessions"
+# Days of sessions kept in memory (today, plus yesterday around midnight)
+MEMORY_DAYS = 2
+
+
+def session_id(user_id, date_iso):
+    """open_sessions doc id, e.g. 'VQ4cEU4v3OQH2LcROZEsCHdsJhy1_2025-11-24'."""
+    return f"{user_id}_{date_iso}"
+
+
+def doc_datetime(doc_data, tz=None):
+    """
+    Sort key for "latest" attendance doc: lastUpdated, then the ISO
+    timestamp string, else the earliest possible time.
+    """
+    earliest = datetime.min.replace(tzinfo=tz)
+    lu = doc_data.get("lastUpdated")
+    if lu is not None:
+        return lu
+    ts = doc_data.get("timestamp")
+    if isinstance(ts, str):
+        try:
+            return datetime.fromisoformat(ts)
+        except Exception:
+            return earliest
+    return earliest
+
+
+class OpenSessions:
+    """
+    (userId, date) -> attendance doc id of that day's check-in, so /checkout
+    goes straight to the right doc instead of reading the user's history.
+
+    Lookups try, in order:
+      1. memory     – sessions recorded by this process (today/yesterday)
+      2. index      – one get() of open_sessions/{userId}_{date}
+      3. scan       – attendance where userId == .. and date == .. (older
+                      check-ins written before the index existed); a hit is
+                      written back to the index
+    """
+
+    def __init__(self, db, attendance_collection, collection=OPEN_SESSIONS_COLLECTION,
+                 write=None, tz=None):
+        self.db = db
+        self.attendance_collection = attendance_collection
+        self.collection = collection
+        self.tz = tz
+        # write(collection, doc_id, data) – defaults to a direct set(merge=True)
+        self._write = write or self._direct_write
+        self._by_date = {}      # date_iso -> {user_id: attendance doc id}
+        self._lock = threading.Lock()
+        self._counters = {"memory": 0, "index": 0, "scan": 0, "missing": 0}
+
+    def _direct_write(self, collection, doc_id, data):
+        self.db.collection(collection).document(doc_id).set(data, merge=True)
+
+    def _remember(self, user_id, date_iso, attendance_doc_id):
+        with self._lock:
+            self._by_date.setdefault(date_iso, {})[user_id] = attendance_doc_id
+            for old in sorted(self._by_date)[:-MEMORY_DAYS]:
+                del self._by_date[old]
+
+    def record(self, user_id, date_iso, attendance_doc_id, checked_in_at):
+        """Called on check-in: remembers the session and writes its index doc."""
+        if not user_id:
+            return
+        self._remember(user_id, date_iso, attendance_doc_id)
+        self._write(self.collection, session_id(user_id, date_iso), {
+            "userId": user_id,
+            "date": date_iso,
+            "attendanceDocId": attendance_doc_id,
+            "checkIn": checked_in_at,
+            "checkOut": None,
+        })
+
+    def close(self, user_id, date_iso, checked_out_at):
+        """Called on checkout: marks the index doc as checked out."""
+        self._write(self.collection, session_id(user_id, date_iso), {"checkOut": checked_out_at})
+
+    def find(self, user_id, date_iso, date_slash):
+        """Attendance doc id of the user's check-in on that day, or None."""
+        with self._lock:
+            doc_id = self._by_date.get(date_iso, {}).get(user_id)
+            if doc_id is not None:
+                self._counters["memory"] += 1
+                return doc_id
+
+        snap = self.db.collection(self.collection).document(session_id(user_id, date_iso)).get()
+        if snap.exists:
+            doc_id = (snap.to_dict() or {}).get("attendanceDocId")
+            if doc_id:
+                self._remember(user_id, date_iso, doc_id)
+                with self._lock:
+                    self._counters["index"] += 1
+                return doc_id
+
+        # Check-ins from before the index existed: equality filters only,
+        # so no composite index is needed, and only that day's docs are read
+        query_ref = (self.db.collection(self.attendance_collection)
+                     .where("userId", "==", user_id)
+                     .where("date", "==", date_slash))
+        docs = [(snap, snap.to_dict() or {}) for snap in query_ref.stream()]
+        if not docs:
+            with self._lock:
+                self._counters["missing"] += 1
+            return None
+
+        latest_snap, latest_data = max(docs, key=lambda pair: doc_datetime(pair[1], self.tz))
+        with self._lock:
+            self._counters["scan"] += 1
+        self.record(user_id, date_iso, latest_snap.id, latest_data.get("lastUpdated"))
+        return latest_snap.id
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["inMemory"] = sum(len(users) for users in self._by_date.values())
+            return stats
@@ -0,0 +1,39 @@
+"""
+Recomputes the stats_daily / stats_monthly rollups from the raw attendance docs.
+
+Run it once after deploying the rollups (to cover older check-ins) or
+whenever attendance docs were edited by hand. Rollup docs for the days and
+months found are overwritten.
+
+Usage (from the project root):
+    python rebuild_stats.py                      # everything
+    python rebuild_stats.py --since 2025-11-01   # from that month on
+    python rebuild_stats.py --dry-run
+
+Reads and writes through the same STORAGE_BACKEND as the app (storage.py).
+"""
+import argparse
+
+from stats_rollups import DAILY_COLLECTION, MONTHLY_COLLECTION, rebuild
+from storage import open_storage
+
+ATTENDANCE_COLLECTION = "attendance_test"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--since", help="first date to rebuild (YYYY-MM-DD, rounded down to its month)")
+    parser.add_argument("--collection", default=ATTENDANCE_COLLECTION)
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be written")
+    args = parser.parse_args()
+
+    db = open_storage()
+
+    scanned, daily, monthly = rebuild(db, args.collection, args.since, args.dry_run)
+    action = "Would write" if args.dry_run else "✅ Wrote"
+    print(f"Scanned {scanned} attendance docs")
+    print(f"{action} {daily} docs to '{DAILY_COLLECTION}' and {monthly} docs to '{MONTHLY_COLLECTION}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# ---------- Configuration ----------
+# Entries kept in memory (LRU); with a path they are also persisted to SQLite
+MEMORY_CAPACITY = 10000
+# How long a duplicate waits for the in-flight original before giving up
+COALESCE_TIMEOUT = 30.0
+# Seconds a duplicate that gave up should wait before retrying
+RETRY_AFTER_SECONDS = 5
+
+
+class StillRunning(Exception):
+    """The original for a key is still running after coalesce_timeout; retry later."""
+
+    def __init__(self, key, retry_after=RETRY_AFTER_SECONDS):
+        super().__init__(f"{key!r} is still in progress")
+        self.retry_after = retry_after
+
+
+class _Pending:
+    """The in-flight original that concurrent duplicates wait on."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+
+
+class RecentResults:
+    """
+    Results by key for `ttl` seconds: recent check-ins by userId + date, or
+    responses by Idempotency-Key.
+
+    - begin(key) returns the stored result, or None when the caller is now
+      the owner of `key` and must call finish(key, value) or abandon(key).
+    - While an owner is working, begin() for the same key waits for it and
+      returns its result (concurrent duplicates are coalesced); if the owner
+      abandons, the next waiter becomes the owner. A waiter never takes
+      over a key whose owner is still working: after coalesce_timeout
+      begin() raises StillRunning instead.
+    - Memory LRU first; with `path`, results also go to SQLite (table
+      `table`) and survive a restart.
+    Values must be JSON-serializable.
+    """
+
+    def __init__(self, ttl, path=None, table="recent_results", capacity=MEMORY_CAPACITY,
+                 coalesce_timeout=COALESCE_TIMEOUT):
+        self.ttl = ttl
+        self.path = path
+        self.table = table
+        self.capacity = capacity
+        self.coalesce_timeout = coalesce_timeout
+        self._memory = OrderedDict()    # key -> (value, stored_at)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "coalesced": 0, "abandoned": 0, "stored": 0,
+                          "timedOut": 0}
+
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(f"CREATE TABLE IF NOT EXISTS {table} ("
+                             "key TEXT PRIMARY KEY, value TEXT NOT NULL, stored REAL NOT NULL)")
+            self._db.commit()
+
+    # ---------- Storage ----------
+    def _remember(self, key, value, stored_at):
+        self._memory[key] = (value, stored_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.capacity:
+            self._memory.popitem(last=False)
+
+    def _fresh(self, key):
+        """Called with _lock held: the unexpired value for key, or None."""
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is None and self._db is not None:
+            row = self._db.execute(f"SELECT value, stored FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row:
+                entry = (json.loads(row[0]), row[1])
+                self._remember(key, *entry)
+        if entry is None:
+            return None
+        if now - entry[1] > self.ttl:
+            self._memory.pop(key, None)
+            return None
+        self._memory.move_to_end(key)
+        return entry[0]
+
+    # ---------- Public API ----------
+    def peek(self, key):
+        """The stored result for key, or None – never waits or claims."""
+        with self._lock:
+            return self._fresh(key)
+
+    def begin(self, key):
+        """
+        Stored (or just finished) result for key, or None when the caller
+        now owns key and must finish() or abandon() it. Raises StillRunning
+        if the owner has not finished within coalesce_timeout.
+        """
+        waited = False
+        while True:
+            with self._lock:
+                value = self._fresh(key)
+                if value is not None:
+                    self._counters["hits"] += 1
+                    return value
+                pending = self._inflight.get(key)
+                if pending is None:
+                    self._inflight[key] = _Pending()
+                    self._counters["misses"] += 1
+                    return None
+                if not waited:
+                    self._counters["coalesced"] += 1
+                    waited = True
+            if not pending.event.wait(self.coalesce_timeout):
+                # Taking over would run the original a second time alongside it
+                with self._lock:
+                    self._counters["timedOut"] += 1
+                raise StillRunning(key)
+            if pending.value is not None:
+                return pending.value
+
+    def _store(self, key, value, stored_at):
+        """Called with _lock held."""
+        self._remember(key, value, stored_at)
+        if self._db is not None:
+            self._db.execute(f"INSERT OR REPLACE INTO {self.table} (key, value, stored) VALUES (?, ?, ?)",
+                             (key, json.dumps(value), stored_at))
+            self._db.commit()
+
+    def finish(self, key, value):
+        """Stores the owner's result and hands it to everyone waiting on key."""
+        with self._lock:
+            self._store(key, value, time.time())
+            self._counters["stored"] += 1
+            pending = self._inflight.pop(key, None)
+        if pending is not None:
+            pending.value = value
+            pending.event.set()
+
+    def abandon(self, key):
+        """The owner failed: nothing is stored and the next waiter takes over."""
+        with self._lock:
+            pending = self._inflight.pop(key, None)
+            self._counters["abandoned"] += 1
+        if pending is not None:
+            pending.event.set()
+
+    def update(self, key, value):
+        """
+        Replaces a stored result, keeping its expiry (e.g. once a pending
+        address is resolved). Returns False if nothing is stored for key.
+        """
+        with self._lock:
+            if self._fresh(key) is None:
+                return False
+            self._store(key, value, self._memory[key][1])
+            return True
+
+    def forget(self, key):
+        """Drops a stored result (e.g. the check-in after a checkout)."""
+        with self._lock:
+            self._memory.pop(key, None)
+            if self._db is not None:
+                self._db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["memoryEntries"] = len(self._memory)
+            stats["inflight"] = len(self._inflight)
+            return stats
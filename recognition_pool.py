@@ -0,0 +1,266 @@
+import base64
+import io
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# numpy / PIL / dlib are imported where they are used, so importing this
+# module (and app.py) stays cheap; workers load them in init_worker().
+
+# ---------- Configuration ----------
+# Jobs allowed to wait for a free worker before we start rejecting requests
+QUEUE_SIZE = 8
+# How long /recognize waits for a worker result (seconds)
+RESULT_TIMEOUT = 30.0
+# Default Retry-After (seconds) when the pool is saturated
+RETRY_AFTER_SECONDS = 2
+
+# EXIF tag holding how the camera was turned
+EXIF_ORIENTATION = 0x0112
+
+# Per-process state, set up by init_worker()
+_gallery = None
+_detect_options = {}
+_draft_side = None
+
+
+class PoolBusy(Exception):
+    """The submission queue is full; the client should retry later."""
+
+    def __init__(self, retry_after=RETRY_AFTER_SECONDS):
+        super().__init__("Recognition queue is full")
+        self.retry_after = retry_after
+
+
+# ---------- Worker side ----------
+
+def init_worker(gallery_path, tolerance, detect_options, draft_decode=True):
+    """
+    Runs once in every worker: loads the dlib models with a dummy encode and
+    preloads the face gallery, so the first real request is not the slow one.
+    """
+    global _gallery, _detect_options, _draft_side
+    import face_recognition
+    import numpy as np
+    from face_gallery import FaceGallery
+
+    _detect_options = dict(detect_options or {})
+    # Large JPEGs are decoded straight at about the detector's working size
+    _draft_side = _detect_options.get("max_side") if draft_decode else None
+    _gallery = FaceGallery(gallery_path, tolerance=tolerance)
+    _gallery.refresh()
+
+    dummy = np.zeros((150, 150, 3), dtype=np.uint8)
+    face_recognition.face_locations(dummy)
+    face_recognition.face_encodings(dummy, known_face_locations=[(0, 150, 150, 0)])
+
+
+def decode_image(image, draft_side=None):
+    """
+    Raw image bytes (JPEG/PNG), 'data:image/png;base64,....' or bare
+    base64 -> RGB numpy array.
+
+    With draft_side, a JPEG larger than that is decoded by libjpeg at 1/2,
+    1/4 or 1/8 scale (the smallest that keeps both sides >= draft_side),
+    instead of decoding every pixel and resizing afterwards. Phone photos
+    are turned upright by their EXIF orientation tag.
+    """
+    import numpy as np
+    from PIL import Image, ImageOps
+
+    if isinstance(image, str):
+        # Skip a "data:image/png;base64," header without splitting the whole string
+        comma = image.find(",", 0, 100)
+        image = base64.b64decode(image[comma + 1:] if comma >= 0 else image)
+    pil_image = Image.open(io.BytesIO(image))
+    if draft_side and pil_image.format == "JPEG" and max(pil_image.size) > draft_side:
+        pil_image.draft("RGB", (draft_side, draft_side))
+    if pil_image.getexif().get(EXIF_ORIENTATION, 1) != 1:
+        pil_image = ImageOps.exif_transpose(pil_image)
+    if pil_image.mode != "RGB":
+        pil_image = pil_image.convert("RGB")
+    return np.asarray(pil_image)
+
+
+def recognize_image(image, single_face=False):
+    """
+    All CPU-heavy work of /recognize: image decode, detection, encoding and
+    matching. `image` is raw bytes or a base64 (data URL) string.
+    Returns either {"error": code} or {"matches": [FaceMatch, ...]}, both
+    with "timings": {stage: seconds} for the stages that ran, since the
+    Flask side cannot time work done in a worker process.
+    """
+    from face_detect import detect_faces, encode_faces
+
+    timings = {}
+    t0 = time.perf_counter()
+    try:
+        rgb_image = decode_image(image, _draft_side)
+    except Exception as e:
+        print("❌ Error decoding image:", e)
+        return {"error": "invalid_image", "timings": timings}
+    timings["decode"] = time.perf_counter() - t0
+
+    snapshot = _gallery.refresh()
+    if snapshot is None:
+        return {"error": "no_gallery", "timings": timings}
+    if len(snapshot) == 0:
+        return {"error": "empty_gallery", "timings": timings}
+
+    # detect_and_encode(), split so detection and encoding are timed separately
+    t0 = time.perf_counter()
+    boxes = detect_faces(rgb_image, largest_only=single_face, **_detect_options)
+    timings["detect"] = time.perf_counter() - t0
+    if not boxes:
+        return {"error": "no_face", "timings": timings}
+    t0 = time.perf_counter()
+    encodings = encode_faces(rgb_image, boxes)
+    timings["encode"] = time.perf_counter() - t0
+    if not encodings:
+        return {"error": "no_face", "timings": timings}
+
+    t0 = time.perf_counter()
+    matches = _gallery.match(encodings, snapshot)
+    timings["match"] = time.perf_counter() - t0
+    return {"matches": matches, "timings": timings}
+
+
+def _ping():
+    """Warm-up job: returns once this worker has run init_worker()."""
+    time.sleep(0.05)   # long enough that one worker cannot take every ping
+    return os.getpid()
+
+
+# ---------- Pool (Flask side) ----------
+
+class RecognitionPool:
+    """
+    Process pool for face recognition, decoupled from the Flask request threads.
+
+    - workers      = number of processes (0 = run inline in the request thread,
+                     one request at a time)
+    - queue_size   = jobs that may wait for a worker; beyond workers + queue_size
+                     recognize() raises PoolBusy instead of queueing
+    Each worker has warm dlib models and its own hot-reloaded gallery (the
+    memory-mapped store is shared between them by the OS).
+    """
+
+    def __init__(self, workers, gallery_path, tolerance, detect_options=None,
+                 queue_size=QUEUE_SIZE, start_method="spawn", draft_decode=True):
+        self.workers = max(0, int(workers))
+        self.queue_size = queue_size
+        self.gallery_path = gallery_path
+        self.tolerance = tolerance
+        self.detect_options = dict(detect_options or {})
+        self.draft_decode = draft_decode
+        self.start_method = start_method
+        self._slots = threading.BoundedSemaphore(max(1, self.workers) + queue_size)
+        self._executor = None
+        self._inline_ready = False
+        self.ready = False       # set by warm_up()
+        # dlib models are not thread-safe: inline jobs from concurrent requests run one at a time
+        self._inline_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Starts the workers (called lazily on first submit); returns the executor."""
+        with self._lock:
+            if self.workers == 0:
+                if not self._inline_ready:
+                    init_worker(self.gallery_path, self.tolerance, self.detect_options, self.draft_decode)
+                    self._inline_ready = True
+                return None
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(self.start_method),
+                    initializer=init_worker,
+                    initargs=(self.gallery_path, self.tolerance, self.detect_options, self.draft_decode),
+                )
+                print(f"✅ Started recognition pool with {self.workers} workers")
+            return self._executor
+
+    def warm_up(self, timeout=120.0):
+        """
+        Starts the pool and waits until every worker has loaded the dlib
+        models and the gallery and run its dummy encode, so the first
+        /recognize does not pay for it.
+        """
+        executor = self.start()
+        if self.workers > 0:
+            deadline = time.monotonic() + timeout
+            seen = set()
+            while len(seen) < self.workers:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"only {len(seen)} of {self.workers} recognition workers started")
+                futures = [executor.submit(_ping) for _ in range(self.workers)]
+                seen.update(future.result(timeout=remaining) for future in futures)
+        self.ready = True
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _replace_broken(self, executor):
+        """Drops a broken executor (a worker died, e.g. OOM); the next start() makes a new one."""
+        with self._lock:
+            if self._executor is not executor:
+                return     # another request already replaced it
+            self._executor = None
+        print("⚠️ Recognition pool broken, restarting it")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def retry_after(self):
+        """Rough wait before a retry has a free slot: one round of jobs per worker."""
+        return max(RETRY_AFTER_SECONDS, math.ceil(self.queue_size / max(1, self.workers)))
+
+    def recognize(self, image, single_face=False, timeout=RESULT_TIMEOUT, _retry=True):
+        """
+        Runs recognize_image() in the pool and waits for the result.
+        Raises PoolBusy when the queue is full, TimeoutError if no result
+        arrives within timeout. If a worker dies the pool is replaced and
+        the job retried once; PoolBusy if that fails too.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise PoolBusy(self.retry_after())
+
+        try:
+            executor = self.start()
+        except Exception:
+            self._slots.release()
+            raise
+
+        if self.workers == 0:
+            try:
+                with self._inline_lock:
+                    return recognize_image(image, single_face)
+            finally:
+                self._slots.release()
+
+        try:
+            future = executor.submit(recognize_image, image, single_face)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM) since the last job
+            self._slots.release()
+        except Exception:
+            self._slots.release()
+            raise
+        else:
+            future.add_done_callback(lambda _: self._slots.release())
+            try:
+                return future.result(timeout=timeout)
+            except BrokenProcessPool:
+                pass    # a worker died while running this (or another) job
+
+        # Replace the pool and retry once
+        self._replace_broken(executor)
+        if not _retry:
+            raise PoolBusy(self.retry_after())
+        return self.recognize(image, single_face, timeout, _retry=False)
@@ -0,0 +1,200 @@
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# ---------- Configuration ----------
+JOB_TTL = 600          # seconds a finished job is kept for /scan-status
+MAX_JOBS = 200         # hard cap on stored job records (mostly finished ones)
+# Queued + running scans accepted at once; a scan takes the camera for ~10 s,
+# so more than a few only means minutes of waiting – reject them instead
+MAX_PENDING = 3
+FINISHED = ("completed", "failed")
+
+
+class JobQueueFull(Exception):
+    """Too many queued/running scans to accept another one."""
+
+
+class ScanJobManager:
+    """
+    In-process replacement for "subprocess.run(['python', 'live_recognition.py'])".
+
+    One long-lived recognition engine (created on first use by engine_factory)
+    runs scans one at a time on a background thread – there is a single camera.
+    Job records:
+      { id, status: queued|running|completed|failed, result, error,
+        createdAt, queuedMs, runMs }
+    At most `max_pending` scans are queued or running; submit() raises
+    JobQueueFull beyond that. Finished jobs expire after `ttl` seconds and
+    the store never holds more than `max_jobs` records (oldest finished jobs
+    are evicted first).
+    """
+
+    def __init__(self, engine_factory, ttl=JOB_TTL, max_jobs=MAX_JOBS, max_pending=MAX_PENDING):
+        self._engine_factory = engine_factory
+        self._engine = None
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self.max_pending = max_pending
+        self._jobs = OrderedDict()
+        self._cond = threading.Condition()
+        self._queue = queue.Queue()
+        self._worker = None
+        self._stats = {
+            "submitted": 0,
+            "rejected": 0,
+            "completed": 0,
+            "failed": 0,
+            "evicted": 0,
+            "queueMsTotal": 0.0,
+            "runMsTotal": 0.0,
+            "runMsMax": 0.0,
+        }
+
+    # ---------- Public API ----------
+    def submit(self):
+        """Queues a new scan and returns its job id."""
+        with self._cond:
+            self._evict()
+            pending = sum(1 for job in self._jobs.values() if job["status"] not in FINISHED)
+            if pending >= self.max_pending or len(self._jobs) >= self.max_jobs:
+                self._stats["rejected"] += 1
+                raise JobQueueFull(f"{pending} scan jobs pending")
+
+            job_id = str(uuid.uuid4())
+            self._jobs[job_id] = {
+                "id": job_id,
+                "status": "queued",
+                "result": None,
+                "error": None,
+                "createdAt": time.time(),
+                "queuedMs": None,
+                "runMs": None,
+                "_enqueued": time.monotonic(),
+                "_finished": None,
+            }
+            self._stats["submitted"] += 1
+            self._ensure_worker()
+        self._queue.put(job_id)
+        return job_id
+
+    def get(self, job_id):
+        with self._cond:
+            self._evict()
+            return self._public(self._jobs.get(job_id))
+
+    def wait(self, job_id, timeout):
+        """
+        Long-poll: blocks until the job has finished (or timeout seconds pass)
+        and returns its record, or None if the job is unknown/expired.
+        """
+        deadline = time.monotonic() + max(0.0, timeout)
+        with self._cond:
+            while True:
+                job = self._jobs.get(job_id)
+                if job is None or job["status"] in FINISHED:
+                    return self._public(job)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return self._public(job)
+                self._cond.wait(remaining)
+
+    def wait_for_change(self, job_id, last_status, timeout):
+        """Blocks until the job's status differs from last_status (used by SSE)."""
+        deadline = time.monotonic() + max(0.0, timeout)
+        with self._cond:
+            while True:
+                job = self._jobs.get(job_id)
+                if job is None or job["status"] != last_status:
+                    return self._public(job)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return self._public(job)
+                self._cond.wait(remaining)
+
+    def discard(self, job_id):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is not None and job["status"] in FINISHED:
+                del self._jobs[job_id]
+
+    def stats(self):
+        with self._cond:
+            finished = self._stats["completed"] + self._stats["failed"]
+            stats = dict(self._stats)
+            stats["stored"] = len(self._jobs)
+            stats["pending"] = self._queue.qsize()
+            stats["queueMsTotal"] = round(stats["queueMsTotal"], 1)
+            stats["runMsTotal"] = round(stats["runMsTotal"], 1)
+            stats["runMsMax"] = round(stats["runMsMax"], 1)
+            stats["avgQueueMs"] = round(stats["queueMsTotal"] / finished, 1) if finished else None
+            stats["avgRunMs"] = round(stats["runMsTotal"] / finished, 1) if finished else None
+            return stats
+
+    # ---------- Internals ----------
+    @staticmethod
+    def _public(job):
+        if job is None:
+            return None
+        return {k: v for k, v in job.items() if not k.startswith("_")}
+
+    def _evict(self):
+        """Drops expired finished jobs, then the oldest finished ones over max_jobs."""
+        now = time.monotonic()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job["_finished"] is not None and now - job["_finished"] > self.ttl]
+        overflow = len(self._jobs) - len(expired) - self.max_jobs + 1
+        if overflow > 0:
+            for job_id, job in self._jobs.items():
+                if overflow <= 0:
+                    break
+                if job["status"] in FINISHED and job_id not in expired:
+                    expired.append(job_id)
+                    overflow -= 1
+        for job_id in expired:
+            del self._jobs[job_id]
+        self._stats["evicted"] += len(expired)
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="scan-jobs", daemon=True)
+            self._worker.start()
+
+    def _update(self, job_id, **fields):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+            self._cond.notify_all()
+            return job
+
+    def _run(self):
+        while True:
+            job_id = self._queue.get()
+            with self._cond:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    continue
+                queued_ms = (time.monotonic() - job["_enqueued"]) * 1e3
+            self._update(job_id, status="running", queuedMs=round(queued_ms, 1))
+
+            started = time.monotonic()
+            try:
+                if self._engine is None:
+                    self._engine = self._engine_factory()
+                result = self._engine.scan()
+                status, error = "completed", None
+            except Exception as e:
+                print("❌ Scan job failed:", e)
+                result, status, error = None, "failed", str(e)
+            run_ms = (time.monotonic() - started) * 1e3
+
+            with self._cond:
+                self._stats[status] += 1
+                self._stats["queueMsTotal"] += queued_ms
+                self._stats["runMsTotal"] += run_ms
+                self._stats["runMsMax"] = max(self._stats["runMsMax"], run_ms)
+            self._update(job_id, status=status, result=result, error=error,
+                         runMs=round(run_ms, 1), _finished=time.monotonic())
@@ -0,0 +1,167 @@
+from datetime import datetime
+
+# ---------- Configuration ----------
+DAILY_COLLECTION = "stats_daily"        # stats_daily/{YYYY-MM-DD}
+USERS_COLLECTION = "users"
+MONTHLY_COLLECTION = "stats_monthly"    # stats_monthly/{userId}_{YYYY-MM}
+BATCH_SIZE = 400                        # writes per commit in rebuild()
+
+# Rollups are maps keyed by user (daily) or by day of month (monthly) and are
+# written with set(merge=True), instead of Increment counters: writing the
+# same check-in twice (re-scan, WAL replay after a crash) cannot double count,
+# and the counts are derived from the map size when served.
+#
+#   stats_daily/2025-11-24   { date, users: { <userId>: { checkIn: "Late", checkedOut: true } } }
+#   stats_monthly/<uid>_2025-11  { userId, month, days: { "24": { checkIn: "Late", checkedOut: true } } }
+
+
+def monthly_id(user_id, month):
+    return f"{user_id}_{month}"
+
+
+def checkin_writes(user_id, date_iso, time_status):
+    """(collection, doc_id, data) writes for a check-in; time_status is "On Time"/"Late"."""
+    if not user_id:
+        return []
+    month, day = date_iso[:7], date_iso[8:10]
+    entry = {"checkIn": time_status}
+    return [
+        (DAILY_COLLECTION, date_iso, {"date": date_iso, "users": {user_id: entry}}),
+        (MONTHLY_COLLECTION, monthly_id(user_id, month),
+         {"userId": user_id, "month": month, "days": {day: entry}}),
+    ]
+
+
+def checkout_writes(user_id, date_iso):
+    if not user_id:
+        return []
+    month, day = date_iso[:7], date_iso[8:10]
+    entry = {"checkedOut": True}
+    return [
+        (DAILY_COLLECTION, date_iso, {"date": date_iso, "users": {user_id: entry}}),
+        (MONTHLY_COLLECTION, monthly_id(user_id, month),
+         {"userId": user_id, "month": month, "days": {day: entry}}),
+    ]
+
+
+def _count(entries):
+    late = sum(1 for e in entries if e.get("checkIn") == "Late")
+    present = sum(1 for e in entries if e.get("checkIn"))
+    return {
+        "present": present,
+        "late": late,
+        "onTime": present - late,
+        "checkedOut": sum(1 for e in entries if e.get("checkedOut")),
+    }
+
+
+def summarize_daily(data, staff_ids=None):
+    """Counts for one stats_daily doc; with staff_ids also who is absent."""
+    users = (data or {}).get("users") or {}
+    present_ids = sorted(uid for uid, e in users.items() if e.get("checkIn"))
+    summary = _count(list(users.values()))
+    summary["presentUserIds"] = present_ids
+    if staff_ids is not None:
+        absent = sorted(set(staff_ids) - set(present_ids))
+        summary["staffTotal"] = len(staff_ids)
+        summary["absent"] = len(absent)
+        summary["absentUserIds"] = absent
+    return summary
+
+
+def summarize_monthly(data):
+    return _count(list(((data or {}).get("days") or {}).values()))
+
+
+def read_staff_ids(db, collection=USERS_COLLECTION):
+    """Doc ids of every users doc with role == "staff" (ids only)."""
+    query_ref = db.collection(collection).where("role", "==", "staff").select([])
+    return [snap.id for snap in query_ref.stream()]
+
+
+def read_daily(db, date_iso, staff_ids=None):
+    """
+    Summary of stats_daily/<date_iso>. staff_ids (e.g. from a complete
+    user cache) spares the users read; without it they are queried here.
+    """
+    if staff_ids is None:
+        staff_ids = read_staff_ids(db)
+    snap = db.collection(DAILY_COLLECTION).document(date_iso).get()
+    summary = summarize_daily(snap.to_dict() if snap.exists else None, staff_ids)
+    summary["date"] = date_iso
+    return summary
+
+
+def read_monthly(db, month, user_id=None):
+    """{userId: counts} for every user with a check-in in that month."""
+    if user_id:
+        snap = db.collection(MONTHLY_COLLECTION).document(monthly_id(user_id, month)).get()
+        return {user_id: summarize_monthly(snap.to_dict() if snap.exists else None)}
+    query_ref = db.collection(MONTHLY_COLLECTION).where("month", "==", month)
+    return {snap.get("userId"): summarize_monthly(snap.to_dict()) for snap in query_ref.stream()}
+
+
+# ---------- Rebuild from raw attendance ----------
+
+def _date_iso(data):
+    ts = data.get("timestamp")
+    if isinstance(ts, str) and len(ts) >= 10:
+        return ts[:10]
+    try:
+        return datetime.strptime(data.get("date") or "", "%d/%m/%Y").strftime("%Y-%m-%d")
+    except ValueError:
+        return None
+
+
+def compute_rollups(attendance_docs, since=None):
+    """
+    attendance dicts -> ({date_iso: daily doc}, {monthly id: monthly doc}),
+    the same shape the incremental writes produce.
+    """
+    daily, monthly = {}, {}
+    for data in attendance_docs:
+        user_id = data.get("userId")
+        date_iso = _date_iso(data)
+        if not user_id or not date_iso or (since and date_iso < since):
+            continue
+        month, day = date_iso[:7], date_iso[8:10]
+        entry = {"checkIn": data.get("checkInTimeStatus") or "On Time"}
+        if data.get("checkOut"):
+            entry["checkedOut"] = True
+
+        daily.setdefault(date_iso, {"date": date_iso, "users": {}})["users"][user_id] = entry
+        key = monthly_id(user_id, month)
+        monthly.setdefault(key, {"userId": user_id, "month": month, "days": {}})["days"][day] = entry
+    return daily, monthly
+
+
+def rebuild(db, attendance_collection, since=None, dry_run=False):
+    """
+    Recomputes the rollups from the raw attendance docs (only the fields
+    needed are fetched) and overwrites the rollup docs for the days/months
+    found; `since` (YYYY-MM-DD) is rounded down to the start of its month.
+    Returns (attendance docs scanned, daily docs, monthly docs).
+    """
+    if since:
+        since = since[:7] + "-01"   # monthly docs are rewritten whole
+    fields = ["userId", "timestamp", "date", "checkInTimeStatus", "checkOut"]
+    query_ref = db.collection(attendance_collection)
+    if since:
+        query_ref = query_ref.where("timestamp", ">=", since)
+    docs = [snap.to_dict() or {} for snap in query_ref.select(fields).stream()]
+    daily, monthly = compute_rollups(docs, since)
+    if dry_run:
+        return len(docs), len(daily), len(monthly)
+
+    batch, pending = db.batch(), 0
+    writes = [(DAILY_COLLECTION, k, v) for k, v in daily.items()] + \
+             [(MONTHLY_COLLECTION, k, v) for k, v in monthly.items()]
+    for collection, doc_id, data in writes:
+        batch.set(db.collection(collection).document(doc_id), data)
+        pending += 1
+        if pending >= BATCH_SIZE:
+            batch.commit()
+            batch, pending = db.batch(), 0
+    if pending:
+        batch.commit()
+    return len(docs), len(daily), len(monthly)
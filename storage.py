@@ -0,0 +1,659 @@
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from enum import Enum
+
+# ---------- Configuration ----------
+# firestore = Firestore only (needs serviceAccountKey.json)
+# sqlite    = local SQLite file only (on-prem sites, tests; no Firebase at all)
+# cached    = Firestore, with document reads served from a local SQLite copy
+STORAGE_BACKEND = "firestore"
+CREDENTIALS_FILE = "serviceAccountKey.json"
+SQLITE_FILE = "attendance.sqlite3"
+CACHE_FILE = "firestore_cache.sqlite3"
+CACHE_TTL = 300    # seconds a cached document is served without asking Firestore
+
+# Expression indexes on the JSON document body, for the queries the app runs:
+# attendance by (userId, date) and by timestamp, users by firstName/role,
+# leave requests by (userId, createdAt), monthly rollups by month
+SQLITE_INDEXES = [
+    ("userId", "date"),
+    ("timestamp",),
+    ("firstName",),
+    ("role",),
+    ("userId", "createdAt"),
+    ("month",),
+]
+
+# Datetimes are stored as tagged ISO strings in UTC, so they compare and sort
+# correctly inside SQLite and come back as aware datetimes (like Firestore)
+_DATETIME_TAG = "__dt__:"
+
+
+class NotFound(Exception):
+    """Same name as google.api_core.exceptions.NotFound (update of a missing doc)."""
+
+
+# ---------- Encoding ----------
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return _DATETIME_TAG + value.astimezone(timezone.utc).isoformat()
+    if isinstance(value, dict):
+        return {k: _encode_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode_value(v) for v in value]
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, str) and value.startswith(_DATETIME_TAG):
+        return datetime.fromisoformat(value[len(_DATETIME_TAG):])
+    if isinstance(value, dict):
+        return {k: _decode_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_decode_value(v) for v in value]
+    return value
+
+
+def _json_path(field_path):
+    """'checkInLocation.latitude' -> '$."checkInLocation"."latitude"' (SQL literal)"""
+    if "'" in field_path or '"' in field_path:
+        raise ValueError(f"Unsupported field path: {field_path!r}")
+    return "'$." + ".".join(f'"{part}"' for part in field_path.split(".")) + "'"
+
+
+def _field_sql(field_path):
+    # Must match the index expressions exactly for SQLite to use them
+    return f"json_extract(data, {_json_path(field_path)})"
+
+
+def _get_field(data, path):
+    value = data
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def _apply(current, data, merge=False):
+    """
+    Applies a write payload to a decoded document: dotted keys, Increment,
+    DELETE_FIELD and SERVER_TIMESTAMP sentinels; merge=True merges nested
+    maps like set(..., merge=True).
+    """
+    for key, value in data.items():
+        target = current
+        parts = key.split(".")
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        name = parts[-1]
+        kind = type(value).__name__
+        if kind == "Increment":
+            target[name] = (target.get(name) or 0) + value.value
+        elif kind == "Sentinel" and "delete" in repr(value).lower():
+            target.pop(name, None)
+        elif kind == "Sentinel" and "timestamp" in repr(value).lower():
+            target[name] = datetime.now(timezone.utc)
+        elif merge and isinstance(value, dict) and isinstance(target.get(name), dict):
+            _apply(target[name], value, merge=True)
+        else:
+            target[name] = copy.deepcopy(value)
+
+
+# ---------- SQLite backend ----------
+
+class Snapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return _get_field(self._data or {}, field)
+
+
+class ChangeType(Enum):
+    """Same names as google.cloud.firestore's ChangeType."""
+    ADDED = 1
+    REMOVED = 2
+    MODIFIED = 3
+
+
+class DocumentChange:
+    def __init__(self, change_type, document):
+        self.type = change_type
+        self.document = document
+
+
+class Watch:
+    """Returned by on_snapshot(); unsubscribe() stops the callbacks."""
+
+    def __init__(self, store, collection, callback):
+        self._store = store
+        self._collection = collection
+        self._callback = callback
+
+    def deliver(self, documents, changes):
+        try:
+            self._callback(documents, changes, datetime.now(timezone.utc))
+        except Exception as e:
+            print(f"❌ Snapshot listener on '{self._collection}' failed:", e)
+
+    def unsubscribe(self):
+        self._store._unwatch(self)
+
+
+class SQLiteDocumentRef:
+    def __init__(self, store, collection, doc_id):
+        self._store = store
+        self._collection = collection
+        self.id = doc_id
+
+    @property
+    def path(self):
+        return f"{self._collection}/{self.id}"
+
+    def get(self):
+        return Snapshot(self, self._store._read(self._collection, self.id))
+
+    def set(self, data, merge=False):
+        self._store._commit([("set", self, data, merge)])
+
+    def update(self, data):
+        self._store._commit([("update", self, data, None)])
+
+    def delete(self):
+        self._store._commit([("delete", self, None, None)])
+
+
+class SQLiteQuery:
+    """
+    The Firestore query subset the app uses (where / order_by / limit /
+    offset / start_after / select), translated to one SQL statement.
+    Like Firestore, order_by() skips documents without that field and ties
+    are broken on the document id.
+    """
+
+    _OPS = {"==": "=", "!=": "!=", "<": "<", "<=": "<=", ">": ">", ">=": ">="}
+
+    def __init__(self, store, collection, filters=(), orders=(), limit=None, offset=0,
+                 start_after=None, fields=None):
+        self._store = store
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._offset = offset
+        self._start_after = start_after
+        self._fields = fields
+
+    def _copy(self, **changes):
+        state = dict(filters=self._filters, orders=self._orders, limit=self._limit,
+                     offset=self._offset, start_after=self._start_after, fields=self._fields)
+        state.update(changes)
+        return SQLiteQuery(self._store, self._collection, **state)
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        if op_string not in self._OPS and op_string not in ("in", "array_contains"):
+            raise ValueError(f"Unsupported operator: {op_string}")
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path, direction="ASCENDING"):
+        descending = str(direction).upper().endswith("DESCENDING")
+        return self._copy(orders=self._orders + ((field_path, descending),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def offset(self, count):
+        return self._copy(offset=count)
+
+    def start_after(self, snapshot_or_values):
+        return self._copy(start_after=snapshot_or_values)
+
+    def select(self, field_paths):
+        return self._copy(fields=list(field_paths))
+
+    def _sql(self):
+        clauses, params = ["collection = ?"], [self._collection]
+        for field, op, value in self._filters:
+            expr = _field_sql(field)
+            if op == "in":
+                values = [_encode_value(v) for v in value]
+                clauses.append(f"{expr} IN ({', '.join('?' * len(values))})" if values else "0")
+                params.extend(values)
+            elif op == "array_contains":
+                clauses.append(f"EXISTS (SELECT 1 FROM json_each(data, {_json_path(field)}) WHERE value = ?)")
+                params.append(_encode_value(value))
+            elif value is None:
+                clauses.append(f"json_type(data, {_json_path(field)}) {'=' if op == '==' else '!='} 'null'")
+            else:
+                clauses.append(f"{expr} {self._OPS[op]} ?")
+                params.append(_encode_value(value))
+                if op == "!=":
+                    clauses.append(f"{expr} IS NOT NULL")
+
+        order_terms = [(_field_sql(field), descending) for field, descending in self._orders]
+        for expr, _ in order_terms:
+            clauses.append(f"{expr} IS NOT NULL")
+        last_descending = order_terms[-1][1] if order_terms else False
+        # "+id" keeps the primary key from being picked just to avoid a sort
+        # when a filter index is far more selective
+        keys = order_terms + [("+id" if self._filters else "id", last_descending)]
+
+        if self._start_after is not None:
+            if isinstance(self._start_after, Snapshot):
+                cursor = [self._start_after.get(field) for field, _ in self._orders] + [self._start_after.id]
+            elif isinstance(self._start_after, dict):
+                cursor = [self._start_after.get(field) for field, _ in self._orders]
+            else:
+                cursor = list(self._start_after)
+            # (k1 > v1) OR (k1 = v1 AND k2 > v2) OR ... with ">" flipped for DESC keys
+            alternatives = []
+            for i, value in enumerate(cursor[:len(keys)]):
+                terms = [f"{keys[j][0]} = ?" for j in range(i)]
+                terms.append(f"{keys[i][0]} {'<' if keys[i][1] else '>'} ?")
+                alternatives.append("(" + " AND ".join(terms) + ")")
+                params.extend(_encode_value(v) for v in cursor[:i + 1])
+            if alternatives:
+                clauses.append("(" + " OR ".join(alternatives) + ")")
+
+        sql = "SELECT id, data FROM docs WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY " + ", ".join(f"{expr} {'DESC' if desc else 'ASC'}" for expr, desc in keys)
+        if self._limit is not None or self._offset:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([-1 if self._limit is None else self._limit, self._offset or 0])
+        return sql, params
+
+    def stream(self):
+        sql, params = self._sql()
+        for doc_id, data in self._store._query(sql, params):
+            if self._fields is not None:
+                data = {f: _get_field(data, f) for f in self._fields if _get_field(data, f) is not None}
+            yield Snapshot(SQLiteDocumentRef(self._store, self._collection, doc_id), data)
+
+    def get(self):
+        return list(self.stream())
+
+
+class SQLiteCollection(SQLiteQuery):
+    def __init__(self, store, name):
+        super().__init__(store, name)
+        self.id = name
+
+    def document(self, doc_id=None):
+        return SQLiteDocumentRef(self._store, self._collection, doc_id or uuid.uuid4().hex[:20])
+
+    def add(self, data):
+        ref = self.document()
+        ref.set(data)
+        return None, ref
+
+    def on_snapshot(self, callback):
+        """
+        callback(documents, changes, read_time) like Firestore's listener:
+        first with every document as ADDED, then after each commit that
+        touches this collection. Only writes made through this SQLiteStore
+        are seen, not those of other processes sharing the file.
+        """
+        return self._store._watch(self._collection, callback)
+
+
+class SQLiteBatch:
+    def __init__(self, store):
+        self._store = store
+        self._ops = []
+
+    def set(self, ref, data, merge=False):
+        self._ops.append(("set", ref, data, merge))
+
+    def update(self, ref, data):
+        self._ops.append(("update", ref, data, None))
+
+    def delete(self, ref):
+        self._ops.append(("delete", ref, None, None))
+
+    def commit(self):
+        ops, self._ops = self._ops, []
+        self._store._commit(ops)
+
+
+class SQLiteStore:
+    """
+    Local document store with the same client API as firestore.client()
+    (the subset this app uses), so every module taking a `db` works on it
+    unchanged. One table of JSON documents keyed by (collection, id), with
+    expression indexes from SQLITE_INDEXES. Use ":memory:" for tests.
+    """
+
+    def __init__(self, path=SQLITE_FILE, indexes=SQLITE_INDEXES):
+        self.path = path
+        self._lock = threading.RLock()
+        self._watches = {}    # collection -> [Watch]
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS docs ("
+                               "collection TEXT NOT NULL, id TEXT NOT NULL, data TEXT NOT NULL, "
+                               "updated_at REAL NOT NULL, PRIMARY KEY (collection, id))")
+            for fields in indexes:
+                name = "idx_" + "_".join(f.replace(".", "_") for f in fields)
+                columns = ", ".join(_field_sql(f) for f in fields)
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON docs (collection, {columns})")
+
+    def collection(self, name):
+        return SQLiteCollection(self, name)
+
+    def batch(self):
+        return SQLiteBatch(self)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ---------- Internals ----------
+    def _read(self, collection, doc_id, max_age=None):
+        with self._lock:
+            row = self._conn.execute("SELECT data, updated_at FROM docs WHERE collection = ? AND id = ?",
+                                     (collection, doc_id)).fetchone()
+        if row is None or (max_age is not None and time.time() - row[1] > max_age):
+            return None
+        return _decode_value(json.loads(row[0]))
+
+    def _query(self, sql, params):
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [(doc_id, _decode_value(json.loads(data))) for doc_id, data in rows]
+
+    def _commit(self, ops):
+        """Applies set/update/delete ops in one transaction (all or nothing)."""
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                pending, existed = {}, {}
+                for op, ref, data, merge in ops:
+                    key = (ref._collection, ref.id)
+                    if key not in pending:
+                        row = self._conn.execute("SELECT data FROM docs WHERE collection = ? AND id = ?", key).fetchone()
+                        pending[key] = _decode_value(json.loads(row[0])) if row else None
+                        existed[key] = row is not None
+                    current = pending[key]
+                    if op == "delete":
+                        pending[key] = None
+                    elif op == "update":
+                        if current is None:
+                            raise NotFound(ref.path)
+                        _apply(current, data)
+                    else:
+                        current = current if (merge and current is not None) else {}
+                        _apply(current, data, merge)
+                        pending[key] = current
+                for (collection, doc_id), data in pending.items():
+                    if data is None:
+                        self._conn.execute("DELETE FROM docs WHERE collection = ? AND id = ?", (collection, doc_id))
+                    else:
+                        self._conn.execute("INSERT OR REPLACE INTO docs (collection, id, data, updated_at) "
+                                           "VALUES (?, ?, ?, ?)",
+                                           (collection, doc_id, json.dumps(_encode_value(data)), now))
+            # Still under _lock, so listeners see commits in order
+            self._notify(pending, existed)
+
+    # ---------- Listeners ----------
+    def _watch(self, collection, callback):
+        watch = Watch(self, collection, callback)
+        with self._lock:
+            self._watches.setdefault(collection, []).append(watch)
+            documents = list(SQLiteCollection(self, collection).stream())
+            watch.deliver(documents, [DocumentChange(ChangeType.ADDED, doc) for doc in documents])
+        return watch
+
+    def _unwatch(self, watch):
+        with self._lock:
+            watches = self._watches.get(watch._collection, [])
+            if watch in watches:
+                watches.remove(watch)
+
+    def _notify(self, pending, existed):
+        """Called with _lock held after a commit: hands the changed documents to the listeners."""
+        changes = {}
+        for (collection, doc_id), data in pending.items():
+            if not self._watches.get(collection):
+                continue
+            if data is None:
+                if not existed[(collection, doc_id)]:
+                    continue
+                change_type = ChangeType.REMOVED
+            else:
+                change_type = ChangeType.MODIFIED if existed[(collection, doc_id)] else ChangeType.ADDED
+            snapshot = Snapshot(SQLiteDocumentRef(self, collection, doc_id), data)
+            changes.setdefault(collection, []).append(DocumentChange(change_type, snapshot))
+        for collection, collection_changes in changes.items():
+            documents = [change.document for change in collection_changes]
+            for watch in list(self._watches[collection]):
+                watch.deliver(documents, collection_changes)
+
+    def _store_snapshot(self, collection, doc_id, data):
+        """Cache fill: replaces (or, for data=None, removes) a document as-is."""
+        with self._lock, self._conn:
+            if data is None:
+                self._conn.execute("DELETE FROM docs WHERE collection = ? AND id = ?", (collection, doc_id))
+            else:
+                self._conn.execute("INSERT OR REPLACE INTO docs (collection, id, data, updated_at) VALUES (?, ?, ?, ?)",
+                                   (collection, doc_id, json.dumps(_encode_value(data)), time.time()))
+
+
+# ---------- Read-through cache in front of Firestore ----------
+
+class CachedDocumentRef:
+    def __init__(self, store, collection, remote_ref):
+        self._store = store
+        self._collection = collection
+        self._remote = remote_ref
+        self.id = remote_ref.id
+
+    @property
+    def path(self):
+        return f"{self._collection}/{self.id}"
+
+    def get(self):
+        data = self._store.local._read(self._collection, self.id, max_age=self._store.ttl)
+        if data is not None:
+            self._store.hits += 1
+            return Snapshot(self, data)
+        self._store.misses += 1
+        snap = self._remote.get()
+        self._store.local._store_snapshot(self._collection, self.id, snap.to_dict() if snap.exists else None)
+        return snap
+
+    def set(self, data, merge=False):
+        self._remote.set(data, merge=merge)
+        self._store.local._store_snapshot(self._collection, self.id, None)
+
+    def update(self, data):
+        self._remote.update(data)
+        self._store.local._store_snapshot(self._collection, self.id, None)
+
+    def delete(self):
+        self._remote.delete()
+        self._store.local._store_snapshot(self._collection, self.id, None)
+
+
+class CachedQuery:
+    """Firestore query wrapper: cached snapshots used as cursors are swapped for real ones."""
+
+    def __init__(self, store, remote_query):
+        self._store = store
+        self._remote = remote_query
+
+    def _wrap(self, remote_query):
+        return CachedQuery(self._store, remote_query)
+
+    def where(self, *args, **kwargs):
+        return self._wrap(self._remote.where(*args, **kwargs))
+
+    def order_by(self, *args, **kwargs):
+        return self._wrap(self._remote.order_by(*args, **kwargs))
+
+    def limit(self, count):
+        return self._wrap(self._remote.limit(count))
+
+    def offset(self, count):
+        return self._wrap(self._remote.offset(count))
+
+    def select(self, field_paths):
+        return self._wrap(self._remote.select(field_paths))
+
+    def start_after(self, snapshot_or_values):
+        if isinstance(snapshot_or_values, Snapshot) and isinstance(snapshot_or_values.reference, CachedDocumentRef):
+            snapshot_or_values = snapshot_or_values.reference._remote.get()
+        return self._wrap(self._remote.start_after(snapshot_or_values))
+
+    def stream(self):
+        return self._remote.stream()
+
+    def get(self):
+        return self._remote.get()
+
+    def on_snapshot(self, callback):
+        return self._remote.on_snapshot(callback)
+
+
+class CachedCollection(CachedQuery):
+    """document() goes through the cache; queries and listeners go to Firestore."""
+
+    def __init__(self, store, name):
+        super().__init__(store, store.remote.collection(name))
+        self._name = name
+        self.id = name
+
+    def document(self, doc_id=None):
+        return CachedDocumentRef(self._store, self._name, self._remote.document(doc_id))
+
+
+class CachedBatch:
+    def __init__(self, store):
+        self._store = store
+        self._remote = store.remote.batch()
+        self._touched = []
+
+    def _ref(self, ref):
+        if isinstance(ref, CachedDocumentRef):
+            self._touched.append((ref._collection, ref.id))
+            return ref._remote
+        return ref
+
+    def set(self, ref, data, merge=False):
+        self._remote.set(self._ref(ref), data, merge=merge)
+
+    def update(self, ref, data):
+        self._remote.update(self._ref(ref), data)
+
+    def delete(self, ref):
+        self._remote.delete(self._ref(ref))
+
+    def commit(self):
+        result = self._remote.commit()
+        for collection, doc_id in self._touched:
+            self._store.local._store_snapshot(collection, doc_id, None)
+        self._touched = []
+        return result
+
+
+class CachedStore:
+    """
+    Firestore with a local SQLite copy of every document read by id:
+    document gets are served locally for `ttl` seconds, writes go to
+    Firestore and drop the local copy. Queries always go to Firestore
+    (a local copy cannot tell whether it has every matching document).
+    """
+
+    def __init__(self, remote, local, ttl=CACHE_TTL):
+        self.remote = remote
+        self.local = local
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def collection(self, name):
+        return CachedCollection(self, name)
+
+    def batch(self):
+        return CachedBatch(self)
+
+
+# ---------- Selection ----------
+
+def firestore_client(cred_path=CREDENTIALS_FILE):
+    """firestore.client() for the service account in cred_path (Firebase is only imported here)."""
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+
+    if not os.path.exists(cred_path):
+        raise FileNotFoundError(f"Firebase credential file '{cred_path}' not found!")
+    try:
+        firebase_admin.get_app()
+    except ValueError:
+        firebase_admin.initialize_app(credentials.Certificate(cred_path))
+    return firestore.client()
+
+
+class LazyStorage:
+    """
+    Stands in for the `db` object and opens the real one on first use
+    (first attribute access, or .client), so importing the app does not pay
+    for firebase_admin and the client setup.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+def open_storage(backend=None, cred_path=CREDENTIALS_FILE, sqlite_path=None, cache_path=None, lazy=False):
+    """
+    The `db` object for the configured backend; arguments left as None come
+    from STORAGE_BACKEND / STORAGE_SQLITE_FILE / STORAGE_CACHE_FILE in the
+    environment, then the defaults above. lazy=True returns a LazyStorage
+    that opens it on first use.
+    """
+    backend = backend or os.environ.get("STORAGE_BACKEND", STORAGE_BACKEND)
+    if backend not in ("sqlite", "firestore", "cached"):
+        raise ValueError(f"Unknown storage backend '{backend}' (use firestore, sqlite or cached)")
+    if lazy:
+        return LazyStorage(lambda: open_storage(backend, cred_path, sqlite_path, cache_path))
+    if backend == "sqlite":
+        return SQLiteStore(sqlite_path or os.environ.get("STORAGE_SQLITE_FILE", SQLITE_FILE))
+    if backend == "firestore":
+        return firestore_client(cred_path)
+    # cached: Firestore with a local read-through copy
+    local = SQLiteStore(cache_path or os.environ.get("STORAGE_CACHE_FILE", CACHE_FILE))
+    return CachedStore(firestore_client(cred_path), local)
@@ -0,0 +1,37 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+# Modules live at the project root (python app.py), not in a package
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope="session")
+def app_module(tmp_path_factory):
+    """
+    app.py imported once, on the SQLite backend in a temp directory, with
+    writes made synchronously and no background loaders, warm-up or Nominatim.
+    """
+    tmp = tmp_path_factory.mktemp("app")
+    os.environ.update({
+        "STORAGE_BACKEND": "sqlite",
+        "STORAGE_SQLITE_FILE": str(tmp / "attendance.sqlite3"),
+        "GEOCODE_CACHE_FILE": "",
+        "OFFICE_PLACE_NAME": "Office",
+        "ATTENDANCE_DEFERRED_WRITES": "0",
+        "ATTENDANCE_WAL_FILE": str(tmp / "attendance_wal.jsonl"),
+        "RECOGNITION_WORKERS": "0",
+        "USER_CACHE_WARM": "0",
+        "LIVE_LOCATIONS_START": "0",
+        "APP_WARMUP": "0",
+    })
+    cwd = os.getcwd()
+    os.chdir(ROOT)
+    try:
+        return importlib.import_module("app")
+    finally:
+        os.chdir(cwd)
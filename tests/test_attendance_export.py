@@ -0,0 +1,53 @@
+import csv
+import io
+from datetime import datetime
+
+from attendance_export import EXPORT_TZ, export_stream, normalize_record
+
+
+def record(**fields):
+    base = {
+        "id": "u1_2025-11-24", "userId": "u1", "name": "Ali", "date": "24/11/2025",
+        "timestamp": "2025-11-24T10:12:22+08:00", "checkIn": "10:12 am",
+        "checkInDistance": "12.5", "checkInLocation": {"latitude": 3.1, "longitude": "101.6"},
+    }
+    base.update(fields)
+    return base
+
+
+def test_strings_become_dates_datetimes_and_floats():
+    row = normalize_record(record(checkOut="05:32 pm"))
+
+    assert row["date"] == "2025-11-24"
+    assert row["checkInAt"] == datetime(2025, 11, 24, 10, 12, 22, tzinfo=EXPORT_TZ)
+    assert row["checkOutAt"] == datetime(2025, 11, 24, 17, 32, tzinfo=EXPORT_TZ)
+    assert row["checkInDistanceM"] == 12.5
+    assert row["checkInLng"] == 101.6
+    assert row["checkOutLat"] is None
+
+
+def test_record_without_timestamp_uses_the_date_and_time_strings():
+    row = normalize_record(record(timestamp=None))
+
+    assert row["checkInAt"] == datetime(2025, 11, 24, 10, 12, tzinfo=EXPORT_TZ)
+
+
+def test_stored_checkout_timestamp_is_exported():
+    row = normalize_record(record(checkOut="10:12 am", checkOutAt="2025-11-24T10:12:40+08:00"))
+
+    assert row["checkOutAt"] == datetime(2025, 11, 24, 10, 12, 40, tzinfo=EXPORT_TZ)
+
+
+def test_same_minute_checkout_is_not_before_the_checkin():
+    row = normalize_record(record(checkOut="10:12 am"))
+
+    assert row["checkOutAt"] == row["checkInAt"]
+
+
+def test_csv_export_has_one_row_per_record():
+    body = b"".join(chunk if isinstance(chunk, bytes) else chunk.encode()
+                    for chunk in export_stream([record(), record(id="u2_2025-11-24")], "csv"))
+
+    rows = list(csv.DictReader(io.StringIO(body.decode("utf-8-sig"))))
+    assert [row["id"] for row in rows] == ["u1_2025-11-24", "u2_2025-11-24"]
+    assert rows[0]["checkInAt"].startswith("2025-11-24")
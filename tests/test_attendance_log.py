@@ -0,0 +1,66 @@
+import pytest
+
+from attendance_log import (QueryError, decode_cursor, encode_cursor, fetch_page, iter_records,
+                            parse_filters)
+from benchmarks.fake_firestore import FakeFirestore
+
+
+@pytest.fixture
+def db():
+    db = FakeFirestore()
+    for day in range(1, 6):
+        for name, user_id in (("Ali", "u1"), ("Siti", "u2")):
+            # Same timestamp for both: pages must break ties consistently
+            db.collection("attendance_test").document(f"{name}_2030-01-{day:02d}").set({
+                "name": name, "userId": user_id, "date": f"{day:02d}/01/2030",
+                "timestamp": f"2030-01-{day:02d}T09:00:00+08:00", "status": "Check In",
+            })
+    return db
+
+
+def all_pages(db, **args):
+    records, cursor = [], None
+    while True:
+        page, cursor = fetch_page(db, "attendance_test", parse_filters(dict(args, cursor=cursor)))
+        records.extend(page)
+        if cursor is None:
+            return records
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor("Zoë_2030-01-05")) == "Zoë_2030-01-05"
+
+    with pytest.raises(QueryError):
+        decode_cursor("not a cursor!")
+
+
+def test_pages_cover_every_record_once_newest_first(db):
+    records = all_pages(db, limit="3")
+
+    ids = [record["id"] for record in records]
+    assert len(ids) == 10 and len(set(ids)) == 10
+    assert [record["timestamp"] for record in records] == sorted(
+        (record["timestamp"] for record in records), reverse=True)
+    assert ids == [record["id"] for record in iter_records(db, "attendance_test", parse_filters({}), page_size=4)]
+
+
+def test_filters_and_fields_are_applied(db):
+    records = all_pages(db, userId="u2", **{"from": "2030-01-02", "to": "2030-01-03", "fields": "name"})
+
+    assert [record["id"] for record in records] == ["Siti_2030-01-03", "Siti_2030-01-02"]
+    assert set(records[0]) == {"id", "name"}
+
+
+def test_cursor_to_a_deleted_record_is_rejected(db):
+    _, cursor = fetch_page(db, "attendance_test", parse_filters({"limit": "1"}))
+    db.collection("attendance_test").document(decode_cursor(cursor)).delete()
+
+    with pytest.raises(QueryError):
+        fetch_page(db, "attendance_test", parse_filters({"cursor": cursor}))
+
+
+@pytest.mark.parametrize("args", [{"from": "2030-01-05", "to": "2030-01-01"}, {"limit": "x"},
+                                  {"fields": "name,password"}, {"from": "05/01/2030"}])
+def test_bad_parameters(args):
+    with pytest.raises(QueryError):
+        parse_filters(args)
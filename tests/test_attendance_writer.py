@@ -0,0 +1,164 @@
+import json
+import os
+import threading
+
+import pytest
+
+import attendance_writer
+from attendance_writer import AttendanceWriter
+from benchmarks.fake_firestore import FakeFirestore
+
+
+class Unavailable(Exception):
+    """Transient, like google.api_core.exceptions.ServiceUnavailable."""
+
+
+class FlakyFirestore(FakeFirestore):
+    """Batch commits raise `error` while `failing` is set."""
+
+    def __init__(self, error=Unavailable):
+        super().__init__()
+        self.error = error
+        self.failing = True
+        self.attempts = 0
+
+    def batch(self):
+        batch = super().batch()
+        commit = batch.commit
+
+        def flaky_commit():
+            self.attempts += 1
+            if self.failing:
+                raise self.error("storage unavailable")
+            commit()
+        batch.commit = flaky_commit
+        return batch
+
+
+class StalledFirestore(FakeFirestore):
+    """Every RPC waits for `release`, like a storage backend that stopped answering."""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def _rpc(self, docs_read):
+        self.release.wait(10)
+        super()._rpc(docs_read)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(attendance_writer, "BACKOFF_BASE", 0.0)
+
+
+def make_writer(db, tmp_path, **kwargs):
+    kwargs.setdefault("flush_interval", 0.01)
+    return AttendanceWriter(db, str(tmp_path / "wal.jsonl"), **kwargs)
+
+
+def write_wal(path, entries, acked=()):
+    with open(path, "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+        if acked:
+            f.write(json.dumps({"ack": list(acked)}) + "\n")
+
+
+def entry(seq, doc, data):
+    return {"seq": seq, "collection": "attendance_test", "doc": doc, "op": "set", "merge": True, "data": data}
+
+
+def test_submit_commits_and_truncates_own_log(tmp_path):
+    db = FakeFirestore()
+    writer = make_writer(db, tmp_path)
+
+    writer.submit("attendance_test", "Ali_2030-01-02", {"checkIn": "09:00 am"})
+    writer.submit("attendance_test", "Ali_2030-01-02", {"address": "Office"}, op="update")
+    assert writer.flush(5)
+
+    assert db.collection("attendance_test").document("Ali_2030-01-02").get().to_dict() == \
+        {"checkIn": "09:00 am", "address": "Office"}
+    assert writer.wal_file.startswith(str(tmp_path / "wal.jsonl."))
+    assert str(os.getpid()) in os.path.basename(writer.wal_file)
+    assert os.path.getsize(writer.wal_file) == 0
+    assert writer.stats()["committed"] == 2
+
+
+def test_replays_logs_of_stopped_processes(tmp_path):
+    db = FakeFirestore()
+    write_wal(tmp_path / "wal.jsonl.4242-deadbeef",
+              [entry(1, "Ali_2030-01-02", {"checkIn": "09:00 am"}), entry(2, "Siti_2030-01-02", {"checkIn": "x"})],
+              acked=[2])
+    write_wal(tmp_path / "wal.jsonl", [entry(7, "Farid_2030-01-02", {"checkIn": "10:00 am"})])   # older versions
+    write_wal(tmp_path / "wal.jsonl.failed", [entry(9, "Bad_2030-01-02", {"checkIn": "never"})])
+
+    writer = make_writer(db, tmp_path)
+    writer.start()
+    assert writer.flush(5)
+
+    docs = db.collection("attendance_test")
+    assert docs.document("Ali_2030-01-02").get().exists
+    assert docs.document("Farid_2030-01-02").get().exists
+    assert not docs.document("Siti_2030-01-02").get().exists      # acked before the crash
+    assert not docs.document("Bad_2030-01-02").get().exists       # dead letters are not replayed
+    assert writer.stats()["replayed"] == 2
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        ["wal.jsonl.failed", "wal.jsonl.lock", os.path.basename(writer.wal_file)])
+
+
+def test_does_not_touch_logs_of_running_processes(tmp_path):
+    # The first writer's commit hangs, so its entry stays unacked in its locked log
+    stalled = StalledFirestore()
+    running = make_writer(stalled, tmp_path)
+    running.submit("attendance_test", "Ali_2030-01-02", {"checkIn": "09:00 am"})
+
+    db = FakeFirestore()
+    writer = make_writer(db, tmp_path)
+    writer.start()
+    writer.submit("attendance_test", "Siti_2030-01-02", {"checkIn": "09:05 am"})
+    assert writer.flush(5)
+
+    assert writer.stats()["replayed"] == 0
+    assert not db.collection("attendance_test").document("Ali_2030-01-02").get().exists
+    with open(running.wal_file, encoding="utf-8") as f:
+        assert "Ali_2030-01-02" in f.read()
+
+    stalled.release.set()
+    assert running.flush(5)
+    assert stalled.collection("attendance_test").document("Ali_2030-01-02").get().exists
+
+
+def test_gives_up_after_max_attempts(tmp_path):
+    db = FlakyFirestore()
+    writer = make_writer(db, tmp_path, max_attempts=3)
+
+    writer.submit("attendance_test", "Ali_2030-01-02", {"checkIn": "09:00 am"})
+    writer.submit("attendance_test", "Siti_2030-01-02", {"checkIn": "09:05 am"})
+    assert writer.flush(5)
+
+    assert db.attempts == 3
+    with open(str(tmp_path / "wal.jsonl.failed"), encoding="utf-8") as f:
+        assert [json.loads(line)["doc"] for line in f] == ["Ali_2030-01-02", "Siti_2030-01-02"]
+    stats = writer.stats()
+    assert (stats["failed"], stats["committed"], stats["retries"]) == (2, 0, 2)
+
+    # The queue moves on once storage is back
+    db.failing = False
+    writer.submit("attendance_test", "Farid_2030-01-02", {"checkIn": "09:10 am"})
+    assert writer.flush(5)
+    assert db.collection("attendance_test").document("Farid_2030-01-02").get().exists
+
+
+def test_rejected_write_does_not_hold_back_the_batch(tmp_path):
+    db = FakeFirestore()
+    db.collection("attendance_test").document("Ali_2030-01-02").set({"checkIn": "09:00 am"})
+    writer = make_writer(db, tmp_path, flush_interval=0.2)
+
+    writer.submit("attendance_test", "Ali_2030-01-02", {"address": "Office"}, op="update")
+    writer.submit("attendance_test", "Ghost_2030-01-02", {"address": "Office"}, op="update")   # NotFound
+    assert writer.flush(5)
+
+    assert db.collection("attendance_test").document("Ali_2030-01-02").get().to_dict()["address"] == "Office"
+    with open(str(tmp_path / "wal.jsonl.failed"), encoding="utf-8") as f:
+        assert [json.loads(line)["doc"] for line in f] == ["Ghost_2030-01-02"]
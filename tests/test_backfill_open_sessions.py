@@ -0,0 +1,45 @@
+import pytest
+
+from backfill_open_sessions import collect_sessions
+from benchmarks.fake_firestore import FakeFirestore
+
+
+def checkin(db, doc_id, user_id, date_iso, time="09:00:00"):
+    day, month, year = date_iso[8:], date_iso[5:7], date_iso[:4]
+    db.collection("attendance_test").document(doc_id).set({
+        "userId": user_id,
+        "date": f"{day}/{month}/{year}",
+        "timestamp": f"{date_iso}T{time}+08:00",
+    })
+
+
+@pytest.fixture
+def db():
+    db = FakeFirestore()
+    for day in range(1, 31):
+        checkin(db, f"Ali_2030-01-{day:02d}", "u1", f"2030-01-{day:02d}")
+    checkin(db, "Siti_2030-01-30", "u2", "2030-01-30", "08:00:00")
+    db.reset_counters()
+    return db
+
+
+def test_one_day_reads_only_that_day(db):
+    sessions, scanned = collect_sessions(db, "attendance_test", day="2030-01-30")
+
+    assert sorted(sessions) == [("u1", "2030-01-30"), ("u2", "2030-01-30")]
+    assert scanned == 2
+    assert db.reads == 2
+
+
+def test_since_reads_only_the_window(db):
+    sessions, scanned = collect_sessions(db, "attendance_test", since="2030-01-29")
+
+    assert sorted(sessions) == [("u1", "2030-01-29"), ("u1", "2030-01-30"), ("u2", "2030-01-30")]
+    assert scanned == db.reads == 3
+
+
+def test_everything_without_a_window(db):
+    sessions, scanned = collect_sessions(db, "attendance_test")
+
+    assert len(sessions) == 31
+    assert scanned == 31
@@ -0,0 +1,50 @@
+import base64
+import io
+
+import numpy as np
+from PIL import Image
+
+from recognition_pool import EXIF_ORIENTATION, decode_image
+
+
+def jpeg(width, height, orientation=None):
+    """Left half red, right half blue."""
+    pixels = np.zeros((height, width, 3), dtype=np.uint8)
+    pixels[:, :width // 2] = (255, 0, 0)
+    pixels[:, width // 2:] = (0, 0, 255)
+    exif = Image.Exif()
+    if orientation:
+        exif[EXIF_ORIENTATION] = orientation
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, "JPEG", exif=exif)
+    return buf.getvalue()
+
+
+def test_large_jpeg_is_decoded_at_a_reduced_scale():
+    image = jpeg(2560, 1920)
+
+    assert decode_image(image).shape == (1920, 2560, 3)
+    # 1/2 scale: 1/4 would make the short side smaller than 640
+    assert decode_image(image, draft_side=640).shape == (960, 1280, 3)
+
+
+def test_small_jpeg_and_png_are_not_reduced():
+    buf = io.BytesIO()
+    Image.new("RGB", (2560, 1920)).save(buf, "PNG")
+
+    assert decode_image(jpeg(600, 400), draft_side=640).shape == (400, 600, 3)
+    assert decode_image(buf.getvalue(), draft_side=640).shape == (1920, 2560, 3)
+
+
+def test_exif_orientation_is_applied():
+    # 6 = camera turned 90°: the stored left edge is the top of the photo
+    rgb = decode_image(jpeg(2560, 1920, orientation=6), draft_side=640)
+
+    assert rgb.shape == (1280, 960, 3)
+    assert rgb[10, :, 0].mean() > 200 and rgb[-10, :, 2].mean() > 200
+
+
+def test_base64_data_url():
+    data_url = "data:image/jpeg;base64," + base64.b64encode(jpeg(64, 48)).decode()
+
+    assert decode_image(data_url).shape == (48, 64, 3)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from face_index import ExactIndex, IVFIndex, build_index, index_path_for, load_index
+from face_matcher import match_batch, squared_norms
+
+
+@pytest.fixture(scope="module")
+def gallery():
+    """2400 encodings: 120 people x 20 samples, shaped like real face clusters."""
+    rng = np.random.default_rng(1)
+    people = rng.normal(scale=0.15, size=(120, 128))
+    return np.repeat(people, 20, axis=0) + rng.normal(scale=0.03, size=(2400, 128))
+
+
+@pytest.fixture(scope="module")
+def probes(gallery):
+    rng = np.random.default_rng(2)
+    rows = rng.choice(len(gallery), size=200, replace=False)
+    return gallery[rows] + rng.normal(scale=0.03, size=(200, 128))
+
+
+def test_ivf_recall_against_brute_force(gallery, probes):
+    sq_norms = squared_norms(gallery)
+    exact_index, exact_distance, _ = match_batch(probes, gallery, sq_norms)
+
+    best_index, best_distance, _ = IVFIndex.build(gallery).match(probes, gallery, sq_norms)
+
+    assert np.mean(best_index == exact_index) >= 0.95
+    # Found rows are re-ranked exactly: never closer than brute force
+    assert (best_distance >= exact_distance - 1e-9).all()
+
+
+def test_scanning_every_partition_is_exact(gallery, probes):
+    sq_norms = squared_norms(gallery)
+    index = IVFIndex.build(gallery, nlist=16, nprobe=16)
+
+    best_index, _, _ = index.match(probes, gallery, sq_norms)
+
+    assert (best_index == match_batch(probes, gallery, sq_norms)[0]).all()
+
+
+def test_small_galleries_use_brute_force(gallery):
+    assert isinstance(build_index(gallery[:100]), ExactIndex)
+    assert isinstance(build_index(gallery), IVFIndex)
+
+
+def test_saved_index_is_reloaded_only_for_the_same_gallery(gallery, tmp_path):
+    path = index_path_for(str(tmp_path / "known_faces.json"))
+    build_index(gallery).save(path)
+
+    assert isinstance(load_index(path, gallery), IVFIndex)
+    assert load_index(path, gallery[:-1]) is None
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from face_matcher import identity_centroids, match_batch, pairwise_distances
+
+face_recognition = pytest.importorskip("face_recognition")
+
+
+@pytest.fixture
+def gallery():
+    rng = np.random.default_rng(0)
+    return rng.normal(scale=0.1, size=(50, 128))
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_distances_match_face_recognition(gallery, dtype):
+    probes = np.vstack([gallery[7], gallery[:3] + 0.01])
+
+    distances = pairwise_distances(probes, gallery.astype(dtype))
+
+    expected = np.array([face_recognition.face_distance(gallery, probe) for probe in probes])
+    np.testing.assert_allclose(distances, expected, atol=1e-4)
+
+
+def test_match_batch_picks_the_same_face_as_face_recognition(gallery):
+    probes = gallery[[3, 20, 41]] + 0.02
+
+    best_index, best_distance, margin = match_batch(probes, gallery)
+
+    for i, probe in enumerate(probes):
+        expected = face_recognition.face_distance(gallery, probe)
+        assert best_index[i] == np.argmin(expected)
+        assert best_distance[i] == pytest.approx(expected.min())
+        assert margin[i] == pytest.approx(np.sort(expected)[1] - expected.min())
+
+
+def test_exact_match_has_zero_distance(gallery):
+    _, best_distance, _ = match_batch(gallery[5], gallery)
+
+    assert best_distance[0] == pytest.approx(0.0, abs=1e-6)
+
+
+def test_single_row_gallery_has_no_margin(gallery):
+    best_index, _, margin = match_batch(gallery[:2], gallery[:1])
+
+    assert list(best_index) == [0, 0]
+    assert np.isinf(margin).all()
+
+
+def test_centroids_average_each_label(gallery):
+    identities, row_identity, centroids = identity_centroids(["a", "b", "a"], gallery[:3])
+
+    assert identities == ["a", "b"]
+    assert list(row_identity) == [0, 1, 0]
+    np.testing.assert_allclose(centroids[0], (gallery[0] + gallery[2]) / 2)
@@ -0,0 +1,66 @@
+import os
+
+import numpy as np
+
+from face_gallery import FaceGallery
+from face_store import POINTER_MAGIC, read_store, resolve_store, write_store
+
+
+def encodings(count, value):
+    return np.full((count, 128), value, dtype=np.float32)
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "known_faces.bin")
+
+    write_store(path, ["Ali", "Siti"], encodings(2, 0.5), meta={"thresholds": {"Ali": 0.4}})
+    names, matrix, table = read_store(path)
+
+    assert names == ["Ali", "Siti"]
+    assert matrix.shape == (2, 128) and float(matrix[1, 0]) == 0.5
+    assert table["thresholds"] == {"Ali": 0.4}
+
+
+def test_writes_go_to_a_new_version_file(tmp_path):
+    path = str(tmp_path / "known_faces.bin")
+    write_store(path, ["Ali"], encodings(1, 1.0))
+    first = resolve_store(path)
+    _, mapped, _ = read_store(path)          # a worker's memmap of the old version
+
+    write_store(path, ["Ali", "Siti"], encodings(2, 2.0))
+
+    assert resolve_store(path) != first
+    assert open(path, "rb").read().startswith(POINTER_MAGIC)
+    assert sorted(os.listdir(tmp_path)) == sorted(["known_faces.bin", os.path.basename(resolve_store(path))])
+    assert read_store(path)[0] == ["Ali", "Siti"]
+    assert float(mapped[0, 0]) == 1.0
+
+
+def test_same_content_reuses_the_version(tmp_path):
+    path = str(tmp_path / "known_faces.bin")
+    write_store(path, ["Ali"], encodings(1, 1.0))
+    first = resolve_store(path)
+
+    write_store(path, ["Ali"], encodings(1, 1.0))
+
+    assert resolve_store(path) == first
+
+
+def test_plain_store_is_still_read(tmp_path):
+    path = str(tmp_path / "known_faces.bin")
+    write_store(path, ["Ali"], encodings(1, 1.0))
+    os.replace(resolve_store(path), path)    # the single-file layout of earlier versions
+
+    assert resolve_store(path) == path
+    assert read_store(path)[0] == ["Ali"]
+
+
+def test_gallery_reloads_when_the_pointer_moves(tmp_path):
+    path = str(tmp_path / "known_faces.bin")
+    write_store(path, ["Ali"], encodings(1, 0.1))
+    gallery = FaceGallery(path, check_interval=0)
+    assert gallery.refresh().identities == ["Ali"]
+
+    write_store(path, ["Ali", "Siti"], encodings(2, 0.1) + np.arange(2, dtype=np.float32)[:, None])
+
+    assert sorted(gallery.refresh().identities) == ["Ali", "Siti"]
@@ -0,0 +1,195 @@
+import threading
+import time
+
+import pytest
+
+from geocode_cache import FAILED_PLACE_NAME, GeocodeCache, cell_key
+from recent_results import RecentResults
+
+OFFICE = (3.205170, 101.720107)
+
+
+class StubGeocoder:
+    """resolver(lat, lng) that counts calls; answers from `names` (None = failure)."""
+
+    def __init__(self, names=None, release=None):
+        self.names = list(names or [])
+        self.release = release
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, lat, lng):
+        with self._lock:
+            self.calls.append((lat, lng))
+        if self.release is not None:
+            self.release.wait(5)
+        if self.names:
+            name = self.names.pop(0)
+            if isinstance(name, Exception):
+                raise name
+            return name
+        return f"Place {lat:.4f},{lng:.4f}"
+
+
+def make_cache(resolver, **kwargs):
+    kwargs.setdefault("path", None)
+    kwargs.setdefault("min_interval", 0)
+    return GeocodeCache(resolver, **kwargs)
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_cell_key_rounds_coordinates():
+    assert cell_key(3.205170, 101.720107) == "3.2052,101.7201"
+    assert cell_key(3.20516, 101.72014) == cell_key(3.20518, 101.72006)
+    assert cell_key(-0.00004, 0.00004) == "-0.0000,0.0000"
+
+
+def test_points_near_anchor_share_the_anchor_key():
+    cache = make_cache(StubGeocoder())
+    anchor = cache.add_anchor(*OFFICE, radius_m=100)
+
+    assert cache.key_for(OFFICE[0] + 0.0005, OFFICE[1]) == anchor        # ~55 m away
+    assert cache.key_for(OFFICE[0] + 0.002, OFFICE[1]) != anchor         # ~220 m away
+    assert cache.key_for(OFFICE[0] + 0.002, OFFICE[1]) == cell_key(OFFICE[0] + 0.002, OFFICE[1])
+
+
+def test_named_anchor_is_precomputed():
+    geocoder = StubGeocoder()
+    cache = make_cache(geocoder)
+    cache.add_anchor(*OFFICE, radius_m=100, name="Office")
+
+    assert cache.lookup(OFFICE[0] + 0.0003, OFFICE[1] - 0.0003) == "Office"
+    assert geocoder.calls == []
+
+
+def test_memory_hits_and_lru_eviction():
+    geocoder = StubGeocoder()
+    cache = make_cache(geocoder, capacity=2)
+
+    cache.lookup(1.0, 1.0)
+    cache.lookup(2.0, 2.0)
+    cache.lookup(1.0, 1.0)         # hit, now most recently used
+    cache.lookup(3.0, 3.0)         # evicts (2, 2)
+
+    assert cache.stats()["memoryHits"] == 1
+    assert cache.peek(1.0, 1.0) == "Place 1.0000,1.0000"
+    assert cache.peek(2.0, 2.0) is None
+    assert len(geocoder.calls) == 3
+
+
+def test_names_persist_across_instances(tmp_path):
+    path = str(tmp_path / "geocode.sqlite3")
+    make_cache(StubGeocoder(["Setapak Central"]), path=path).lookup(3.2, 101.7)
+
+    geocoder = StubGeocoder()
+    reopened = make_cache(geocoder, path=path)
+
+    assert reopened.lookup(3.2, 101.7) == "Setapak Central"
+    assert geocoder.calls == []
+    assert reopened.stats()["diskHits"] == 1
+    assert reopened.stats()["diskEntries"] == 1
+
+
+def test_stale_persisted_names_are_looked_up_again(tmp_path):
+    path = str(tmp_path / "geocode.sqlite3")
+    make_cache(StubGeocoder(["Old name"]), path=path).lookup(3.2, 101.7)
+
+    reopened = make_cache(StubGeocoder(["New name"]), path=path, max_age=-1)
+
+    assert reopened.lookup(3.2, 101.7) == "New name"
+
+
+def test_concurrent_misses_share_one_call():
+    release = threading.Event()
+    geocoder = StubGeocoder(release=release)
+    cache = make_cache(geocoder)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.lookup(3.2, 101.7))) for _ in range(5)]
+
+    for thread in threads:
+        thread.start()
+    wait_until(lambda: cache.stats()["coalesced"] == 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(geocoder.calls) == 1
+    assert results == ["Place 3.2000,101.7000"] * 5
+    assert cache.stats()["misses"] == 1
+
+
+def test_calls_are_spaced_by_min_interval():
+    geocoder = StubGeocoder()
+    cache = make_cache(geocoder, min_interval=0.05)
+
+    started = time.monotonic()
+    cache.lookup(1.0, 1.0)
+    cache.lookup(2.0, 2.0)
+    cache.lookup(3.0, 3.0)
+
+    assert time.monotonic() - started >= 0.1
+
+
+@pytest.mark.parametrize("failure", [None, TimeoutError("geocoder timed out")])
+def test_failures_are_not_cached(failure):
+    geocoder = StubGeocoder([failure, "Recovered"])
+    cache = make_cache(geocoder)
+
+    assert cache.lookup(3.2, 101.7) == FAILED_PLACE_NAME
+    assert cache.peek(3.2, 101.7) is None
+    assert cache.lookup(3.2, 101.7) == "Recovered"
+    assert len(geocoder.calls) == 2
+    assert cache.stats()["failures"] == 1
+
+
+def test_lookup_async_calls_back_with_the_name():
+    cache = make_cache(StubGeocoder(["Wangsa Maju"]))
+    names = []
+
+    future = cache.lookup_async(3.2, 101.7, names.append)
+
+    assert future.result(5) == "Wangsa Maju"
+    assert names == ["Wangsa Maju"]
+
+
+def test_pending_address_is_filled_in_later(app_module, monkeypatch):
+    release = threading.Event()
+    cache = make_cache(StubGeocoder(["Taman Melati"], release=release))
+    monkeypatch.setattr(app_module, "geocode_cache", cache)
+    lat, lng = 3.2191, 101.7265
+
+    place_name, pending = app_module.get_place_name_nowait(lat, lng)
+    assert (place_name, pending) == (app_module.PENDING_ADDRESS, True)
+
+    doc = app_module.db.collection(app_module.ATTENDANCE_COLLECTION).document("Ali_2030-01-02")
+    doc.set({"name": "Ali", "address": place_name})
+    app_module.fill_address_later(["Ali_2030-01-02"], lat, lng)
+    assert doc.get().to_dict()["address"] == app_module.PENDING_ADDRESS
+
+    release.set()
+    wait_until(lambda: doc.get().to_dict()["address"] != app_module.PENDING_ADDRESS)
+    assert doc.get().to_dict()["address"] == "Taman Melati"
+    assert app_module.get_place_name_nowait(lat, lng) == ("Taman Melati", False)
+
+
+def test_async_geocoding_is_off_by_default(app_module):
+    assert app_module.GEOCODE_ASYNC is False
+
+
+def test_remembered_checkin_gets_the_resolved_address(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "geocode_cache", make_cache(StubGeocoder(["Taman Melati"])))
+    checkins = RecentResults(ttl=300)
+    monkeypatch.setattr(app_module, "recent_checkins", checkins)
+    checkins.begin("u1_2030-01-02")
+    checkins.finish("u1_2030-01-02", {"name": "Ali", "address": app_module.PENDING_ADDRESS})
+
+    app_module.fill_address_later([], 3.2191, 101.7265, ["u1_2030-01-02"])
+
+    wait_until(lambda: checkins.peek("u1_2030-01-02")["address"] != app_module.PENDING_ADDRESS)
+    assert checkins.peek("u1_2030-01-02") == {"name": "Ali", "address": "Taman Melati"}
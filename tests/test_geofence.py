@@ -0,0 +1,19 @@
+from geofence import HOME
+
+
+def test_index_includes_users_missing_from_an_incomplete_cache(app_module, monkeypatch):
+    # USER_CACHE_WARM=0: the cache is never complete, so the index reads users itself
+    monkeypatch.setattr(app_module, "_geofence_index", (None, 0.0, None))
+    app_module.db.collection("users").document("geo1").set(
+        {"firstName": "Geo", "lastName": "One", "role": "staff", "homeLocation": {"lat": 3.15, "lng": 101.61}})
+
+    index = app_module.get_geofence_index()
+
+    homes = [fence for fence in index.fences if fence["kind"] == HOME]
+    assert [fence["owner"] for fence in homes] == ["geo1"]
+    nearest, distance, inside = index.evaluate([3.1501], [101.6101], owners=["geo1"])
+    assert index.fences[nearest[0]]["owner"] == "geo1"
+    assert bool(inside[0])
+
+    # Reused until GEOFENCE_USERS_TTL passes
+    assert app_module.get_geofence_index() is index
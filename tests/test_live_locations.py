@@ -0,0 +1,87 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from scan_jobs import ScanJobManager
+
+
+def test_event_stream_ends_after_max_age(app_module, monkeypatch, one_slot):
+    monkeypatch.setattr(app_module, "LIVE_EVENTS_MAX_AGE", 0.2)
+    monkeypatch.setattr(app_module, "LIVE_EVENTS_MAX_WAIT", 0.05)
+    client = app_module.app.test_client()
+
+    response = client.get("/api/staff-live-locations/events")
+    body = response.get_data(as_text=True)
+
+    assert body.startswith("retry: ")
+    assert "event: snapshot" in body
+    assert ": keep-alive" in body
+
+
+def test_event_stream_resumes_from_last_event_id(app_module, monkeypatch, one_slot):
+    monkeypatch.setattr(app_module, "LIVE_EVENTS_MAX_AGE", 0.1)
+    monkeypatch.setattr(app_module, "LIVE_EVENTS_MAX_WAIT", 0.05)
+    seq, _ = app_module.live_locations.snapshot()
+    client = app_module.app.test_client()
+
+    body = client.get("/api/staff-live-locations/events", headers={"Last-Event-ID": str(seq)}).get_data(as_text=True)
+
+    assert "event: snapshot" not in body
+
+
+@pytest.fixture
+def one_slot(app_module, monkeypatch):
+    slots = threading.BoundedSemaphore(1)
+    monkeypatch.setattr(app_module, "long_request_slots", slots)
+    return slots
+
+
+def test_stream_slot_is_released_when_the_stream_ends(app_module, monkeypatch, one_slot):
+    monkeypatch.setattr(app_module, "LIVE_EVENTS_MAX_AGE", 0.05)
+    client = app_module.app.test_client()
+
+    for _ in range(2):
+        response = client.get("/api/staff-live-locations/events")
+        assert response.status_code == 200
+        response.get_data()
+        response.close()
+
+    assert one_slot.acquire(blocking=False)
+
+
+def test_streams_past_the_limit_get_503(app_module, one_slot):
+    one_slot.acquire()
+    client = app_module.app.test_client()
+
+    for path in ("/api/staff-live-locations/events", "/scan-events/some-scan"):
+        response = client.get(path)
+        assert response.status_code == 503
+        assert response.headers["Retry-After"]
+
+
+def test_long_poll_answers_at_once_without_a_slot(app_module, monkeypatch, one_slot):
+    release = threading.Event()
+    engine = SimpleNamespace(scan=lambda: release.wait(5) and {"recognized": False})
+    jobs = ScanJobManager(lambda: engine)
+    monkeypatch.setattr(app_module, "scan_jobs", jobs)
+    scan_id = jobs.submit()
+    one_slot.acquire()
+    try:
+        started = time.monotonic()
+        response = app_module.app.test_client().get(f"/scan-status/{scan_id}?wait=5")
+        assert time.monotonic() - started < 1
+        assert response.get_json()["status"] in ("queued", "running")
+    finally:
+        release.set()
+
+
+def test_changes_endpoint_returns_a_snapshot_then_deltas(app_module):
+    client = app_module.app.test_client()
+
+    first = client.get("/api/staff-live-locations/changes").get_json()
+    assert "snapshot" in first
+
+    again = client.get(f"/api/staff-live-locations/changes?since={first['seq']}").get_json()
+    assert again == {"seq": first["seq"], "changes": []}
@@ -0,0 +1,55 @@
+from flask import Flask, g
+
+from metrics import RequestProfiler, instrument_app
+
+
+def make_app(profiler, before=None):
+    app = Flask(__name__)
+    if before is not None:
+        app.before_request(before)     # runs ahead of the metrics hooks
+    instrument_app(app, profiler)
+
+    @app.route("/ok")
+    def ok():
+        return "ok"
+
+    return app
+
+
+def test_slow_requests_are_profiled(tmp_path):
+    profiler = RequestProfiler(rate=1.0, slow=0, directory=str(tmp_path))
+
+    assert make_app(profiler).test_client().get("/ok").status_code == 200
+
+    assert profiler.dumped == 1
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_teardown_without_start_time(tmp_path):
+    profiler = RequestProfiler(rate=1.0, slow=0, directory=str(tmp_path))
+
+    def short_circuit():
+        # e.g. a hook that took the profile and then answered itself
+        g.metrics_profile = profiler.start()
+        return "denied", 403
+
+    response = make_app(profiler, short_circuit).test_client().get("/ok")
+
+    assert response.status_code == 403
+    assert profiler.dumped == 0
+    # The profiler was stopped and released for the next request
+    profile = profiler.start()
+    assert profile is not None
+    profiler.finish(profile, None, "test")
+
+
+def test_earlier_hook_raising_does_not_break_teardown(tmp_path):
+    profiler = RequestProfiler(rate=1.0, slow=0, directory=str(tmp_path))
+
+    def fail():
+        raise RuntimeError("auth backend down")
+
+    response = make_app(profiler, fail).test_client().get("/ok")
+
+    assert response.status_code == 500
+    assert profiler.dumped == 0
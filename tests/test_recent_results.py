@@ -0,0 +1,160 @@
+import io
+import threading
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from recent_results import RecentResults, StillRunning
+
+
+def test_first_begin_owns_the_key():
+    results = RecentResults(ttl=60)
+
+    assert results.begin("k") is None
+    results.finish("k", {"n": 1})
+
+    assert results.begin("k") == {"n": 1}
+    assert results.stats()["hits"] == 1
+
+
+def test_duplicate_waits_for_the_owner():
+    results = RecentResults(ttl=60)
+    assert results.begin("k") is None
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(results.begin("k")))
+
+    waiter.start()
+    results.finish("k", {"n": 1})
+    waiter.join(5)
+
+    assert got == [{"n": 1}]
+
+
+def test_waiter_takes_over_when_the_owner_abandons():
+    results = RecentResults(ttl=60)
+    assert results.begin("k") is None
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(results.begin("k")))
+
+    waiter.start()
+    results.abandon("k")
+    waiter.join(5)
+
+    assert got == [None]
+    assert results.stats()["inflight"] == 1
+
+
+def test_waiter_does_not_take_over_a_running_owner():
+    results = RecentResults(ttl=60, coalesce_timeout=0.01)
+    assert results.begin("k") is None
+
+    with pytest.raises(StillRunning) as excinfo:
+        results.begin("k")
+
+    assert excinfo.value.retry_after > 0
+    assert results.stats()["timedOut"] == 1
+    # The original can still finish, and is what later requests get
+    results.finish("k", {"n": 1})
+    assert results.begin("k") == {"n": 1}
+
+
+def test_expired_results_are_not_returned(monkeypatch):
+    import recent_results
+    now = [1000.0]
+    monkeypatch.setattr(recent_results.time, "time", lambda: now[0])
+    results = RecentResults(ttl=60)
+    results.begin("k")
+    results.finish("k", {"n": 1})
+
+    now[0] += 61
+
+    assert results.begin("k") is None
+
+
+def test_update_keeps_the_expiry(monkeypatch):
+    import recent_results
+    now = [1000.0]
+    monkeypatch.setattr(recent_results.time, "time", lambda: now[0])
+    results = RecentResults(ttl=60)
+    results.begin("k")
+    results.finish("k", {"n": 1})
+
+    now[0] += 30
+    assert results.update("k", {"n": 2})
+    assert results.peek("k") == {"n": 2}
+    now[0] += 31
+    assert results.peek("k") is None
+    assert not results.update("k", {"n": 3})
+
+
+def test_results_persist_across_instances(tmp_path):
+    path = str(tmp_path / "recent.sqlite3")
+    first = RecentResults(ttl=60, path=path)
+    first.begin("k")
+    first.finish("k", {"n": 1})
+
+    assert RecentResults(ttl=60, path=path).peek("k") == {"n": 1}
+
+
+def test_idempotent_retry_while_original_runs_gets_503(app_module, monkeypatch):
+    responses = RecentResults(ttl=60, coalesce_timeout=0.01)
+    monkeypatch.setattr(app_module, "idempotent_responses", responses)
+    assert responses.begin("/checkout:abc") is None   # the original, still running
+
+    response = app_module.app.test_client().post("/checkout", headers={"Idempotency-Key": "abc"}, json={})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"]
+    # Not stored: the retry after this one waits for the original again
+    assert responses.peek("/checkout:abc") is None
+
+
+@pytest.fixture
+def scan(app_module, monkeypatch):
+    """Posts a frame in which the given labels are recognized; returns (response, saved doc ids)."""
+    users = {"Ali": "u1", "Siti": "u2"}
+    monkeypatch.setattr(app_module, "find_user_in_users_collection", lambda label: {
+        "userId": users[label], "firstName": label, "lastName": "", "fullName": label})
+    saved = []
+    monkeypatch.setattr(app_module, "save_attendance", lambda doc_id, *args, **kwargs: saved.append(doc_id))
+
+    def post(*labels):
+        matches = [SimpleNamespace(name=label, recognized=True, distance=0.3) for label in labels]
+        monkeypatch.setattr(app_module, "recognition_pool",
+                            SimpleNamespace(recognize=lambda *args, **kwargs: {"matches": matches}))
+        response = app_module.app.test_client().post(
+            "/recognize", data={"image": (io.BytesIO(b"jpeg"), "frame.jpg")}, content_type="multipart/form-data")
+        return response, saved
+
+    return post
+
+
+@pytest.fixture
+def ali_saving(app_module, monkeypatch):
+    """recent_checkins in which Ali's check-in for today is still being saved."""
+    checkins = RecentResults(ttl=300, coalesce_timeout=0.01)
+    monkeypatch.setattr(app_module, "recent_checkins", checkins)
+    date_iso = datetime.now(app_module.MALAYSIA_TZ).strftime("%Y-%m-%d")
+    assert checkins.begin(f"u1_{date_iso}") is None
+    return checkins
+
+
+def test_duplicate_checkin_while_first_is_saving_gets_503(scan, ali_saving):
+    response, saved = scan("Ali")
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"]
+    assert response.get_json()["recognized"][0]["inProgress"]
+    assert saved == []
+
+
+def test_other_faces_are_saved_while_one_is_in_progress(scan, ali_saving):
+    response, saved = scan("Ali", "Siti")
+
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body["success"] and body["name"] == "Siti"
+    assert [entry.get("inProgress", False) for entry in body["recognized"]] == [True, False]
+    assert any(doc_id.startswith("Siti_") for doc_id in saved)
+    assert not any(doc_id.startswith(("Ali_", "u1_")) for doc_id in saved)
@@ -0,0 +1,58 @@
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import recognition_pool
+from recognition_pool import PoolBusy, RecognitionPool
+
+
+class FakeExecutor:
+    """Stands in for ProcessPoolExecutor; the first `broken` executors lose a worker mid-job."""
+
+    created = []
+    broken = 0
+
+    def __init__(self, **kwargs):
+        self.dead = len(FakeExecutor.created) < FakeExecutor.broken
+        self.shut_down = False
+        FakeExecutor.created.append(self)
+
+    def submit(self, fn, *args):
+        future = Future()
+        if self.dead:
+            future.set_exception(BrokenProcessPool("A process in the process pool was terminated abruptly"))
+        else:
+            future.set_result({"matches": [], "args": args})
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    FakeExecutor.created = []
+    monkeypatch.setattr(recognition_pool, "ProcessPoolExecutor", FakeExecutor)
+    return RecognitionPool(2, "known_faces.bin", 0.5, queue_size=0)
+
+
+def test_worker_dying_mid_job_replaces_the_pool_and_retries(pool):
+    FakeExecutor.broken = 1
+
+    assert pool.recognize(b"jpeg")["args"] == (b"jpeg", False)
+
+    first, second = FakeExecutor.created
+    assert first.shut_down and not second.shut_down
+    # Every slot was given back
+    assert pool._slots.acquire(blocking=False) and pool._slots.acquire(blocking=False)
+
+
+def test_pool_that_keeps_breaking_answers_busy(pool):
+    FakeExecutor.broken = 2
+
+    with pytest.raises(PoolBusy):
+        pool.recognize(b"jpeg")
+
+    assert len(FakeExecutor.created) == 2
+    assert pool.recognize(b"jpeg")["matches"] == []
@@ -0,0 +1,52 @@
+import io
+
+import pytest
+
+
+@pytest.fixture
+def read(app_module):
+    """Runs read_recognize_request() on a request built from test-client style arguments."""
+    def read(**kwargs):
+        with app_module.app.test_request_context("/recognize", method="POST", **kwargs):
+            return app_module.read_recognize_request()
+    return read
+
+
+def test_json_body(read):
+    image, fields = read(json={"image": "data:image/jpeg;base64,/9j/", "latitude": 3.1, "work_mode": "wfo"})
+
+    assert image == "data:image/jpeg;base64,/9j/"
+    assert fields["latitude"] == 3.1 and fields["work_mode"] == "wfo"
+
+
+def test_raw_body_with_fields_in_the_query_string(read):
+    image, fields = read(query_string={"latitude": "3.1", "longitude": "101.6", "single_face": "true"},
+                         data=b"\xff\xd8jpeg", content_type="image/jpeg")
+
+    assert image == b"\xff\xd8jpeg"
+    assert fields == {"latitude": 3.1, "longitude": 101.6, "single_face": True}
+
+
+def test_multipart_upload(read):
+    image, fields = read(data={"image": (io.BytesIO(b"\x89PNG"), "frame.png"), "home_lat": "3.2",
+                               "home_lng": "", "single_face": "0", "work_mode": "wfh"},
+                         content_type="multipart/form-data")
+
+    assert image == b"\x89PNG"
+    # Empty form fields are dropped rather than parsed
+    assert fields == {"home_lat": 3.2, "single_face": False, "work_mode": "wfh"}
+
+
+def test_bad_coordinate_is_a_400(app_module):
+    response = app_module.app.test_client().post(
+        "/recognize?latitude=north", data=b"\xff\xd8jpeg", content_type="application/octet-stream")
+
+    assert response.status_code == 400
+    assert response.get_json() == {"success": False, "error": "Invalid location"}
+
+
+def test_missing_image_is_a_400(app_module):
+    response = app_module.app.test_client().post("/recognize", json={"latitude": 3.1})
+
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "No image provided"
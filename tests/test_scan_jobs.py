@@ -0,0 +1,37 @@
+import threading
+
+import pytest
+
+from scan_jobs import JobQueueFull, ScanJobManager
+
+
+class BlockingEngine:
+    """Scans return once released; the first one signals that it started."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+
+    def scan(self):
+        self.started.set()
+        self.release.wait(5)
+        return {"recognized": True, "name": "Ali"}
+
+
+def test_pending_scans_are_bounded_separately_from_history():
+    engine = BlockingEngine()
+    jobs = ScanJobManager(lambda: engine, max_jobs=200, max_pending=2)
+
+    first = jobs.submit()
+    jobs.submit()
+    assert engine.started.wait(5)
+    with pytest.raises(JobQueueFull):
+        jobs.submit()
+    assert jobs.stats()["rejected"] == 1
+
+    engine.release.set()
+    assert jobs.wait(first, 5)["status"] == "completed"
+    # Finished jobs stay readable but no longer count against the limit
+    for _ in range(2):
+        jobs.wait(jobs.submit(), 5)
+    assert jobs.stats()["stored"] == 4
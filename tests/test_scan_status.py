@@ -0,0 +1,25 @@
+import sys
+from types import SimpleNamespace
+
+
+def test_unknown_scan_is_not_found(app_module):
+    client = app_module.app.test_client()
+
+    response = client.get("/scan-status/no-such-scan")
+
+    assert response.status_code == 404
+    assert response.get_json() == {"status": "not_found"}
+
+
+def test_scan_engine_has_no_window_by_default(app_module, monkeypatch):
+    created = []
+
+    class LiveRecognizer:
+        def __init__(self, known_faces_file, **kwargs):
+            created.append(kwargs)
+
+    monkeypatch.setitem(sys.modules, "live_recognition", SimpleNamespace(LiveRecognizer=LiveRecognizer))
+
+    app_module.create_scan_engine()
+
+    assert created[0]["show_window"] is False
@@ -0,0 +1,42 @@
+from benchmarks.fake_firestore import FakeFirestore
+from stats_rollups import DAILY_COLLECTION, checkin_writes, read_daily
+
+
+def write_all(db, writes):
+    for collection, doc_id, data in writes:
+        db.collection(collection).document(doc_id).set(data, merge=True)
+
+
+def make_db():
+    db = FakeFirestore()
+    for doc_id, role in (("u1", "staff"), ("u2", "staff"), ("u3", "staff"), ("a1", "admin")):
+        db.collection("users").document(doc_id).set({"firstName": doc_id, "role": role})
+    write_all(db, checkin_writes("u1", "2030-01-02", "On Time"))
+    write_all(db, checkin_writes("u2", "2030-01-02", "Late"))
+    return db
+
+
+def test_daily_counts_and_absent_staff_from_users_query():
+    summary = read_daily(make_db(), "2030-01-02")
+
+    assert (summary["present"], summary["late"], summary["onTime"]) == (2, 1, 1)
+    assert summary["staffTotal"] == 3
+    assert summary["absentUserIds"] == ["u3"]
+
+
+def test_daily_uses_given_staff_ids():
+    db = make_db()
+    db.reset_counters()
+
+    summary = read_daily(db, "2030-01-02", staff_ids=["u1", "u2"])
+
+    assert summary["absent"] == 0
+    assert db.rpcs == 1     # only the stats_daily doc
+
+
+def test_rewritten_checkin_is_counted_once():
+    db = make_db()
+    write_all(db, checkin_writes("u1", "2030-01-02", "On Time"))
+
+    assert read_daily(db, "2030-01-02")["present"] == 2
+    assert db.collection(DAILY_COLLECTION).document("2030-01-02").get().exists
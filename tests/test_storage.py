@@ -0,0 +1,91 @@
+import pytest
+
+from storage import SQLiteStore
+from user_cache import UserCache
+
+
+@pytest.fixture
+def store():
+    store = SQLiteStore(":memory:")
+    yield store
+    store.close()
+
+
+def test_set_update_query_round_trip(store):
+    users = store.collection("users")
+    users.document("u1").set({"firstName": "Ali", "role": "staff"})
+    users.document("u2").set({"firstName": "Siti", "role": "admin"})
+    users.document("u1").update({"lastName": "Hassan"})
+
+    assert users.document("u1").get().to_dict() == {"firstName": "Ali", "role": "staff", "lastName": "Hassan"}
+    assert [snap.id for snap in users.where("role", "==", "staff").stream()] == ["u1"]
+
+
+class Recorder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, documents, changes, read_time):
+        self.calls.append([(change.type.name, change.document.id) for change in changes])
+
+
+def test_on_snapshot_delivers_existing_docs_then_changes(store):
+    users = store.collection("users")
+    users.document("u1").set({"firstName": "Ali"})
+    recorder = Recorder()
+
+    watch = users.on_snapshot(recorder)
+    users.document("u2").set({"firstName": "Siti"})
+    users.document("u1").set({"lastName": "Hassan"}, merge=True)
+    users.document("u2").delete()
+    users.document("missing").delete()              # nothing to report
+    store.collection("other").document("x").set({"a": 1})
+
+    assert recorder.calls == [
+        [("ADDED", "u1")],
+        [("ADDED", "u2")],
+        [("MODIFIED", "u1")],
+        [("REMOVED", "u2")],
+    ]
+
+    watch.unsubscribe()
+    users.document("u3").set({"firstName": "Farid"})
+    assert len(recorder.calls) == 4
+
+
+def test_batch_is_one_notification(store):
+    users = store.collection("users")
+    recorder = Recorder()
+    users.on_snapshot(recorder)
+
+    batch = store.batch()
+    batch.set(users.document("u1"), {"firstName": "Ali"})
+    batch.set(users.document("u2"), {"firstName": "Siti"})
+    batch.commit()
+
+    assert recorder.calls == [[], [("ADDED", "u1"), ("ADDED", "u2")]]
+
+
+def test_failed_commit_is_not_reported(store):
+    users = store.collection("users")
+    recorder = Recorder()
+    users.on_snapshot(recorder)
+
+    with pytest.raises(Exception):
+        users.document("ghost").update({"firstName": "Nobody"})
+
+    assert recorder.calls == [[]]
+
+
+def test_user_cache_stays_complete_on_sqlite(store):
+    store.collection("users").document("u1").set({"firstName": "Ali", "role": "staff"})
+    cache = UserCache(store)
+    cache.start()
+
+    store.collection("users").document("u2").set({"firstName": "Siti", "role": "staff"})
+    store.collection("users").document("u1").delete()
+
+    assert cache.stats()["listening"]
+    assert cache.staff_ids() == ["u2"]
+    assert cache.lookup("Siti")["userId"] == "u2"
+    assert cache.stats()["queries"] == 0
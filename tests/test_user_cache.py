@@ -0,0 +1,264 @@
+from types import SimpleNamespace
+
+import pytest
+
+import user_cache
+from benchmarks.fake_firestore import FakeCollection, FakeFirestore
+from user_cache import UserCache
+
+
+class FakeWatch:
+    def __init__(self):
+        self.unsubscribed = False
+
+    def unsubscribe(self):
+        self.unsubscribed = True
+
+
+@pytest.fixture
+def db():
+    db = FakeFirestore()
+    db.collection("users").document("u1").set(
+        {"firstName": "Ali", "lastName": "Hassan", "role": "staff", "homeLocation": {"lat": 3.1, "lng": 101.6}})
+    db.collection("users").document("u2").set({"firstName": "Siti", "lastName": "", "role": "admin"})
+    return db
+
+
+@pytest.fixture
+def listener(monkeypatch):
+    """Makes FakeCollection.on_snapshot register the callback; returns a way to push changes."""
+    callbacks = []
+
+    def on_snapshot(self, callback):
+        callbacks.append(callback)
+        return FakeWatch()
+
+    monkeypatch.setattr(FakeCollection, "on_snapshot", on_snapshot)
+
+    def push(kind, doc_id, data):
+        document = SimpleNamespace(id=doc_id, to_dict=lambda: data)
+        change = SimpleNamespace(type=SimpleNamespace(name=kind), document=document)
+        for callback in callbacks:
+            callback(None, [change], None)
+
+    return push
+
+
+def test_label_hit_after_warm(db):
+    cache = UserCache(db)
+    assert cache.warm() == 2
+    db.reset_counters()
+
+    user = cache.lookup("Ali")
+
+    assert user["userId"] == "u1"
+    assert user["fullName"] == "Ali Hassan"
+    assert (user["home_lat"], user["home_lng"]) == (3.1, 101.6)
+    assert db.rpcs == 0
+    assert cache.stats()["hits"] == 1
+
+
+def test_label_miss_queries_once_then_hits(db):
+    cache = UserCache(db)
+
+    assert cache.lookup("Siti")["userId"] == "u2"
+    assert cache.lookup("Siti")["userId"] == "u2"
+
+    stats = cache.stats()
+    assert (stats["misses"], stats["queries"], stats["hits"]) == (1, 1, 1)
+
+
+def test_unknown_label_cached_for_negative_ttl(db, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(user_cache.time, "monotonic", lambda: now[0])
+    cache = UserCache(db, negative_ttl=60)
+
+    assert cache.lookup("Nobody") is None
+    assert cache.lookup("Nobody") is None
+    assert cache.stats()["queries"] == 1
+    assert cache.stats()["negativeHits"] == 1
+
+    db.collection("users").document("u3").set({"firstName": "Nobody", "lastName": "Else"})
+    now[0] += 61
+    assert cache.lookup("Nobody")["userId"] == "u3"
+    assert cache.stats()["queries"] == 2
+
+
+def test_positive_entries_expire_after_ttl(db, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(user_cache.time, "monotonic", lambda: now[0])
+    cache = UserCache(db, ttl=600)
+    cache.warm()
+
+    db.collection("users").document("u1").set({"firstName": "Ali", "lastName": "Renamed"})
+    assert cache.lookup("Ali")["lastName"] == "Hassan"
+    now[0] += 601
+    assert cache.lookup("Ali")["lastName"] == "Renamed"
+
+
+def test_invalidate_by_label(db):
+    cache = UserCache(db)
+    cache.warm()
+    db.collection("users").document("u1").set({"firstName": "Ali", "lastName": "Baru"})
+
+    cache.invalidate(label_str="Ali")
+
+    assert cache.lookup("Ali")["lastName"] == "Baru"
+    assert cache.stats()["queries"] == 1
+
+
+def test_invalidate_by_user_id(db):
+    cache = UserCache(db)
+    cache.warm()
+    db.collection("users").document("u2").delete()
+
+    cache.invalidate(user_id="u2")
+
+    assert cache.lookup("Siti") is None
+    assert cache.lookup("Ali")["userId"] == "u1"
+    assert cache.stats()["queries"] == 1
+
+
+def test_invalidate_everything(db):
+    cache = UserCache(db)
+    cache.warm()
+
+    cache.invalidate()
+
+    assert cache.stats()["entries"] == 0
+    assert cache.lookup("Ali")["userId"] == "u1"
+    assert cache.stats()["queries"] == 1
+
+
+def test_listener_updates_and_removals(db, listener):
+    cache = UserCache(db)
+    cache.start()
+    assert cache.stats()["listening"]
+    db.reset_counters()
+
+    listener("MODIFIED", "u1", {"firstName": "Ali", "lastName": "Updated"})
+    assert cache.lookup("Ali")["lastName"] == "Updated"
+
+    # Rename: the old label goes away with the doc's previous entry
+    listener("MODIFIED", "u2", {"firstName": "Sitti", "lastName": ""})
+    assert cache.lookup("Sitti")["userId"] == "u2"
+    assert "Siti" not in cache._entries
+
+    listener("REMOVED", "u1", {"firstName": "Ali"})
+    assert "Ali" not in cache._entries
+
+    assert cache.stats()["listenerUpdates"] == 3
+    assert db.rpcs == 0
+    cache.stop()
+    assert not cache.stats()["listening"]
+
+
+def test_listener_failure_falls_back_to_ttl(db):
+    # FakeFirestore's on_snapshot raises, like a project without listeners
+    cache = UserCache(db, ttl=600)
+    cache.start()
+
+    stats = cache.stats()
+    assert stats["warmed"]
+    assert not stats["listening"]
+    assert cache.ttl == 600
+    assert cache.lookup("Ali")["userId"] == "u1"
+
+
+def test_stats_counters(db):
+    cache = UserCache(db)
+    cache.warm()
+
+    cache.lookup("Ali")
+    cache.lookup("Ali")
+    cache.lookup("Ghost")
+    cache.lookup("Ghost")
+
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["negativeHits"] == 1
+    assert stats["queries"] == 1
+    assert stats["entries"] == 3
+
+
+def test_staff_ids_only_while_listener_keeps_cache_complete(db, listener):
+    cache = UserCache(db)
+    cache.start()
+    assert cache.staff_ids() == ["u1"]
+
+    listener("ADDED", "u3", {"firstName": "Farid", "role": "staff"})
+    assert sorted(cache.staff_ids()) == ["u1", "u3"]
+
+
+def test_staff_ids_unknown_in_ttl_mode(db):
+    cache = UserCache(db)
+    cache.start()
+    db.collection("users").document("u3").set({"firstName": "Farid", "role": "staff"})
+
+    # u3 is not cached, so the cache cannot say who all the staff are
+    assert not cache.complete()
+    assert cache.staff_ids() is None
+
+
+def test_full_invalidate_is_incomplete_until_rewarmed(db, listener):
+    cache = UserCache(db)
+    cache.start()
+
+    cache.invalidate()
+    assert cache.staff_ids() is None
+
+    cache.warm()
+    assert cache.staff_ids() == ["u1"]
+
+
+def test_users_needs_a_complete_cache(db):
+    cache = UserCache(db)
+    cache.start()
+    db.collection("users").document("u3").set({"firstName": "Farid", "homeLocation": {"lat": 3.0, "lng": 101.0}})
+
+    assert cache.users() is None
+    users = {user["userId"]: user for user in cache.read_all()}
+    assert sorted(users) == ["u1", "u2", "u3"]
+    assert users["u3"]["home_lat"] == 3.0
+
+
+def test_invalidate_user_id_rereads_while_listening(db, listener):
+    cache = UserCache(db)
+    cache.start()
+    db.collection("users").document("u1").set({"firstName": "Ali", "lastName": "Hassan", "role": "staff",
+                                                "homeLocation": {"lat": 3.3, "lng": 101.8}})
+
+    cache.invalidate(user_id="u1")
+
+    assert cache.complete()
+    assert cache.staff_ids() == ["u1"]
+    assert [u["home_lat"] for u in cache.users() if u["userId"] == "u1"] == [3.3]
+
+
+def test_invalidate_deleted_user_while_listening(db, listener):
+    cache = UserCache(db)
+    cache.start()
+    db.collection("users").document("u1").delete()
+
+    cache.invalidate(user_id="u1")
+
+    assert cache.staff_ids() == []
+    assert [u["userId"] for u in cache.users()] == ["u2"]
+
+
+def test_users_with_shared_or_empty_first_names_are_all_counted(db, listener):
+    db.collection("users").document("u3").set({"firstName": "Ali", "lastName": "Omar", "role": "staff",
+                                               "homeLocation": {"lat": 3.2, "lng": 101.7}})
+    db.collection("users").document("u4").set({"firstName": "", "lastName": "Tan", "role": "staff"})
+    cache = UserCache(db)
+    cache.start()
+
+    assert sorted(cache.staff_ids()) == ["u1", "u3", "u4"]
+    assert sorted(u["userId"] for u in cache.users()) == ["u1", "u2", "u3", "u4"]
+    assert sorted(cache.staff_ids()) == sorted(doc.id for doc in db.collection("users").stream()
+                                               if doc.to_dict().get("role") == "staff")
+
+    # Removing one "Ali" keeps the other in the staff list
+    listener("REMOVED", "u1", {"firstName": "Ali"})
+    assert sorted(cache.staff_ids()) == ["u3", "u4"]
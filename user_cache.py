@@ -0,0 +1,225 @@
+import threading
+import time
+
+# ---------- Configuration ----------
+USER_CACHE_TTL = 600        # seconds a positive entry is trusted without the listener
+NEGATIVE_CACHE_TTL = 60     # seconds we remember "no user with this firstName"
+
+
+def user_from_doc(doc_id, data, label_str):
+    """
+    Builds the user record used by /recognize from a users/<doc_id> document:
+      userId, firstName, lastName, fullName, home_lat, home_lng, raw
+    """
+    data = data or {}
+    first_name = data.get("firstName", label_str)
+    last_name = (data.get("lastName") or "").strip()
+
+    full_name = f"{first_name} {last_name}".strip()
+
+    home_loc = data.get("homeLocation") or {}
+    return {
+        "userId": doc_id,
+        "firstName": first_name,
+        "lastName": last_name,
+        "fullName": full_name,
+        "home_lat": home_loc.get("lat"),
+        "home_lng": home_loc.get("lng"),
+        "raw": data
+    }
+
+
+class UserCache:
+    """
+    label (users.firstName) -> user record, so a check-in does not need a
+    Firestore query per recognized face.
+
+    - warm() loads the whole users collection once at startup.
+    - start_listener() keeps it fresh through a Firestore snapshot listener;
+      without it, entries simply expire after `ttl` seconds.
+    - Misses fall back to the original where(firstName == label).limit(1)
+      query; "not found" is cached too, for `negative_ttl` seconds.
+    - invalidate() drops one label (or everything) after staff edits; with
+      the listener running the dropped user is read again, since the
+      listener only reports later changes.
+    """
+
+    def __init__(self, db, collection="users", ttl=USER_CACHE_TTL, negative_ttl=NEGATIVE_CACHE_TTL):
+        self.db = db
+        self.collection = collection
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = {}       # label -> (user dict or None, expires_at)
+        # doc id -> (label, user dict): every user, including those whose
+        # firstName is empty or shared with another user, and the label to
+        # follow renames/deletes
+        self._users = {}
+        self._lock = threading.Lock()
+        self._watch = None
+        self._warmed = False
+        self.version = 0         # bumped on every change, for caches built from users()
+        self._counters = {"hits": 0, "misses": 0, "negativeHits": 0, "queries": 0, "listenerUpdates": 0}
+
+    # ---------- Loading ----------
+    def _drop_label(self, label, doc_id):
+        """Forgets label if its entry is doc_id's (a shared label may belong to another doc)."""
+        entry = self._entries.get(label)
+        if entry is not None and entry[0] is not None and entry[0]["userId"] == doc_id:
+            del self._entries[label]
+
+    def _put(self, doc_id, data):
+        label = ((data or {}).get("firstName") or "").strip()
+        user = user_from_doc(doc_id, data, label)
+        old = self._users.get(doc_id)
+        if old is not None and old[0] != label:
+            self._drop_label(old[0], doc_id)
+        self._users[doc_id] = (label, user)
+        if label:
+            self._entries[label] = (user, time.monotonic() + self.ttl)
+        self.version += 1
+        return user
+
+    def _remove(self, doc_id):
+        old = self._users.pop(doc_id, None)
+        if old is not None:
+            self._drop_label(old[0], doc_id)
+            self.version += 1
+
+    def read_all(self):
+        """Reads the whole users collection, refreshing the cache; returns every user record."""
+        docs = list(self.db.collection(self.collection).stream())
+        users = []
+        with self._lock:
+            for doc in docs:
+                users.append(self._put(doc.id, doc.to_dict() or {}))
+        return users
+
+    def warm(self):
+        """Loads every user document into the cache."""
+        users = self.read_all()
+        with self._lock:
+            self._warmed = True
+        print(f"✅ User cache warmed with {len(users)} users")
+        return len(users)
+
+    def start_listener(self):
+        """Keeps the cache in sync with the users collection (Firestore on_snapshot)."""
+        def on_snapshot(_col_snapshot, changes, _read_time):
+            with self._lock:
+                for change in changes:
+                    doc = change.document
+                    if change.type.name == "REMOVED":
+                        self._remove(doc.id)
+                    else:
+                        self._put(doc.id, doc.to_dict())
+                    self._counters["listenerUpdates"] += 1
+
+        self._watch = self.db.collection(self.collection).on_snapshot(on_snapshot)
+        # With the listener running, entries stay correct – no need to expire them early
+        self.ttl = float("inf")
+
+    def start(self):
+        """warm() + start_listener(); errors only disable the listener (TTL mode)."""
+        try:
+            self.warm()
+            self.start_listener()
+        except Exception as e:
+            print("⚠️ User cache running without snapshot listener:", e)
+
+    def stop(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    # ---------- Lookups ----------
+    def lookup(self, label_str):
+        """Returns the user record for a firstName label, or None if there is none."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(label_str)
+            if entry is not None and entry[1] > now:
+                if entry[0] is None:
+                    self._counters["negativeHits"] += 1
+                else:
+                    self._counters["hits"] += 1
+                return entry[0]
+            self._counters["misses"] += 1
+
+        docs = list(self.db.collection(self.collection).where("firstName", "==", label_str).limit(1).stream())
+        with self._lock:
+            self._counters["queries"] += 1
+            if not docs:
+                self._entries[label_str] = (None, time.monotonic() + self.negative_ttl)
+                return None
+            self._put(docs[0].id, docs[0].to_dict())
+            entry = self._entries.get(label_str)
+            if entry is None:
+                # firstName matched only after stripping differently – cache as-is
+                user = user_from_doc(docs[0].id, docs[0].to_dict(), label_str)
+                self._entries[label_str] = (user, time.monotonic() + self.ttl)
+                return user
+            return entry[0]
+
+    def complete(self):
+        """
+        True when the cache holds every user: warmed and kept in sync by the
+        listener. In TTL mode users added after warm() are missing until
+        someone looks them up, so callers must read the collection instead.
+        """
+        return self._warmed and self._watch is not None
+
+    def staff_ids(self):
+        """Doc ids of users with role == "staff", or None unless complete()."""
+        with self._lock:
+            if not self.complete():
+                return None
+            return [user["userId"] for _, user in self._users.values() if user["raw"].get("role") == "staff"]
+
+    def users(self):
+        """Every user record, or None unless complete() – use read_all() then."""
+        with self._lock:
+            if not self.complete():
+                return None
+            return [user for _, user in self._users.values()]
+
+    def invalidate(self, label_str=None, user_id=None):
+        """Drops the entry for a label and/or a users/<user_id> doc; no arguments = everything."""
+        with self._lock:
+            if label_str is None and user_id is None:
+                self._entries.clear()
+                self._users.clear()
+                self._warmed = False    # not complete again until the next warm()
+                self.version += 1
+                return
+            if user_id is not None:
+                self._remove(user_id)
+            if label_str is not None:
+                self._entries.pop(label_str, None)
+        if self._watch is not None:
+            self._reload(label_str, user_id)
+
+    def _reload(self, label_str=None, user_id=None):
+        """Reads invalidated users back so a listening cache stays complete."""
+        try:
+            if user_id is not None:
+                snap = self.db.collection(self.collection).document(user_id).get()
+                with self._lock:
+                    self._counters["queries"] += 1
+                    if snap.exists:
+                        self._put(user_id, snap.to_dict())
+            if label_str is not None:
+                self.lookup(label_str)
+        except Exception as e:
+            # Until the next warm() users()/staff_ids() would be missing this user
+            print("⚠️ Could not reload invalidated user, reloading the whole cache:", e)
+            with self._lock:
+                self._warmed = False
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["entries"] = len(self._entries)
+            stats["users"] = len(self._users)
+            stats["listening"] = self._watch is not None
+            stats["warmed"] = self._warmed
+            return stats